@@ -1,8 +1,17 @@
 """
 Utilities specifically for machine learning and data analysis.
 """
+import multiprocessing
+
 from utilities import *
 
+Parallel = LazyAttribute('sklearn.externals.joblib', 'Parallel')
+delayed = LazyAttribute('sklearn.externals.joblib', 'delayed')
+t_distribution = LazyAttribute('scipy.stats', 't')
+
+# Folder to which figures are saved (see save_or_show_figure)
+ANALYSIS_RESULTS_FOLDER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis_results')
+
 
 
 def balanced_sample(users, label_name='label'):
@@ -19,6 +28,226 @@ def balanced_sample(users, label_name='label'):
 		return random.sample(positive_samples, len(negative_samples)) + negative_samples
 
 
+def balanced_sample_index_draws(labels, sample_count, random_state=None):
+	"""
+	Given a numpy array of Boolean labels, returns a list of sample_count index arrays, each
+	selecting a maximal sample in which both labels are equally common.
+
+	Unlike repeated calls to balanced_sample(), the majority class is shuffled once and consumed in
+	consecutive (wrapping) windows, so every majority sample is used by some draw whenever
+		sample_count * (minority class size) >= (majority class size)
+
+	Raises a ValueError if either label is absent, since no balanced sample would contain any users.
+	"""
+	random_state = numpy.random.RandomState(random_state)
+	positive_indices = numpy.flatnonzero(labels == 1)
+	negative_indices = numpy.flatnonzero(labels == 0)
+
+	if len(positive_indices) < len(negative_indices):
+		minority_indices, majority_indices = positive_indices, negative_indices
+	else:
+		minority_indices, majority_indices = negative_indices, positive_indices
+
+	if len(minority_indices) == 0:
+		raise ValueError('Balanced samples need both labels, but {} of {} labels are positive'.format(len(positive_indices), len(labels)))
+
+	sample_size = len(minority_indices)
+	shuffled_majority_indices = random_state.permutation(majority_indices)
+
+	index_draws = []
+	for draw_number in xrange(sample_count):
+		window = numpy.arange(draw_number * sample_size, (draw_number + 1) * sample_size) % len(shuffled_majority_indices)
+		index_draws += [ numpy.sort(numpy.concatenate([minority_indices, shuffled_majority_indices[window]])) ]
+
+	return index_draws
+
+
+def binary_confusion_matrix(y_true, y_predict):
+	"""
+	Given arrays of true and predicted 0/1 labels, returns a 2x2 numpy array in which C_ij is the
+	number of samples in class i but predicted j.
+	"""
+	return numpy.bincount(2 * numpy.asarray(y_true, dtype=numpy.int64) + numpy.asarray(y_predict, dtype=numpy.int64), minlength=4).reshape(2, 2)
+
+
+def precision_recall_and_accuracy(confusion):
+	"""
+	Given a 2x2 confusion matrix (C_ij = # samples in class i but predicted j), returns the
+	precision and recall on the positive class, and the overall accuracy.
+	"""
+	true_negatives, false_positives = confusion[0]
+	false_negatives, true_positives = confusion[1]
+
+	precision = safe_divide(true_positives, true_positives + false_positives)
+	recall = safe_divide(true_positives, true_positives + false_negatives)
+	accuracy = safe_divide(true_positives + true_negatives, confusion.sum())
+	return precision, recall, accuracy
+
+
+def threshold_sweep(values, labels):
+	"""
+	Given numpy arrays of attribute values and corresponding 0/1 labels, evaluates every
+	one-feature classifier of the form
+		predict 1  <=>  value >= threshold
+	at once (one sort plus cumulative sums), and returns numpy arrays
+		thresholds, accuracies, precisions, recalls
+	where thresholds are the distinct values in decreasing order, preceded by +infinity (predict
+	0 for every sample).
+	"""
+	sample_count = len(values)
+	positive_count = labels.sum()
+
+	# Sort by decreasing value; predicted positives at each position are all samples up to it
+	order = numpy.argsort(-values, kind='mergesort')
+	sorted_values = values[order]
+	true_positives = numpy.cumsum(labels[order])
+	predicted_positives = numpy.arange(1, sample_count + 1)
+
+	# Keep only the last occurrence of each distinct value, where its threshold takes effect
+	is_last_of_value = numpy.append(sorted_values[1:] != sorted_values[:-1], True)
+	thresholds = numpy.append(numpy.inf, sorted_values[is_last_of_value])
+	true_positives = numpy.append(0, true_positives[is_last_of_value])
+	predicted_positives = numpy.append(0, predicted_positives[is_last_of_value])
+
+	true_negatives = (sample_count - positive_count) - (predicted_positives - true_positives)
+	accuracies = (true_positives + true_negatives) / float(sample_count)
+	precisions = true_positives / numpy.maximum(predicted_positives, 1).astype(numpy.float)
+	recalls = true_positives / float(max(positive_count, 1))
+
+	return thresholds, accuracies, precisions, recalls
+
+
+def fit_and_compute_confusion_matrix(ModelClass, model_arguments, X, y, train_indices, test_indices):
+	"""
+	Trains a new classifier on the rows of X given by train_indices, and returns its confusion
+	matrix on the rows given by test_indices.
+
+	NOTE: Module-level so that it can be dispatched to worker processes.
+	"""
+	model = ModelClass(**model_arguments)
+	model.fit(X[train_indices], y[train_indices])
+	return binary_confusion_matrix(y[test_indices], model.predict(X[test_indices]))
+
+
+def fit_model(ModelClass, model_arguments, X, y):
+	"""Trains and returns a new classifier. Module-level so that it can be dispatched to worker processes."""
+	model = ModelClass(**model_arguments)
+	model.fit(X, y)
+	return model
+
+
+class BalancedSampleEnsemble(object):
+	"""
+	A bagged ensemble of classifiers, each trained on a different balanced sample of the training
+	data (see balanced_sample_index_draws), which predicts by majority vote.
+
+	Follows the scikit-learn fit/predict interface, so it can be used as a ModelClass anywhere a
+	classifier constructor is expected, e.g.
+		test_elite_status_classifier(
+			ModelClass=BalancedSampleEnsemble,
+			attributes=RANDOM_FOREST_USER_ATTRIBUTES,
+			model_arguments={'ModelClass': RandomForestClassifier, 'model_arguments': RANDOM_FOREST_ARGUMENTS},
+			balance_training_set=False,
+		)
+	"""
+
+	def __init__(self, ModelClass, model_arguments={}, sample_count=10, n_jobs=1, random_state=None):
+		self.ModelClass = ModelClass
+		self.model_arguments = model_arguments
+		self.sample_count = sample_count
+		self.n_jobs = n_jobs
+		self.random_state = random_state
+		self.models = []
+
+	def fit(self, X, y):
+		index_draws = balanced_sample_index_draws(y, self.sample_count, random_state=self.random_state)
+		self.models = Parallel(n_jobs=self.n_jobs)(
+			delayed(fit_model)(self.ModelClass, self.model_arguments, X[indices], y[indices]) for indices in index_draws
+		)
+		return self
+
+	def predict(self, X):
+		# Ties are broken in favor of the positive class
+		votes = numpy.mean([model.predict(X) for model in self.models], axis=0)
+		return (votes >= 0.5).astype(numpy.int)
+
+
+def prediction_accuracy(model, X, y):
+	"""Returns the fraction of the rows of X whose labels (in y) a trained classifier predicts correctly."""
+	return numpy.mean(model.predict(X) == y)
+
+
+def permuted_column_scores(model, X, y, column_index, seeds, score_function=prediction_accuracy):
+	"""
+	Given a trained classifier, a numpy array of feature vectors X with labels y, a column of X and
+	a list of random seeds, returns a numpy array of the model's scores (by score_function) on X
+	with the column shuffled among the rows, once per seed.
+
+	X is copied once, and each shuffle overwrites only that column of the copy, so X itself (which
+	worker processes may share as a read-only memory map) is never modified.
+
+	NOTE: Module-level so that it can be dispatched to worker processes.
+	"""
+	X_permuted = numpy.array(X)
+	column = X[:,column_index]
+	scores = numpy.empty(len(seeds))
+	for repeat, seed in enumerate(seeds):
+		X_permuted[:,column_index] = column[numpy.random.RandomState(seed).permutation(len(column))]
+		scores[repeat] = score_function(model, X_permuted, y)
+	return scores
+
+
+def permutation_importances(model, X, y, repeats=30, n_jobs=-1, random_state=None, score_function=prediction_accuracy):
+	"""
+	Given a trained classifier of any type and held-out feature vectors X (a dense numpy array)
+	with labels y, returns
+		baseline_score : the model's score on X (by score_function, accuracy by default)
+		score_drops : a numpy array; score_drops[j, r] is how much the score drops when column j
+			of X is shuffled among the rows (in repeat r)
+	A feature the model relies on loses much of its score when shuffled; an unused one loses none.
+
+	Each column's repeats are split into blocks, so that there are enough tasks to keep n_jobs
+	worker processes busy, and each task copies X only once (see permuted_column_scores). Results
+	depend only on random_state, not on n_jobs.
+	"""
+	X, y = numpy.asarray(X), numpy.asarray(y)
+	column_count = X.shape[1]
+	seeds = numpy.random.RandomState(random_state).randint(2**31 - 1, size=(column_count, repeats))
+	baseline_score = score_function(model, X, y)
+
+	worker_count = multiprocessing.cpu_count() + 1 + n_jobs if n_jobs < 0 else n_jobs
+	blocks_per_column = max(1, min(repeats, -(-2 * worker_count // max(column_count, 1))))
+	block_bounds = numpy.linspace(0, repeats, blocks_per_column + 1).astype(numpy.int)
+	column_indices_and_seeds = [
+		(column_index, seeds[column_index, block_start:block_end])
+		for column_index in xrange(column_count)
+		for block_start, block_end in zip(block_bounds[:-1], block_bounds[1:])
+	]
+	block_scores = Parallel(n_jobs=n_jobs)(
+		delayed(permuted_column_scores)(model, X, y, column_index, column_seeds, score_function)
+		for column_index, column_seeds in column_indices_and_seeds
+	)
+
+	# Tasks are ordered by column, then by block of repeats
+	score_drops = baseline_score - numpy.concatenate(block_scores).reshape(column_count, repeats)
+	return baseline_score, score_drops
+
+
+def mean_confidence_intervals(samples, confidence=0.95):
+	"""
+	Given a numpy array whose rows are samples (e.g. the score drops of each feature, from
+	permutation_importances), returns numpy arrays
+		means, lower_bounds, upper_bounds
+	of each row's mean and its Student's t confidence interval at the given confidence level.
+	"""
+	sample_count = samples.shape[1]
+	means = samples.mean(axis=1)
+	if sample_count < 2:
+		return means, means, means
+	half_widths = t_distribution.ppf((1 + confidence) / 2.0, sample_count - 1) * samples.std(axis=1, ddof=1) / numpy.sqrt(sample_count)
+	return means, means - half_widths, means + half_widths
+
+
 def remove_attribute(users, attribute):
 	""" Deletes an attribute from all users in a list of user dictionaries. """
 	[ user.pop(attribute, None) for user in users ]
@@ -43,6 +272,15 @@ def vectorize_users(users, attributes, label_name='label'):
 	return numpy.array(user_vectors), numpy.array(labels)
 
 
+def vectorize_user_rows(user_rows):
+	"""
+	Given a list of user attribute value tuples whose last value is the label (e.g. a chunk from
+	read_training_set_rows_in_chunks with attributes + ['label']), returns X and y as in vectorize_users().
+	"""
+	user_matrix = numpy.array(user_rows)
+	return user_matrix[:,:-1], user_matrix[:,-1].astype(numpy.int)
+
+
 def partition_data_vectors(feature_vectors, labels, fraction_for_training=0.7):
 	"""
 	Given a list of feature vectors (lists) and their corresponding labels, returns:
@@ -94,38 +332,107 @@ def normalize_users(users, excluded_attributes=[]):
 	return users
 
 
-def show_histogram(values, value_name='Value', bins=100, range_to_display=(0,0), normed=False):
-	if range_to_display == (0,0):
-		n, bins, patches = pyplot.hist(values, bins=bins, normed=normed, facecolor='g', alpha=0.75)
+def normalize_user_vectors(X, minimums=None, ranges=None):
+	"""
+	Given a numpy array of user feature vectors, returns
+		normalized_X : the vectors with every attribute min-max normalized to [0, 1], as in normalize_users()
+		minimums, ranges : numpy arrays of each attribute's minimum and (max - min), for normalizing other vectors the same way
+
+	If minimums and ranges are given, they are used instead of being computed from X. Attributes
+	with a single value (range 0) are normalized to 0.
+	"""
+	X = numpy.asarray(X, dtype=numpy.float64)
+	if minimums is None or ranges is None:
+		minimums = X.min(axis=0)
+		ranges = X.max(axis=0) - minimums
+	return (X - minimums) / numpy.where(ranges > 0, ranges, 1.0), minimums, ranges
+
+
+def histogram_counts(values, bins=100, range_to_display=(0,0), normed=False):
+	"""
+	Given values (a numpy array or list, or an iterable over such chunks of values, e.g. from
+	read_single_user_attribute_values_in_chunks), returns numpy arrays
+		counts : counts[i] is the number of values in bin i (or its density, if normed)
+		edges : bin i spans [edges[i], edges[i+1]) (the last bin includes its right edge)
+	computed with numpy.histogram, as pyplot.hist would bin them. bins is a number of equal-width
+	bins over range_to_display (default: the range of the values) or a list of bin edges.
+
+	Chunks are binned one at a time against fixed edges, so only one chunk is held in memory; a
+	number of bins over chunked values needs a range_to_display.
+	"""
+	is_single_chunk = isinstance(values, (numpy.ndarray, list, tuple))
+	value_chunks = [values] if is_single_chunk else values
+
+	if isinstance(bins, (int, long)):
+		if range_to_display == (0,0):
+			if not is_single_chunk:
+				raise ValueError('Binning chunked values into a number of bins needs a range_to_display')
+			values = numpy.asarray(values, dtype=numpy.float64)
+			range_to_display = (values.min(), values.max()) if len(values) else (0, 1)
+		edges = numpy.histogram([], bins=bins, range=range_to_display)[1]
 	else:
-		n, bins, patches = pyplot.hist(values, bins=bins, range=range_to_display, normed=normed, facecolor='g', alpha=0.75)
-	pyplot.xlabel(value_name)
-	pyplot.ylabel('Frequency')
-	# pyplot.title('Histogram of ' + value_name + 's')
-	pyplot.axis('tight')
-	pyplot.grid(True)
-	pyplot.show()
+		edges = numpy.asarray(bins, dtype=numpy.float64)
+
+	counts = numpy.zeros(len(edges) - 1, dtype=numpy.int64)
+	for value_chunk in value_chunks:
+		counts += numpy.histogram(numpy.asarray(value_chunk, dtype=numpy.float64), bins=edges)[0]
+
+	if normed:
+		return counts / (max(counts.sum(), 1) * numpy.diff(edges)), edges
+	return counts, edges
 
 
-def show_histogram_with_broken_y_axis(values, value_name='Value', bins=100, range_to_display=(0,0), normed=False, cutout=(0,0)):
+def save_or_show_figure(figure, output_file_name=None):
 	"""
-	Displays a histogram with a break (a section cut out) in the y-dimension.
+	Given a matplotlib figure, writes it to the given file in analysis_results/ (or at the given
+	absolute path), in the format of its extension (e.g. .png or .svg), and closes it. Without a
+	file name, displays the figure instead (blocking until its window is closed).
 	"""
-	n, bins, patches = pyplot.hist(x=values, bins=bins, range=range_to_display, normed=normed, facecolor='g', alpha=0.75)
-	bins = numpy.delete(bins, -1)
-	width = bins[2] - bins[1]
+	if output_file_name is None:
+		pyplot.show()
+		return
 
+	output_path = os.path.join(ANALYSIS_RESULTS_FOLDER_PATH, output_file_name)
+	figure.savefig(output_path, bbox_inches='tight')
+	pyplot.close(figure)
+	print 'Wrote ' + output_path
+
+
+def show_histogram(values, value_name='Value', bins=100, range_to_display=(0,0), normed=False, output_file_name=None):
+	"""
+	Displays (or, given output_file_name, saves; see save_or_show_figure) a histogram of values,
+	binned by histogram_counts() so that only the bin counts are handed to matplotlib.
+	"""
+	counts, edges = histogram_counts(values, bins=bins, range_to_display=range_to_display, normed=normed)
+
+	figure = pyplot.figure()
+	pyplot.bar(edges[:-1], counts, numpy.diff(edges), align='edge', color='g', alpha=0.75)
 	pyplot.xlabel(value_name)
 	pyplot.ylabel('Frequency')
 	# pyplot.title('Histogram of ' + value_name + 's')
 	pyplot.axis('tight')
+	pyplot.grid(True)
+	save_or_show_figure(figure, output_file_name)
+
+
+def show_histogram_with_broken_y_axis(values, value_name='Value', bins=100, range_to_display=(0,0), normed=False, cutout=(0,0), output_file_name=None):
+	"""
+	Displays (or, given output_file_name, saves; see save_or_show_figure) a histogram with a break
+	(a section cut out) in the y-dimension, binned by histogram_counts().
+	"""
+	counts, edges = histogram_counts(values, bins=bins, range_to_display=range_to_display, normed=normed)
+	widths = numpy.diff(edges)
 
 	# Create two plots with a y-axis break in between
 	figure, (axes_1, axes_2) = pyplot.subplots(2, 1, sharex=True)
 
 	# Plot the same data as bar charts on both axes
-	axes_1.bar(bins, n, width, color='g', alpha=0.75)
-	axes_2.bar(bins, n, width, color='g', alpha=0.75)
+	axes_1.bar(edges[:-1], counts, widths, align='edge', color='g', alpha=0.75)
+	axes_2.bar(edges[:-1], counts, widths, align='edge', color='g', alpha=0.75)
+
+	axes_2.set_xlabel(value_name)
+	figure.text(-0.02, 0.5, 'Frequency', rotation='vertical', verticalalignment='center')
+	# figure.suptitle('Histogram of ' + value_name + 's')
 
 	# Turn grid lines on
 	axes_1.grid(True)
@@ -135,14 +442,14 @@ def show_histogram_with_broken_y_axis(values, value_name='Value', bins=100, rang
 	axes_2.set_ylim(0, cutout[0])		# Limit second axis to lower parts of bars
 
 	# Fix x-axis boundaries (without this, visible boundary is changed by diagonal lines below)
-	axes_1.set_xlim(right=range_to_display[1])
-	axes_2.set_xlim(right=range_to_display[1])
+	axes_1.set_xlim(edges[0], edges[-1])
+	axes_2.set_xlim(edges[0], edges[-1])
 
 	# Hide the spines between axes_1 and axes_2
 	axes_1.spines['bottom'].set_visible(False)
 	axes_2.spines['top'].set_visible(False)
 	axes_1.xaxis.tick_top()
-	axes_1.tick_params(labeltop='off') # Omit tick labels at the top
+	axes_1.tick_params(labeltop=False) # Omit tick labels at the top
 	axes_2.xaxis.tick_bottom()
 
 	# Add short diagonal lines around breaks
@@ -156,13 +463,14 @@ def show_histogram_with_broken_y_axis(values, value_name='Value', bins=100, rang
 	axes_2.plot((-d, +d), (1 - d, 1 + d), **kwargs) # Bottom-left diagonal
 	axes_2.plot((1 - d, 1 + d), (1 - d, 1 + d), **kwargs) # Bottom-right diagonal
 
-	pyplot.show()
+	save_or_show_figure(figure, output_file_name)
 
 
-def show_feature_importances(forest, features):
+def show_feature_importances(forest, features, output_file_name=None):
 	"""
 	Given a trained forest-type classifier (e.g. random forest, boosted decision tree, etc.),
-	displays a bar chart of the features' relative importances according to the Gini impurity index.
+	displays (or, given output_file_name, saves; see save_or_show_figure) a bar chart of the
+	features' relative importances according to the Gini impurity index.
 	"""
 	m = len(features)
 
@@ -174,15 +482,38 @@ def show_feature_importances(forest, features):
 		print feature, ':\t', format_as_percentage(importance)
 
 	# Plot the feature importances of the forest
-	pyplot.figure()
+	figure = pyplot.figure()
 	# pyplot.title('Feature Importances')
 	pyplot.barh(range(m), sorted_importances, color='c', align='center')
 	pyplot.yticks(range(m), sorted_features, fontsize='xx-large')
 	pyplot.ylim([-1, m])
 	pyplot.axis('tight')
 	pyplot.grid(True)
-	pyplot.show()
+	save_or_show_figure(figure, output_file_name)
 
 
+def show_permutation_importances(score_drops, features, confidence=0.95, output_file_name=None):
+	"""
+	Given the score drops of features (see permutation_importances), prints the features ranked by
+	their mean importance with confidence intervals, and displays (or, given output_file_name,
+	saves; see save_or_show_figure) a bar chart of the means with error bars.
+	"""
+	m = len(features)
 
+	means, lower_bounds, upper_bounds = mean_confidence_intervals(score_drops, confidence=confidence)
+	order = numpy.argsort(means)
 
+	# Print the feature ranking
+	print 'Permutation importances (drop in score, with ' + format_as_percentage(confidence, 0) + ' confidence intervals):'
+	for feature_index in order:
+		print features[feature_index], ':\t', format_as_percentage(means[feature_index]), '\t(' + format_as_percentage(lower_bounds[feature_index]) + ', ' + format_as_percentage(upper_bounds[feature_index]) + ')'
+
+	# Plot the mean importances and their confidence intervals
+	figure = pyplot.figure()
+	# pyplot.title('Permutation Importances')
+	pyplot.barh(range(m), means[order], xerr=(means - lower_bounds)[order], color='c', ecolor='k', align='center')
+	pyplot.yticks(range(m), [ features[feature_index] for feature_index in order ], fontsize='xx-large')
+	pyplot.ylim([-1, m])
+	pyplot.axis('tight')
+	pyplot.grid(True)
+	save_or_show_figure(figure, output_file_name)
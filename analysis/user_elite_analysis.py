@@ -1,17 +1,10 @@
 """
 Primary file for analysis of the Yelp dataset.
 """
-from sklearn.naive_bayes import GaussianNB
-from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
-from sklearn import tree
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.ensemble import AdaBoostClassifier
-from sklearn.externals.six import StringIO
-from sklearn.cross_validation import train_test_split, cross_val_score, StratifiedKFold
-from sklearn.metrics import confusion_matrix, classification_report
-import pydot
+import time
+from StringIO import StringIO
+
+import scipy.sparse
 
 from utilities import *
 from data.data_interface import *
@@ -19,10 +12,27 @@ from data.data_interface import *
 from analysis_utilities import *
 
 
+# Models and model utilities, imported on first use
+GaussianNB = LazyAttribute('sklearn.naive_bayes', 'GaussianNB')
+LogisticRegression = LazyAttribute('sklearn.linear_model', 'LogisticRegression')
+SGDClassifier = LazyAttribute('sklearn.linear_model', 'SGDClassifier')
+SVC = LazyAttribute('sklearn.svm', 'SVC')
+DecisionTreeClassifier = LazyAttribute('sklearn.tree', 'DecisionTreeClassifier')
+RandomForestClassifier = LazyAttribute('sklearn.ensemble', 'RandomForestClassifier')
+AdaBoostClassifier = LazyAttribute('sklearn.ensemble', 'AdaBoostClassifier')
+StratifiedKFold = LazyAttribute('sklearn.cross_validation', 'StratifiedKFold')
+confusion_matrix = LazyAttribute('sklearn.metrics', 'confusion_matrix')
+classification_report = LazyAttribute('sklearn.metrics', 'classification_report')
+StandardScaler = LazyAttribute('sklearn.preprocessing', 'StandardScaler')
+tree = LazyModule('sklearn.tree')
+pydot = LazyModule('pydot')
+
+
 # Cache expensive file reads and computations
 CACHE = {
 	'training_set': None,
 	'test_set': None,
+	'text_features': None,
 }
 
 def load_training_set():
@@ -37,18 +47,36 @@ def load_test_set():
 		CACHE['test_set'] = read_test_set()
 	return CACHE['test_set']
 
+def load_text_features():
+	"""Loads users' text features (see extract_user_text_features) from the cache if possible, or from the text features file."""
+	if not CACHE['text_features']:
+		CACHE['text_features'] = read_user_text_features()
+	return CACHE['text_features']
+
+def append_text_features(X, users):
+	"""
+	Given a numpy array of user feature vectors and the corresponding list of user dictionaries,
+	returns a scipy.sparse matrix of the same vectors followed by the users' hashed text features.
+	"""
+	text_features_user_IDs, text_features = load_text_features()
+	user_text_features = user_text_feature_rows(text_features_user_IDs, text_features, [ user['ID'] for user in users ])
+	return scipy.sparse.hstack([ scipy.sparse.csr_matrix(X.astype(numpy.float)), user_text_features ]).tocsr()
 
 
-def train_and_validate_elite_status_classifier(ModelClass, attributes, model_arguments={}):
+
+def train_and_validate_elite_status_classifier(ModelClass, attributes, model_arguments={}, include_text_features=False):
 	"""
 	Given a constructor for a classifier object and a list of user attributes to use,
 		- Trains a classifier (using part of the training dataset)
 		- Validates the classifier (using another part of the training dataset)
+
+	If include_text_features, users' hashed text features (see extract_user_text_features) are
+	appended to their attributes; the model must then accept sparse input (e.g. not GaussianNB).
 	"""
 	print '---------------------------------------------------------------------------------------'
 	print 'STARTING LEARNING PIPELINE'
 	print 'Model type: ' + ModelClass.__name__ + ' with arguments ' + str(model_arguments)
-	print 'Features: ' + ', '.join(attributes)
+	print 'Features: ' + ', '.join(attributes) + (' + text features' if include_text_features else '')
 	print ''
 
 	print 'LOADING TRAINING SET'
@@ -57,6 +85,8 @@ def train_and_validate_elite_status_classifier(ModelClass, attributes, model_arg
 	print 'PREPARING DATA'
 	users = balanced_sample(users)
 	X, y = vectorize_users(users, attributes)
+	if include_text_features:
+		X = append_text_features(X, users)
 
 	print 'BUILDING CLASSIFIER MODEL'
 	model = ModelClass(**model_arguments)
@@ -84,17 +114,20 @@ def train_and_validate_elite_status_classifier(ModelClass, attributes, model_arg
 	print classification_report(combined_y_test, combined_y_predict, labels=[1,0], target_names=['Elite', 'Non-Elite'], digits=3)
 
 
-def test_elite_status_classifier(ModelClass, attributes, model_arguments={}, balance_training_set=True, balance_test_set=True):
+def test_elite_status_classifier(ModelClass, attributes, model_arguments={}, balance_training_set=True, balance_test_set=True, include_text_features=False):
 	"""
 	Given a constructor for a classifier object and a list of user attributes to use,
 		- Trains a classifier (using the full training dataset)
 		- Tests the classifier (using test data)
 	and returns the classifier for Elite status.
+
+	If include_text_features, users' hashed text features are appended to their attributes (see
+	train_and_validate_elite_status_classifier).
 	"""
 	print '---------------------------------------------------------------------------------------'
 	print 'STARTING LEARNING PIPELINE'
 	print 'Model type: ' + ModelClass.__name__ + ' with arguments ' + str(model_arguments)
-	print 'Features: ' + ', '.join(attributes)
+	print 'Features: ' + ', '.join(attributes) + (' + text features' if include_text_features else '')
 	print ''
 
 	print 'LOADING TRAINING SET (WITH ' + ('UN' if not balance_training_set else '') + 'BALANCED CLASSES)'
@@ -102,6 +135,8 @@ def test_elite_status_classifier(ModelClass, attributes, model_arguments={}, bal
 	if balance_training_set:
 		training_users = balanced_sample(training_users)
 	X_train, y_train = vectorize_users(training_users, attributes)
+	if include_text_features:
+		X_train = append_text_features(X_train, training_users)
 
 	print 'TRAINING CLASSIFIER MODEL'
 	model = ModelClass(**model_arguments)
@@ -112,6 +147,8 @@ def test_elite_status_classifier(ModelClass, attributes, model_arguments={}, bal
 	if balance_test_set:
 		test_users = balanced_sample(test_users)
 	X_test, y_test = vectorize_users(test_users, attributes)
+	if include_text_features:
+		X_test = append_text_features(X_test, test_users)
 
 	print 'TESTING ON TEST SET'
 	y_predict = model.predict(X_test)
@@ -123,6 +160,150 @@ def test_elite_status_classifier(ModelClass, attributes, model_arguments={}, bal
 	return model
 
 
+def measure_permutation_feature_importances(ModelClass, attributes, model_arguments={}, repeats=30, n_jobs=-1, random_state=0, balance_test_set=True, output_file_name=None):
+	"""
+	Given a constructor for a classifier object (of any type, unlike show_feature_importances) and
+	a list of user attributes to use,
+		- Trains and tests a classifier (see test_elite_status_classifier)
+		- Measures the drop in test accuracy when each attribute is shuffled among the test users,
+		  over repeats shuffles (all attributes and repeats are scored in parallel)
+	displays (or saves to output_file_name) the attributes' mean importances with 95% confidence
+	intervals, and returns the classifier and the score drops (see permutation_importances).
+	"""
+	model = test_elite_status_classifier(ModelClass, attributes, model_arguments=model_arguments, balance_test_set=balance_test_set)
+
+	print 'MEASURING PERMUTATION IMPORTANCES ON TEST SET (' + str(repeats) + ' REPEATS)'
+	test_users = load_test_set()
+	if balance_test_set:
+		test_users = balanced_sample(test_users)
+	X_test, y_test = vectorize_users(test_users, attributes)
+
+	start_time = time.time()
+	baseline_score, score_drops = permutation_importances(model, X_test, y_test, repeats=repeats, n_jobs=n_jobs, random_state=random_state)
+	print 'Scored ' + str(score_drops.size) + ' permutations in {:.1f}s'.format(time.time() - start_time)
+	print 'Test accuracy: ' + format_as_percentage(baseline_score)
+
+	show_permutation_importances(score_drops, attributes, output_file_name=output_file_name)
+	return model, score_drops
+
+
+def evaluate_elite_status_classifier_over_balanced_samples(ModelClass, attributes, model_arguments={}, sample_count=10, n_folds=5, n_jobs=-1, train_ensemble=False):
+	"""
+	Given a constructor for a classifier object and a list of user attributes to use,
+		- Draws sample_count balanced samples of the training dataset
+		- Cross-validates a classifier on each sample (all draws and folds are run in parallel)
+		- Reports the mean and standard deviation of precision, recall and accuracy across draws
+	and, if train_ensemble is True, returns a majority-vote ensemble of one classifier per draw,
+	trained on the full training dataset (so that the whole majority class is used).
+	"""
+	print '---------------------------------------------------------------------------------------'
+	print 'STARTING REPEATED BALANCED SAMPLING PIPELINE'
+	print 'Model type: ' + ModelClass.__name__ + ' with arguments ' + str(model_arguments)
+	print 'Features: ' + ', '.join(attributes)
+	print 'Balanced samples: ' + str(sample_count) + ', folds per sample: ' + str(n_folds)
+	print ''
+
+	print 'LOADING TRAINING SET'
+	users = load_training_set()
+
+	print 'PREPARING DATA'
+	# Vectorize once; each balanced sample is just an array of row indices into X
+	X, y = vectorize_users(users, attributes)
+	index_draws = balanced_sample_index_draws(y, sample_count)
+
+	print 'PERFORMING STRATIFIED K-FOLD CROSS-VALIDATION ON EACH BALANCED SAMPLE'
+	draw_numbers_and_fold_indices = [
+		(draw_number, indices[train_indices], indices[test_indices])
+		for draw_number, indices in enumerate(index_draws)
+		for train_indices, test_indices in StratifiedKFold(y[indices], n_folds=n_folds)
+	]
+	fold_confusion_matrices = Parallel(n_jobs=n_jobs)(
+		delayed(fit_and_compute_confusion_matrix)(ModelClass, model_arguments, X, y, train_indices, test_indices)
+		for draw_number, train_indices, test_indices in draw_numbers_and_fold_indices
+	)
+
+	# Combine the folds of each draw into a single confusion matrix
+	confusion_matrix_for_draw = numpy.zeros((sample_count, 2, 2), dtype=numpy.int)
+	for (draw_number, train_indices, test_indices), fold_confusion_matrix in zip(draw_numbers_and_fold_indices, fold_confusion_matrices):
+		confusion_matrix_for_draw[draw_number] += fold_confusion_matrix
+
+	print 'COMPUTING ACCURACY MEASURES'
+	measures_for_draw = numpy.array([precision_recall_and_accuracy(confusion) for confusion in confusion_matrix_for_draw])
+	print '\nCombined Confusion Matrix (C_ij = # samples in class i but predicted j)'
+	print confusion_matrix_for_draw.sum(axis=0)
+	print '\nMeasures Across ' + str(sample_count) + ' Balanced Samples (mean +/- standard deviation)'
+	for measure_name, values in zip(['Precision', 'Recall', 'Accuracy'], measures_for_draw.T):
+		print measure_name + ':\t' + format_as_percentage(values.mean()) + ' +/- ' + format_as_percentage(values.std())
+
+	if train_ensemble:
+		print '\nTRAINING BALANCED SAMPLE ENSEMBLE ON FULL TRAINING SET'
+		ensemble = BalancedSampleEnsemble(ModelClass, model_arguments=model_arguments, sample_count=sample_count, n_jobs=n_jobs)
+		ensemble.fit(X, y)
+		return ensemble
+
+
+
+def train_elite_status_classifier_incrementally(ModelClass, attributes, model_arguments={}, chunk_size=100000, epochs=1, scale_features=True):
+	"""
+	Given a constructor for a classifier object that supports partial_fit() and a list of user
+	attributes to use,
+		- Trains a classifier on the full (unbalanced) training dataset, streamed from file in chunks
+		- Tests the classifier on the full (unbalanced) test dataset, also streamed in chunks
+	and returns the classifier along with the feature scaler applied to its inputs (or None).
+
+	Instead of undersampling non-Elite users, each class is weighted inversely to its frequency,
+	so that both classes contribute equally to training. Only one chunk of users is held in
+	memory at a time.
+	"""
+	print '---------------------------------------------------------------------------------------'
+	print 'STARTING INCREMENTAL LEARNING PIPELINE'
+	print 'Model type: ' + ModelClass.__name__ + ' with arguments ' + str(model_arguments)
+	print 'Features: ' + ', '.join(attributes)
+	print 'Chunk size: ' + str(chunk_size) + ', epochs: ' + str(epochs)
+	print ''
+
+	attributes_to_read = attributes + ['label']
+
+	# First pass: class frequencies (for class weights) and feature means/variances (for scaling)
+	print 'COMPUTING CLASS WEIGHTS' + (' AND FEATURE SCALING' if scale_features else '')
+	label_counts = numpy.zeros(2, dtype=numpy.int)
+	scaler = StandardScaler() if scale_features else None
+	for user_rows_chunk in read_training_set_rows_in_chunks(attributes=attributes_to_read, chunk_size=chunk_size):
+		X_chunk, y_chunk = vectorize_user_rows(user_rows_chunk)
+		label_counts += numpy.bincount(y_chunk, minlength=2)
+		if scale_features:
+			scaler.partial_fit(X_chunk.astype(numpy.float))
+	weight_for_label = label_counts.sum() / (2.0 * numpy.maximum(label_counts, 1))
+	print 'Non-Elite users: ' + str(label_counts[0]) + ' (weight ' + str(weight_for_label[0]) + ')'
+	print 'Elite users: ' + str(label_counts[1]) + ' (weight ' + str(weight_for_label[1]) + ')'
+
+	print 'TRAINING CLASSIFIER MODEL INCREMENTALLY'
+	model = ModelClass(**model_arguments)
+	for epoch in xrange(epochs):
+		for user_rows_chunk in read_training_set_rows_in_chunks(attributes=attributes_to_read, chunk_size=chunk_size):
+			X_chunk, y_chunk = vectorize_user_rows(user_rows_chunk)
+			if scale_features:
+				X_chunk = scaler.transform(X_chunk.astype(numpy.float))
+			model.partial_fit(X_chunk, y_chunk, classes=[0,1], sample_weight=weight_for_label[y_chunk])
+
+	print 'TESTING ON TEST SET'
+	combined_confusion_matrix = numpy.zeros((2,2), dtype=numpy.int)
+	for user_rows_chunk in read_test_set_rows_in_chunks(attributes=attributes_to_read, chunk_size=chunk_size):
+		X_chunk, y_chunk = vectorize_user_rows(user_rows_chunk)
+		if scale_features:
+			X_chunk = scaler.transform(X_chunk.astype(numpy.float))
+		combined_confusion_matrix += binary_confusion_matrix(y_chunk, model.predict(X_chunk))
+
+	precision, recall, accuracy = precision_recall_and_accuracy(combined_confusion_matrix)
+	print '\nConfusion Matrix (C_ij = # samples in class i but predicted j)'
+	print combined_confusion_matrix
+	print '\nPrecision (Elite):\t' + format_as_percentage(precision)
+	print 'Recall (Elite):\t\t' + format_as_percentage(recall)
+	print 'Accuracy:\t\t' + format_as_percentage(accuracy)
+
+	return model, scaler
+
+
 
 # Current best: attributes=[review_count, average_stars, months_member, pagerank]
 # Accuracy on test data: ~91%
@@ -253,10 +434,13 @@ RANDOM_FOREST_ARGUMENTS = {
 	'n_estimators': 100,
 	'max_depth': 12,
 }
-def train_random_forest_elite_status_classifier():
-	"""Trains and validates a random forest model for predicting users' Elite status."""
+def train_random_forest_elite_status_classifier(feature_importances_file_name=None):
+	"""
+	Trains and validates a random forest model for predicting users' Elite status, and displays
+	its feature importances (or saves them to feature_importances_file_name, e.g. 'feature_importances.png').
+	"""
 	model = train_and_validate_elite_status_classifier(RandomForestClassifier, RANDOM_FOREST_USER_ATTRIBUTES, model_arguments=RANDOM_FOREST_ARGUMENTS)
-	show_feature_importances(model, RANDOM_FOREST_USER_ATTRIBUTES)
+	show_feature_importances(model, RANDOM_FOREST_USER_ATTRIBUTES, output_file_name=feature_importances_file_name)
 
 
 
@@ -288,6 +472,46 @@ def train_adaboost_elite_status_classifier():
 
 
 
+MODEL_CLASS_ATTRIBUTES_AND_ARGUMENTS_FOR_MODEL_NAME = {
+	'naive_bayes': (GaussianNB, NAIVE_BAYES_USER_ATTRIBUTES, {}),
+	'logistic_regression': (LogisticRegression, LOGISTIC_REGRESSION_USER_ATTRIBUTES, {}),
+	'SVM': (SVC, SVM_USER_ATTRIBUTES, {}),
+	'decision_tree': (DecisionTreeClassifier, DECISION_TREE_USER_ATTRIBUTES, {}),
+	'random_forest': (RandomForestClassifier, RANDOM_FOREST_USER_ATTRIBUTES, RANDOM_FOREST_ARGUMENTS),
+	'adaboost': (AdaBoostClassifier, ADABOOST_USER_ATTRIBUTES, ADABOOST_ARGUMENTS),
+}
+def measure_elite_status_classifier_permutation_importances(model_name='random_forest', attributes=[], repeats=30, n_jobs=-1, output_file_name=None):
+	"""
+	Measures the permutation importances (see measure_permutation_feature_importances) of the
+	attributes of one of the models above: 'naive_bayes', 'logistic_regression', 'SVM',
+	'decision_tree', 'random_forest' or 'adaboost'. By default, the model's own attributes are used.
+	"""
+	ModelClass, model_attributes, model_arguments = MODEL_CLASS_ATTRIBUTES_AND_ARGUMENTS_FOR_MODEL_NAME[model_name]
+	return measure_permutation_feature_importances(ModelClass, attributes or model_attributes, model_arguments=model_arguments, repeats=repeats, n_jobs=n_jobs, output_file_name=output_file_name)
+
+
+
+# Incremental (out-of-core) models, trained on the full unbalanced dataset with class weighting
+SGD_LOGISTIC_REGRESSION_ARGUMENTS = {
+	'loss': 'log',
+}
+SGD_LINEAR_SVM_ARGUMENTS = {
+	'loss': 'hinge',
+}
+def train_incremental_naive_bayes_elite_status_classifier():
+	"""Trains (out-of-core) and tests a naive Bayes model for predicting users' Elite status."""
+	model, scaler = train_elite_status_classifier_incrementally(GaussianNB, NAIVE_BAYES_USER_ATTRIBUTES, scale_features=False)
+
+def train_incremental_logistic_regression_elite_status_classifier():
+	"""Trains (out-of-core) and tests a logistic regression model (fit by SGD) for predicting users' Elite status."""
+	model, scaler = train_elite_status_classifier_incrementally(SGDClassifier, LOGISTIC_REGRESSION_USER_ATTRIBUTES, model_arguments=SGD_LOGISTIC_REGRESSION_ARGUMENTS, epochs=5)
+
+def train_incremental_linear_SVM_elite_status_classifier():
+	"""Trains (out-of-core) and tests a linear support vector machine (fit by SGD) for predicting users' Elite status."""
+	model, scaler = train_elite_status_classifier_incrementally(SGDClassifier, SVM_USER_ATTRIBUTES, model_arguments=SGD_LINEAR_SVM_ARGUMENTS, epochs=5)
+
+
+
 def classify_by_review_count(minimum_reviews_for_elite=48):
 	""" Classifies solely by the number of reviews. """
 	users = load_training_set()
@@ -303,6 +527,33 @@ def classify_by_review_count(minimum_reviews_for_elite=48):
 	print 'Recall: ', format_as_percentage( float(len(recalled_positives)) / len(all_positives) )
 
 
+def classify_by_attribute_threshold_sweep(attribute='review_count', predict_elite_above=True, measure_to_optimize='accuracy'):
+	"""
+	Classifies solely by a single attribute, evaluating every possible threshold at once:
+		predict Elite  <=>  attribute value >= threshold	(or <= threshold, if predict_elite_above is False)
+
+	Prints the threshold that maximizes measure_to_optimize ('accuracy', 'precision' or 'recall')
+	and returns the full curve, as numpy arrays:
+		thresholds, accuracies, precisions, recalls
+	"""
+	users = load_training_set()
+	values, labels = vectorize_users(users, [attribute])
+	values = values[:,0] if predict_elite_above else -values[:,0]
+
+	thresholds, accuracies, precisions, recalls = threshold_sweep(values, labels)
+	if not predict_elite_above:
+		thresholds = -thresholds
+
+	measures = {'accuracy': accuracies, 'precision': precisions, 'recall': recalls}[measure_to_optimize]
+	best_index = numpy.argmax(measures)
+	print 'Best threshold for ' + attribute + ' (by ' + measure_to_optimize + '): ' + ('>= ' if predict_elite_above else '<= ') + str(thresholds[best_index])
+	print 'Accuracy: ', format_as_percentage(accuracies[best_index])
+	print 'Precision: ', format_as_percentage(precisions[best_index])
+	print 'Recall: ', format_as_percentage(recalls[best_index])
+
+	return thresholds, accuracies, precisions, recalls
+
+
 
 if __name__ == "__main__":
 	train_decision_tree_elite_status_classifier()
@@ -2,6 +2,7 @@
 Tools for analyzing the Yelp social network.
 """
 from utilities import *
+from graph_utilities import *
 from data.data_interface import *
 
 from analysis_utilities import *
@@ -12,25 +13,37 @@ def analyze_user_graph(
 	user_pageranks_file_name=DEFAULT_PAGERANKS_FILE_NAME,
 	show_degree_histogram=True,
 	show_pagerank_histogram=False,
+	histogram_file_format=None,
+	random_seed=0,
 ):
 	"""
 	Computes and visualizes statistics on the Yelp user graph.
+
+	The histograms are displayed, or if histogram_file_format is given (e.g. 'png' or 'svg'),
+	written to analysis_results/node_degree_histogram.<format> and
+	analysis_results/node_pagerank_histogram.<format>, so no display is needed. PageRanks are
+	streamed from their file and binned chunk by chunk. The clustering coefficient and
+	transitivity are estimated from samples drawn with random_seed.
 	"""
 	print 'READING IN YELP USER GRAPH'
-	graph = read_user_graph(input_file_name=user_graph_file_name)
+	user_IDs, sources, targets = load_user_edge_arrays(input_file_name=user_graph_file_name)
 
 	print 'COMPUTING GRAPH PROPERTIES'
-	edge_density = networkx.density(graph)
-	node_degrees = [graph.degree(node) for node in graph.nodes_iter()]
-	maximum_degree = max(node_degrees)
-
-	print 'READING IN PAGERANKS'
-	pagerank_for_node = read_user_pageranks(input_file_name=user_pageranks_file_name)
-	maximum_pagerank = max(pagerank_for_node.itervalues())
+	statistics = graph_statistics(sources, targets, node_count=len(user_IDs), random_seed=random_seed)
+	node_degrees = statistics['degrees']
+	maximum_degree = node_degrees.max() if len(node_degrees) else 0
 
 	print '\n============================================================================'
 	print 'YELP USER GRAPH STATISTICS'
-	print 'Edge density: ' + str(edge_density)
+	print 'Nodes: ' + str(statistics['node_count'])
+	print 'Edges: ' + str(statistics['edge_count'])
+	print 'Edge density: ' + str(statistics['edge_density'])
+	print 'Maximum degree: ' + str(maximum_degree)
+	print 'Connected components: ' + str(len(statistics['component_sizes']))
+	print 'Largest connected component: ' + str(statistics['component_sizes'][0] if len(statistics['component_sizes']) else 0) + ' nodes'
+	print 'Average clustering coefficient (estimated): ' + str(statistics['average_clustering'])
+	print 'Transitivity (estimated): ' + str(statistics['transitivity'])
+	print 'Maximum core number: ' + str(statistics['core_numbers'].max() if len(statistics['core_numbers']) else 0)
 
 	print '\n============================================================================'
 	print 'COMPUTING HISTOGRAMS'
@@ -38,15 +51,22 @@ def analyze_user_graph(
 	if show_degree_histogram:
 		bin_width = 1
 		maximum_degree_shown = 50
-		show_histogram(values=node_degrees, value_name='Node Degree', bins=range(-1, maximum_degree_shown, bin_width), range_to_display=(-1, maximum_degree_shown + 1))
+		show_histogram(
+			values=node_degrees,
+			value_name='Node Degree',
+			bins=range(-1, maximum_degree_shown, bin_width),
+			range_to_display=(-1, maximum_degree_shown + 1),
+			output_file_name=histogram_file_format and 'node_degree_histogram.' + histogram_file_format,
+		)
 
 	if show_pagerank_histogram:
 		show_histogram_with_broken_y_axis(
-			values=pagerank_for_node.values(),
+			values=read_user_pageranks_in_chunks(input_file_name=user_pageranks_file_name),
 			value_name='PageRank',
 			bins=50,
 			range_to_display=(0, 5.0e-6),
-			cutout=(6.0e4,3.0e5)
+			cutout=(6.0e4,3.0e5),
+			output_file_name=histogram_file_format and 'node_pagerank_histogram.' + histogram_file_format,
 		)
 
 
@@ -0,0 +1,227 @@
+"""
+Tools for finding similar users (e.g. the users most like a given Elite user) by nearest-neighbour
+search over their normalized attribute vectors.
+"""
+import cPickle
+import time
+
+from utilities import *
+from data.data_interface import *
+
+from analysis_utilities import *
+
+KDTree = LazyAttribute('sklearn.neighbors', 'KDTree')
+BallTree = LazyAttribute('sklearn.neighbors', 'BallTree')
+
+
+# Attributes compared between users (all numeric attributes in the combined users file)
+SIMILARITY_USER_ATTRIBUTES = [ attribute for attribute in ALL_USER_ATTRIBUTES if attribute not in ['ID', 'years_elite'] ]
+
+# Space-partitioning trees prune fewer branches as dimension grows: KD-trees work best in few
+# dimensions, ball trees in somewhat more, and beyond that neither beats a brute-force scan
+KD_TREE_MAXIMUM_DIMENSION = 15
+BALL_TREE_MAXIMUM_DIMENSION = 40
+
+# Memory for each block of brute-force query-to-user distances (queries per block = this / (8 * user count))
+BRUTE_FORCE_BLOCK_BYTES = 64 * 2**20
+
+
+class UserSimilarityIndex(object):
+	"""
+	A nearest-neighbour index over users' attribute vectors, each attribute min-max normalized to
+	[0, 1] (as in normalize_users) so that no attribute dominates the Euclidean distances.
+
+	algorithm is one of
+		'kd_tree', 'ball_tree' : a scikit-learn KDTree or BallTree, for low-dimensional vectors
+		'brute' : a scan of all users, computing the distances of a block of queries at once as
+			||q||^2 - 2 q.x + ||x||^2, with a single matrix product (BLAS) per block
+		'auto' : chooses by the number of attributes (see KD_TREE_MAXIMUM_DIMENSION, BALL_TREE_MAXIMUM_DIMENSION)
+
+	Queries restricted to Elite users always scan the (few) Elite users by brute force.
+	"""
+
+	def __init__(self, user_IDs, X, attributes, is_elite=None, algorithm='auto', leaf_size=40):
+		self.user_IDs = list(user_IDs)
+		self.attributes = list(attributes)
+		self.index_for_user_ID = { user_ID: user_index for user_index, user_ID in enumerate(self.user_IDs) }
+		self.is_elite = numpy.zeros(len(self.user_IDs), dtype=bool) if is_elite is None else numpy.asarray(is_elite, dtype=bool)
+
+		self.vectors, self.minimums, self.ranges = normalize_user_vectors(X)
+		self.squared_norms = (self.vectors ** 2).sum(axis=1)
+
+		if algorithm == 'auto':
+			dimension = self.vectors.shape[1]
+			algorithm = 'kd_tree' if dimension <= KD_TREE_MAXIMUM_DIMENSION else 'ball_tree' if dimension <= BALL_TREE_MAXIMUM_DIMENSION else 'brute'
+		self.algorithm = algorithm
+
+		if algorithm == 'kd_tree':
+			self.tree = KDTree(self.vectors, leaf_size=leaf_size)
+		elif algorithm == 'ball_tree':
+			self.tree = BallTree(self.vectors, leaf_size=leaf_size)
+		elif algorithm == 'brute':
+			self.tree = None
+		else:
+			raise ValueError('Unknown nearest-neighbour algorithm: ' + str(algorithm))
+
+	def user_vectors(self, user_IDs):
+		"""Given a list of indexed user IDs, returns a numpy array of their normalized attribute vectors."""
+		return self.vectors[[ self.index_for_user_ID[user_ID] for user_ID in user_IDs ]]
+
+	def normalize_vectors(self, X):
+		"""Given a numpy array of raw attribute vectors (e.g. of users not in the index), returns them normalized like the indexed users."""
+		return normalize_user_vectors(X, self.minimums, self.ranges)[0]
+
+	def query_vectors(self, vectors, k=10, elite_only=False):
+		"""
+		Given a numpy array of normalized attribute vectors, returns numpy arrays
+			distances : distances[i, j] is the distance from vector i to its (j+1)th nearest user
+			indices : indices[i, j] is the index (into user_IDs) of that user
+		for the k nearest users (or Elite users, if elite_only) of each vector, nearest first.
+		"""
+		vectors = numpy.atleast_2d(numpy.asarray(vectors, dtype=numpy.float64))
+		if elite_only:
+			return self._brute_force_query(vectors, k, candidate_indices=numpy.flatnonzero(self.is_elite))
+		if self.tree is None:
+			return self._brute_force_query(vectors, k)
+		return self.tree.query(vectors, k=min(k, len(self.user_IDs)))
+
+	def most_similar_users(self, user_ID, k=10, elite_only=False):
+		"""
+		Given an indexed user ID, returns a list of (user ID, distance) for the k users (or Elite
+		users, if elite_only) most similar to the user, excluding the user, nearest first.
+		"""
+		return self.most_similar_users_for_each([user_ID], k=k, elite_only=elite_only)[0]
+
+	def most_similar_users_for_each(self, user_IDs, k=10, elite_only=False):
+		"""
+		Given a list of indexed user IDs, returns a list holding, for each user, a list of
+		(user ID, distance) as in most_similar_users(). All users are queried at once, which is much
+		faster than one query per user.
+		"""
+		distances, indices = self.query_vectors(self.user_vectors(user_IDs), k=k+1, elite_only=elite_only)
+
+		similar_users_for_each = []
+		for user_ID, user_distances, user_indices in itertools.izip(user_IDs, distances.tolist(), indices.tolist()):
+			similar_users = [ (self.user_IDs[user_index], distance) for user_index, distance in zip(user_indices, user_distances) if self.user_IDs[user_index] != user_ID ]
+			similar_users_for_each += [ similar_users[:k] ]
+		return similar_users_for_each
+
+	def save(self, output_file_name=DEFAULT_SIMILARITY_INDEX_FILE_NAME):
+		"""Writes the index (including any tree, which need not be rebuilt) to a processed data file."""
+		with open_processed_output_file(output_file_name) as output_file:
+			cPickle.dump(self, output_file, cPickle.HIGHEST_PROTOCOL)
+
+	@staticmethod
+	def load(input_file_name=DEFAULT_SIMILARITY_INDEX_FILE_NAME):
+		"""Returns an index written by save()."""
+		with open(processed_data_absolute_path(input_file_name), 'rb') as input_file:
+			return cPickle.load(input_file)
+
+	def _brute_force_query(self, vectors, k, candidate_indices=None):
+		"""Returns (distances, indices) as in query_vectors(), by scanning all users (or only those at candidate_indices)."""
+		if candidate_indices is None:
+			candidate_indices = numpy.arange(len(self.user_IDs))
+		candidate_vectors = self.vectors[candidate_indices]
+		candidate_squared_norms = self.squared_norms[candidate_indices]
+		k = min(k, len(candidate_indices))
+
+		distances = numpy.empty((len(vectors), k))
+		indices = numpy.empty((len(vectors), k), dtype=numpy.int64)
+		if k == 0:
+			return distances, indices
+
+		queries_per_block = max(BRUTE_FORCE_BLOCK_BYTES // (8 * len(candidate_indices)), 1)
+		for block_start in xrange(0, len(vectors), queries_per_block):
+			block = vectors[block_start:block_start + queries_per_block]
+			squared_distances = (block ** 2).sum(axis=1)[:,numpy.newaxis] - 2 * block.dot(candidate_vectors.T) + candidate_squared_norms
+			numpy.maximum(squared_distances, 0, out=squared_distances)
+
+			# Select the k nearest candidates of each query in linear time, then sort only those
+			block_rows = numpy.arange(len(block))[:,numpy.newaxis]
+			nearest = numpy.argpartition(squared_distances, k - 1, axis=1)[:,:k]
+			nearest = nearest[block_rows, numpy.argsort(squared_distances[block_rows, nearest], axis=1)]
+
+			distances[block_start:block_start + len(block)] = numpy.sqrt(squared_distances[block_rows, nearest])
+			indices[block_start:block_start + len(block)] = candidate_indices[nearest]
+
+		return distances, indices
+
+
+
+def build_user_similarity_index(
+	attributes=SIMILARITY_USER_ATTRIBUTES,
+	algorithm='auto',
+	input_users_file_name=DEFAULT_COMBINED_USERS_FILE_NAME,
+	output_file_name=DEFAULT_SIMILARITY_INDEX_FILE_NAME,
+	chunk_size=100000,
+):
+	"""
+	Builds a UserSimilarityIndex over the given attributes of all users in the combined users file,
+	writes it to a processed data file, and returns it.
+	"""
+	print 'READING USERS'
+	user_IDs = []
+	is_elite = []
+	vector_chunks = []
+	for user_rows in read_combined_users_rows_in_chunks(input_file_name=input_users_file_name, attributes=['ID', 'years_elite'] + list(attributes), chunk_size=chunk_size):
+		user_IDs += [ user_row[0] for user_row in user_rows ]
+		is_elite += [ user_row[1] > 0 for user_row in user_rows ]
+		vector_chunks += [ numpy.array([ user_row[2:] for user_row in user_rows ], dtype=numpy.float64) ]
+
+	print 'BUILDING INDEX'
+	start_time = time.time()
+	index = UserSimilarityIndex(user_IDs, numpy.vstack(vector_chunks), attributes, is_elite=is_elite, algorithm=algorithm)
+	print 'Indexed {} users ({} attributes) with {} in {:.2f}s'.format(len(user_IDs), len(attributes), index.algorithm, time.time() - start_time)
+
+	print 'WRITING INDEX'
+	index.save(output_file_name)
+	return index
+
+
+def find_similar_experts(user_ID, k=10, elite_only=True, index_file_name=DEFAULT_SIMILARITY_INDEX_FILE_NAME):
+	"""
+	Given a user ID, prints and returns a list of (user ID, distance) for the k Elite users (or any
+	users, if not elite_only) most similar to the user, using the index in the given file.
+	"""
+	index = UserSimilarityIndex.load(index_file_name)
+	similar_users = index.most_similar_users(user_ID, k=k, elite_only=elite_only)
+
+	print ('ELITE ' if elite_only else '') + 'USERS MOST SIMILAR TO ' + user_ID
+	for similar_user_ID, distance in similar_users:
+		print similar_user_ID + '\t{:.4f}'.format(distance)
+	return similar_users
+
+
+def measure_user_similarity_query_latency(k=10, sample_size=1000, random_seed=0, index_file_name=DEFAULT_SIMILARITY_INDEX_FILE_NAME):
+	"""
+	Times k-nearest-neighbour queries against the index in the given file (over the full user
+	base) for a random sample of sample_size users, both one user at a time and as a single batch,
+	and prints the latencies.
+	"""
+	print 'LOADING INDEX'
+	start_time = time.time()
+	index = UserSimilarityIndex.load(index_file_name)
+	print 'Loaded index of {} users ({}) in {:.2f}s'.format(len(index.user_IDs), index.algorithm, time.time() - start_time)
+
+	sample_user_IDs = random.Random(random_seed).sample(index.user_IDs, min(sample_size, len(index.user_IDs)))
+
+	print 'TIMING SINGLE QUERIES'
+	latencies = []
+	for user_ID in sample_user_IDs:
+		start_time = time.time()
+		index.most_similar_users(user_ID, k=k)
+		latencies += [ time.time() - start_time ]
+	latencies = numpy.array(latencies) * 1000
+	print 'Per query: median {:.3f}ms, 99th percentile {:.3f}ms, maximum {:.3f}ms'.format(numpy.median(latencies), numpy.percentile(latencies, 99), latencies.max())
+
+	print 'TIMING BATCH QUERY'
+	start_time = time.time()
+	index.most_similar_users_for_each(sample_user_IDs, k=k)
+	batch_seconds = time.time() - start_time
+	print '{} queries in {:.3f}s ({:.3f}ms per query)'.format(len(sample_user_IDs), batch_seconds, 1000 * safe_divide(batch_seconds, len(sample_user_IDs)))
+
+	print 'TIMING ELITE-ONLY BATCH QUERY'
+	start_time = time.time()
+	index.most_similar_users_for_each(sample_user_IDs, k=k, elite_only=True)
+	batch_seconds = time.time() - start_time
+	print '{} queries over {} Elite users in {:.3f}s ({:.3f}ms per query)'.format(len(sample_user_IDs), index.is_elite.sum(), batch_seconds, 1000 * safe_divide(batch_seconds, len(sample_user_IDs)))
@@ -0,0 +1,195 @@
+"""
+Benchmarks of the data processing and analysis pipeline (every extraction stage, the loaders, and
+every classifier trainer) on synthetic Yelp-shaped datasets of several sizes.
+
+Open a Python shell from the project root and execute:
+	>>> from benchmarks.benchmark_pipeline import *
+	>>> run_pipeline_benchmarks(user_counts=[1000, 10000, 100000])
+
+Each run writes a results file to benchmarks/results/. To track regressions, compare two runs:
+	>>> compare_benchmark_results('benchmark_<old run>.tsv', 'benchmark_<new run>.tsv')
+"""
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from functools import partial
+from StringIO import StringIO
+
+from utilities import *
+from data import data_utilities
+from data.data_processing import *
+from data.synthetic_data import generate_synthetic_dataset
+from analysis.user_elite_analysis import *
+
+THIS_FILE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_BENCHMARK_USER_COUNTS = [1000, 10000, 100000]
+
+# (stage name, function of no arguments), run in order on each synthetic dataset
+EXTRACTION_BENCHMARK_STAGES = [
+	('extract_user_basic_attributes', extract_user_basic_attributes),
+	('extract_user_average_review_lengths', extract_user_average_review_lengths),
+	('extract_syllable_lexicon', extract_syllable_lexicon),
+	('extract_user_reading_levels', extract_user_reading_levels),
+	('extract_user_tip_counts', extract_user_tip_counts),
+	('extract_user_edge_arrays', extract_user_edge_arrays),
+	('extract_user_pageranks', extract_user_pageranks),
+	('extract_user_business_review_features', extract_user_business_review_features),
+	('extract_user_temporal_review_statistics', extract_user_temporal_review_statistics),
+	('extract_user_review_distribution_features', extract_user_review_distribution_features),
+	('extract_user_text_features', extract_user_text_features),
+	('combine_all_user_data', combine_all_user_data),
+	('create_training_and_test_sets', partial(create_training_and_test_sets, fraction_for_training=0.8)),
+	('extract_user_graph_centralities', extract_user_graph_centralities),
+]
+LOADER_BENCHMARK_STAGES = [
+	('read_user_graph', read_user_graph),
+	('load_user_edge_arrays', load_user_edge_arrays),
+	('read_combined_users', read_combined_users),
+	('read_training_set', read_training_set),
+	('read_training_set_rows_in_chunks', lambda: sum(len(user_rows_chunk) for user_rows_chunk in read_training_set_rows_in_chunks())),
+	('load_training_set', load_training_set),
+	('load_test_set', load_test_set),
+]
+CLASSIFIER_BENCHMARK_STAGES = [
+	('naive_bayes', partial(train_and_validate_elite_status_classifier, GaussianNB, NAIVE_BAYES_USER_ATTRIBUTES)),
+	('logistic_regression', partial(train_and_validate_elite_status_classifier, LogisticRegression, LOGISTIC_REGRESSION_USER_ATTRIBUTES)),
+	('SVM', partial(train_and_validate_elite_status_classifier, SVC, SVM_USER_ATTRIBUTES)),
+	('decision_tree', partial(train_and_validate_elite_status_classifier, DecisionTreeClassifier, DECISION_TREE_USER_ATTRIBUTES)),
+	('random_forest', partial(train_and_validate_elite_status_classifier, RandomForestClassifier, RANDOM_FOREST_USER_ATTRIBUTES, model_arguments=RANDOM_FOREST_ARGUMENTS)),
+	('adaboost', partial(train_and_validate_elite_status_classifier, AdaBoostClassifier, ADABOOST_USER_ATTRIBUTES, model_arguments=ADABOOST_ARGUMENTS)),
+	('incremental_naive_bayes', train_incremental_naive_bayes_elite_status_classifier),
+	('incremental_logistic_regression', train_incremental_logistic_regression_elite_status_classifier),
+	('incremental_linear_SVM', train_incremental_linear_SVM_elite_status_classifier),
+]
+ALL_BENCHMARK_STAGES = EXTRACTION_BENCHMARK_STAGES + LOADER_BENCHMARK_STAGES + CLASSIFIER_BENCHMARK_STAGES
+
+
+def run_pipeline_benchmarks(user_counts=DEFAULT_BENCHMARK_USER_COUNTS, stages=ALL_BENCHMARK_STAGES, output_file_name=None, random_seed=0, keep_data=False, raise_errors=False):
+	"""
+	For each number of users in user_counts, generates a synthetic dataset of that size in a
+	temporary folder, then runs and times each (stage name, function) in stages, in order.
+
+	Writes a tab-separated results file (to benchmarks/results/, named by the current time unless
+	output_file_name is given) with one row per dataset size and stage:
+		user_count stage seconds status
+	where status is 'ok' or the type and message of the exception the stage raised, whose
+	traceback is also printed and written below the row. Lines starting with '#' describe the run
+	(commit, Python version, CPU count) or hold tracebacks. Returns the path of the results file.
+	If raise_errors, the first exception raised by a stage stops the run instead.
+
+	While benchmarking, all raw_data/ and processed_data/ paths point into the temporary folder,
+	so the real dataset and processed files are never read or overwritten.
+	"""
+	results_folder_path = os.path.join(THIS_FILE_PATH, 'results')
+	if not os.path.exists(results_folder_path):
+		os.makedirs(results_folder_path)
+	output_file_name = output_file_name or time.strftime('benchmark_%Y%m%d_%H%M%S.tsv')
+	output_file_path = os.path.join(results_folder_path, output_file_name)
+
+	with open(output_file_path, 'w') as results_file:
+		results_file.write('# commit: ' + _current_commit() + '\n')
+		results_file.write('# python: ' + platform.python_version() + ', cpus: ' + str(multiprocessing.cpu_count()) + ', platform: ' + platform.platform() + '\n')
+		results_file.write('user_count\tstage\tseconds\tstatus\n')
+
+		for user_count in user_counts:
+			print 'BENCHMARKING ' + str(user_count) + ' USERS'
+			data_folder_path = tempfile.mkdtemp(prefix='yelp_benchmark_')
+			original_data_folder_path = data_utilities.THIS_FILE_PATH
+			try:
+				data_utilities.THIS_FILE_PATH = data_folder_path
+				os.makedirs(raw_data_absolute_path(''))
+				os.makedirs(processed_data_absolute_path(''))
+				CACHE.update({ cache_key: None for cache_key in CACHE })
+
+				generation_start_time = time.time()
+				counts = generate_synthetic_dataset(user_count=user_count, random_seed=random_seed)
+				print 'Generated ' + ', '.join( '{} {}'.format(count, kind) for kind, count in sorted(counts.items()) ) + ' in {:.1f}s'.format(time.time() - generation_start_time)
+
+				for stage_name, run_stage in stages:
+					seconds, status, error_traceback = _time_stage(run_stage, random_seed, raise_errors=raise_errors)
+					print '{:<45}{:>10.2f}s  {}'.format(stage_name, seconds, status)
+					results_file.write('{}\t{}\t{:.4f}\t{}\n'.format(user_count, stage_name, seconds, status))
+					if error_traceback:
+						print error_traceback
+						results_file.writelines( '# ' + line + '\n' for line in error_traceback.splitlines() )
+					results_file.flush()
+			finally:
+				data_utilities.THIS_FILE_PATH = original_data_folder_path
+				CACHE.update({ cache_key: None for cache_key in CACHE })
+				if keep_data:
+					print 'Synthetic data kept in ' + data_folder_path
+				else:
+					shutil.rmtree(data_folder_path)
+
+	print 'Results written to ' + output_file_path
+	return output_file_path
+
+
+def compare_benchmark_results(baseline_file_name, current_file_name):
+	"""
+	Given the names of two results files in benchmarks/results/, prints each stage's time in both
+	runs and their ratio (current / baseline), for the dataset sizes and stages present in both.
+	"""
+	baseline_seconds = _read_benchmark_results(baseline_file_name)
+	current_seconds = _read_benchmark_results(current_file_name)
+
+	print '{:>10}  {:<45}{:>12}{:>12}{:>8}'.format('users', 'stage', 'baseline', 'current', 'ratio')
+	for user_count, stage_name in sorted(set(baseline_seconds) & set(current_seconds)):
+		baseline, current = baseline_seconds[(user_count, stage_name)], current_seconds[(user_count, stage_name)]
+		print '{:>10}  {:<45}{:>11.2f}s{:>11.2f}s{:>8.2f}'.format(user_count, stage_name, baseline, current, safe_divide(current, baseline, default_value=float('nan')))
+
+
+def _read_benchmark_results(input_file_name):
+	"""Returns a dictionary { (user count, stage name): seconds } of the successful stages in a results file."""
+	seconds_for_user_count_and_stage = {}
+	with open(os.path.join(THIS_FILE_PATH, 'results', input_file_name)) as results_file:
+		for line in results_file:
+			if line.startswith('#') or line.startswith('user_count'):
+				continue
+			user_count, stage_name, seconds, status = line.rstrip('\n').split('\t')
+			if status == 'ok':
+				seconds_for_user_count_and_stage[(int(user_count), stage_name)] = float(seconds)
+	return seconds_for_user_count_and_stage
+
+
+def _time_stage(run_stage, random_seed, raise_errors=False):
+	"""
+	Runs a stage (with its printed output suppressed) and returns (seconds taken, status, traceback),
+	where status is 'ok' or the type and message (on one line) of the exception raised, and traceback
+	is the exception's formatted traceback (None if the stage succeeded). If raise_errors, the
+	exception is re-raised instead.
+	"""
+	random.seed(random_seed)
+	numpy.random.seed(random_seed)
+
+	standard_output = sys.stdout
+	sys.stdout = StringIO()
+	start_time = time.time()
+	error_traceback = None
+	try:
+		run_stage()
+		status = 'ok'
+	except Exception as error:
+		if raise_errors:
+			raise
+		status = ' '.join( (type(error).__name__ + ': ' + str(error)).split() )
+		error_traceback = traceback.format_exc().rstrip()
+	finally:
+		seconds = time.time() - start_time
+		sys.stdout = standard_output
+
+	return seconds, status, error_traceback
+
+
+def _current_commit():
+	"""Returns the current git commit of the project, or 'unknown'."""
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=THIS_FILE_PATH, stderr=subprocess.STDOUT).strip()
+	except (OSError, subprocess.CalledProcessError):
+		return 'unknown'
@@ -0,0 +1,88 @@
+"""
+Benchmark of the project's startup time: how long importing each module (and starting the
+command-line entry point) takes in a fresh Python process, checked against a budget.
+
+Heavy libraries (NetworkX, matplotlib, scikit-learn, NLTK, pydot) are imported on first use, so
+importing a module should cost little more than NumPy and SciPy. From the project root, execute:
+	python cli.py measure_startup_times
+which exits with an error if any module is over budget.
+"""
+import os
+import subprocess
+import sys
+import time
+
+import numpy
+
+THIS_FILE_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.dirname(THIS_FILE_PATH)
+
+# Seconds that importing any module (or starting cli.py) may take, beyond starting Python itself
+STARTUP_TIME_BUDGET_SECONDS = 0.5
+
+STARTUP_BENCHMARK_MODULES = [
+	'utilities',
+	'graph_utilities',
+	'data.data_interface',
+	'data.data_processing',
+	'data.synthetic_data',
+	'analysis.user_elite_analysis',
+	'analysis.user_graph_analysis',
+	'analysis.user_similarity_analysis',
+	'benchmarks.benchmark_pipeline',
+]
+
+
+def measure_startup_times(repetitions=5, budget_seconds=STARTUP_TIME_BUDGET_SECONDS):
+	"""
+	Times, in repetitions fresh Python processes each, importing every module in
+	STARTUP_BENCHMARK_MODULES and running 'python cli.py --help', and prints the median times
+	(beyond the time to start Python itself) and which heavy libraries each import loaded.
+
+	Raises SystemExit (with an error) if any median time exceeds budget_seconds.
+	"""
+	interpreter_seconds = numpy.median([ _process_seconds([sys.executable, '-c', 'pass']) for repetition in xrange(repetitions) ])
+	print 'Starting Python takes {:.3f}s (not counted below); budget: {:.3f}s'.format(interpreter_seconds, budget_seconds)
+
+	over_budget = []
+	for module_name in STARTUP_BENCHMARK_MODULES:
+		import_seconds_and_libraries = [ _import_seconds_and_heavy_libraries(module_name) for repetition in xrange(repetitions) ]
+		seconds = numpy.median([ import_seconds for import_seconds, libraries in import_seconds_and_libraries ])
+		libraries = import_seconds_and_libraries[0][1]
+		print '{:<45}{:>8.3f}s  {}{}'.format('import ' + module_name, seconds, 'OVER BUDGET ' if seconds > budget_seconds else '', ' '.join(libraries))
+		if seconds > budget_seconds:
+			over_budget += [module_name]
+
+	seconds = numpy.median([ _process_seconds([sys.executable, 'cli.py', '--help']) for repetition in xrange(repetitions) ]) - interpreter_seconds
+	print '{:<45}{:>8.3f}s  {}'.format('python cli.py --help', seconds, 'OVER BUDGET' if seconds > budget_seconds else '')
+	if seconds > budget_seconds:
+		over_budget += ['cli.py']
+
+	if over_budget:
+		raise SystemExit('Over the startup time budget of {}s: {}'.format(budget_seconds, ', '.join(over_budget)))
+
+
+# Libraries that are slow to import, and should only be imported by the code that uses them
+HEAVY_LIBRARIES = ['networkx', 'matplotlib', 'sklearn', 'nltk', 'pydot']
+
+IMPORT_TIMING_PROGRAM = '''
+import sys, time
+start_time = time.time()
+import {module_name}
+print time.time() - start_time
+print ' '.join(library for library in {heavy_libraries!r} if library in sys.modules)
+'''
+
+def _import_seconds_and_heavy_libraries(module_name):
+	"""Returns the seconds taken to import a module in a fresh Python process, and a list of the heavy libraries it imported."""
+	output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', IMPORT_TIMING_PROGRAM.format(module_name=module_name, heavy_libraries=HEAVY_LIBRARIES)], cwd=PROJECT_PATH)
+	seconds, libraries = (output.splitlines() + [''])[:2]
+	return float(seconds), libraries.split()
+
+
+def _process_seconds(command):
+	"""Returns the seconds taken to run a command (from the project root) to completion."""
+	with open(os.devnull, 'w') as null_file:
+		start_time = time.time()
+		subprocess.check_call(command, cwd=PROJECT_PATH, stdout=null_file, stderr=null_file)
+		return time.time() - start_time
@@ -0,0 +1,166 @@
+"""
+Command-line entry point to the data processing pipeline, the classifiers and the other analyses.
+From the project root, execute:
+	python cli.py --help                        (lists the commands)
+	python cli.py <command> --help              (describes a command and its options)
+	python cli.py extract_user_tip_counts
+	python cli.py extract_user_reading_levels --reviews_to_analyze_per_user 10
+	python cli.py find_similar_experts <user ID> --k 5
+
+Each command is the function of the same name, and its options are the function's keyword
+arguments. Only the module of the chosen command is imported (and the heavy libraries it uses
+are imported on first use), so short commands start quickly.
+"""
+import argparse
+import importlib
+import inspect
+import sys
+import time
+from collections import OrderedDict
+
+
+# Module of each command, grouped as listed by --help
+MODULE_FOR_COMMAND = OrderedDict()
+for module_name, command_names in [
+	('data.data_processing', [
+		'extract_user_basic_attributes',
+		'extract_user_average_review_lengths',
+		'extract_syllable_lexicon',
+		'extract_user_reading_levels',
+		'extract_user_tip_counts',
+		'extract_user_edge_arrays',
+		'extract_user_pageranks',
+		'extract_user_graph_centralities',
+		'extract_user_business_review_features',
+		'extract_user_temporal_review_statistics',
+		'extract_user_review_distribution_features',
+		'extract_user_text_features',
+		'combine_all_user_data',
+		'create_training_and_test_sets',
+		'build_dataset_concurrently',
+	]),
+	('data.synthetic_data', [
+		'generate_synthetic_dataset',
+	]),
+	('analysis.user_elite_analysis', [
+		'train_naive_bayes_elite_status_classifier',
+		'train_logistic_regression_elite_status_classifier',
+		'train_SVM_elite_status_classifier',
+		'train_decision_tree_elite_status_classifier',
+		'train_random_forest_elite_status_classifier',
+		'train_adaboost_elite_status_classifier',
+		'train_incremental_naive_bayes_elite_status_classifier',
+		'train_incremental_logistic_regression_elite_status_classifier',
+		'train_incremental_linear_SVM_elite_status_classifier',
+		'measure_elite_status_classifier_permutation_importances',
+		'classify_by_review_count',
+		'classify_by_attribute_threshold_sweep',
+	]),
+	('analysis.user_graph_analysis', [
+		'analyze_user_graph',
+	]),
+	('analysis.user_similarity_analysis', [
+		'build_user_similarity_index',
+		'find_similar_experts',
+		'measure_user_similarity_query_latency',
+	]),
+	('benchmarks.benchmark_pipeline', [
+		'run_pipeline_benchmarks',
+		'compare_benchmark_results',
+	]),
+	('benchmarks.benchmark_startup', [
+		'measure_startup_times',
+	]),
+]:
+	for command_name in command_names:
+		MODULE_FOR_COMMAND[command_name] = module_name
+
+
+def main(arguments=None):
+	"""Runs the command given by the command-line arguments (sys.argv[1:] by default)."""
+	arguments = sys.argv[1:] if arguments is None else arguments
+
+	if not arguments or arguments[0] in ('-h', '--help') or arguments[0] not in MODULE_FOR_COMMAND:
+		if arguments and arguments[0] not in ('-h', '--help'):
+			print 'Unknown command: ' + arguments[0] + '\n'
+		print_commands()
+		return 0 if arguments and arguments[0] in ('-h', '--help') else 2
+
+	command_name = arguments[0]
+	command = getattr(importlib.import_module(MODULE_FOR_COMMAND[command_name]), command_name)
+	keyword_arguments = vars(command_argument_parser(command_name, command).parse_args(arguments[1:]))
+
+	start_time = time.time()
+	command(**keyword_arguments)
+	print '{} finished in {:.1f}s'.format(command_name, time.time() - start_time)
+	return 0
+
+
+def print_commands():
+	"""Prints the usage and the available commands, grouped by module."""
+	print 'usage: python cli.py <command> [options]    (python cli.py <command> --help for details)'
+	current_module_name = None
+	for command_name, module_name in MODULE_FOR_COMMAND.iteritems():
+		if module_name != current_module_name:
+			print '\n' + module_name + ':'
+			current_module_name = module_name
+		print '  ' + command_name
+
+
+def command_argument_parser(command_name, command):
+	"""
+	Given a command's function, returns an argparse parser of its arguments:
+		- arguments without default values are positional (strings)
+		- arguments with default values of simple types (numbers, strings, Booleans, or lists of
+		  numbers or strings) are options of the same name, converted to the type of the default
+		- arguments whose default is None are options converted to numbers where possible
+	Arguments with other defaults (e.g. dictionaries of model arguments) keep their defaults.
+	"""
+	parser = argparse.ArgumentParser(
+		prog='python cli.py ' + command_name,
+		description=inspect.getdoc(command),
+		formatter_class=argparse.RawDescriptionHelpFormatter,
+	)
+	argument_names, _, _, default_values = inspect.getargspec(command)
+	default_values = default_values or ()
+	required_count = len(argument_names) - len(default_values)
+
+	for argument_name in argument_names[:required_count]:
+		parser.add_argument(argument_name)
+
+	for argument_name, default_value in zip(argument_names[required_count:], default_values):
+		if isinstance(default_value, bool):
+			parser.add_argument('--' + argument_name, type=_parse_Boolean, default=default_value, metavar='{true,false}', help='default: %(default)s')
+		elif default_value is None:
+			parser.add_argument('--' + argument_name, type=_parse_number_or_string, default=default_value, help='default: %(default)s')
+		elif isinstance(default_value, (int, long, float, basestring)):
+			argument_type = str if isinstance(default_value, basestring) else type(default_value)
+			parser.add_argument('--' + argument_name, type=argument_type, default=default_value, help='default: %(default)s')
+		elif isinstance(default_value, list) and all(isinstance(value, (int, long, float, basestring)) for value in default_value):
+			argument_type = type(default_value[0]) if default_value and not isinstance(default_value[0], basestring) else str
+			parser.add_argument('--' + argument_name, type=argument_type, nargs='*', default=default_value, help='default: %(default)s')
+
+	return parser
+
+
+def _parse_number_or_string(value):
+	"""Converts a command-line value to an int or float if it is a number, or leaves it a string."""
+	for number_type in (int, float):
+		try:
+			return number_type(value)
+		except ValueError:
+			pass
+	return value
+
+
+def _parse_Boolean(value):
+	"""Converts a command-line value such as 'true', 'False', '1' or 'no' to a Boolean."""
+	if value.lower() in ('true', 'yes', '1'):
+		return True
+	if value.lower() in ('false', 'no', '0'):
+		return False
+	raise argparse.ArgumentTypeError('expected true or false, not ' + repr(value))
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Utilities for reading compressed (gzip, bzip2 or Zstandard) raw data files as if they were plain
+text files, with decompression running concurrently with the reader.
+"""
+import bz2
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import zlib
+from distutils.spawn import find_executable
+from Queue import Queue
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+
+COMPRESSED_FILE_EXTENSIONS = ['.gz', '.bz2', '.zst']
+
+# Command-line decompressors, in order of preference (parallel implementations first)
+DECOMPRESSION_COMMANDS_FOR_EXTENSION = {
+	'.gz': [ ['pigz', '-dc'], ['gzip', '-dc'] ],
+	'.bz2': [ ['lbzip2', '-dc'], ['pbzip2', '-dc'], ['bzip2', '-dc'] ],
+	'.zst': [ ['zstd', '-dc'] ],
+}
+
+
+def compression_extension(absolute_path):
+	"""Returns the compression extension (e.g. '.gz') of a file path, or None if it is not compressed."""
+	extension = os.path.splitext(absolute_path)[1]
+	return extension if extension in COMPRESSED_FILE_EXTENSIONS else None
+
+
+def open_possibly_compressed_file(absolute_path, chunk_size=4 * 1024 * 1024, queue_depth=8):
+	"""
+	Given the path of a plain or compressed (by extension) text file, returns a readable file
+	object supporting iteration over lines, readline() and use as a context manager.
+
+	Compressed files are decompressed in a separate process by a command-line decompressor if one
+	is installed (e.g. pigz, lbzip2, zstd), or else in a background thread (zlib and bz2 release the
+	GIL while decompressing), so that decompression overlaps with the reader's own work.
+	"""
+	extension = compression_extension(absolute_path)
+	if extension is None:
+		return open(absolute_path)
+
+	for command in DECOMPRESSION_COMMANDS_FOR_EXTENSION[extension]:
+		if find_executable(command[0]):
+			return DecompressionProcessFile(command + [absolute_path])
+
+	return DecompressionThreadFile(absolute_path, extension, chunk_size=chunk_size, queue_depth=queue_depth)
+
+
+class DecompressionProcessFile(object):
+	"""
+	A read-only file whose contents are the standard output of a decompression command. Raises an
+	IOError (with the command's error output) at the end of the contents, or on close(), if the
+	command failed, e.g. on a corrupt or truncated file.
+	"""
+
+	def __init__(self, command):
+		self.command = command
+		self.error_file = tempfile.TemporaryFile()
+		self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=self.error_file, bufsize=1024 * 1024)
+		self.file = self.process.stdout
+
+	def __iter__(self):
+		for line in iter(self.file.readline, ''):
+			yield line
+		self._check_exit_status()
+
+	def readline(self):
+		line = self.file.readline()
+		if not line:
+			self._check_exit_status()
+		return line
+
+	def _check_exit_status(self):
+		"""Waits for the command to exit, and raises an IOError if it failed."""
+		if self.process.wait() != 0:
+			self.error_file.seek(0)
+			raise IOError('{} exited with status {}: {}'.format(' '.join(self.command), self.process.returncode, self.error_file.read().strip()))
+
+	def close(self):
+		"""Closes the file, stopping the command if it has not finished (or raising an IOError if it failed)."""
+		try:
+			# Stop a command still writing before closing its output (which would make it fail)
+			if self.process.poll() is None:
+				self.process.kill()
+				self.file.close()
+				self.process.wait()
+			else:
+				self.file.close()
+				self._check_exit_status()
+		finally:
+			self.error_file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exception_type, exception, traceback):
+		_close_without_masking(self, exception_type)
+
+
+class DecompressionThreadFile(object):
+	"""
+	A read-only file whose contents are decompressed, one chunk at a time, by a background thread
+	into a bounded queue (so decompression runs at most queue_depth chunks ahead of the reader).
+
+	An error in the background thread (e.g. a corrupt file) is raised to the reader once the
+	contents decompressed before it have been read, and a truncated file raises an IOError there.
+	"""
+
+	def __init__(self, absolute_path, extension, chunk_size=4 * 1024 * 1024, queue_depth=8):
+		self.absolute_path = absolute_path
+		self.extension = extension
+		self.chunk_size = chunk_size
+		self.blocks = Queue(maxsize=queue_depth)
+		self.is_closed = False
+		self.error = None
+		self.lines = self._iterate_lines()
+
+		self.thread = threading.Thread(target=self._decompress)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def _new_decompressor(self):
+		if self.extension == '.gz':
+			return zlib.decompressobj(16 + zlib.MAX_WBITS)
+		elif self.extension == '.bz2':
+			return bz2.BZ2Decompressor()
+		elif zstandard is not None:
+			return zstandard.ZstdDecompressor().decompressobj()
+		raise ImportError('Reading .zst files requires the zstd command or the zstandard package')
+
+	def _is_stream_finished(self, decompressor):
+		"""Returns whether a decompressor has reached the end of its compressed stream (rather than of a truncated file)."""
+		if hasattr(decompressor, 'eof'):
+			return decompressor.eof
+		if self.extension == '.gz':
+			# A byte past the end of a finished stream is left over as unused data
+			probe = decompressor.copy()
+			try:
+				probe.decompress('\x00')
+			except zlib.error:
+				return False
+			return probe.unused_data == '\x00'
+		if self.extension == '.bz2':
+			try:
+				decompressor.decompress('')
+			except EOFError:
+				return True	# bz2 refuses input after the end of its stream
+			return False
+		return True	# Not detectable by this decompressor
+
+	def _decompress(self):
+		"""
+		Runs in the background thread: reads and decompresses chunks, then enqueues None at the end.
+		Any error is kept (with its traceback) for the reader to raise.
+		"""
+		try:
+			decompressor = self._new_decompressor()
+			with open(self.absolute_path, 'rb') as compressed_file:
+				while not self.is_closed:
+					chunk = compressed_file.read(self.chunk_size)
+					if not chunk:
+						break
+					block = decompressor.decompress(chunk)
+
+					# Concatenated gzip/bzip2 streams (e.g. from pigz or pbzip2) start a new decompressor
+					while getattr(decompressor, 'unused_data', ''):
+						remaining_data = decompressor.unused_data
+						decompressor = self._new_decompressor()
+						block += decompressor.decompress(remaining_data)
+
+					if block:
+						self.blocks.put(block)
+
+				if not self.is_closed and not self._is_stream_finished(decompressor):
+					raise IOError('Compressed file ended unexpectedly (truncated?): ' + self.absolute_path)
+		except Exception:
+			self.error = sys.exc_info()
+		finally:
+			self.blocks.put(None)
+
+	def _iterate_lines(self):
+		partial_line = ''
+		while True:
+			block = self.blocks.get()
+			if block is None:
+				if self.error:
+					raise self.error[0], self.error[1], self.error[2]
+				if partial_line:
+					yield partial_line
+				return
+			lines = (partial_line + block).split('\n')
+			partial_line = lines.pop()
+			for line in lines:
+				yield line + '\n'
+
+	def __iter__(self):
+		return self.lines
+
+	def readline(self):
+		return next(self.lines, '')
+
+	def close(self):
+		self.is_closed = True
+		# Unblock the background thread if it is waiting on a full queue
+		while self.thread.is_alive():
+			while not self.blocks.empty():
+				self.blocks.get()
+			self.thread.join(0.01)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exception_type, exception, traceback):
+		_close_without_masking(self, exception_type)
+
+
+def _close_without_masking(opened_file, exception_type):
+	"""Closes a file on leaving a with block; an error in closing is raised only if no other exception is leaving the block."""
+	try:
+		opened_file.close()
+	except Exception:
+		if exception_type is None:
+			raise
@@ -11,8 +11,16 @@ Utilities for the following:
 
 IMPORTANT: All data retrieval should be done through this file.
 """
+from functools import partial
+
+import scipy.sparse
+
 from utilities import *
 from data_utilities import *
+from pipeline_utilities import *
+
+# Lines of a compressed user file handed to each worker process at a time by read_user_edge_arrays()
+USER_LINES_PER_BATCH = 20000
 
 
 def read_user_graph(input_file_name=DEFAULT_RAW_USERS_FILE_NAME):
@@ -21,7 +29,7 @@ def read_user_graph(input_file_name=DEFAULT_RAW_USERS_FILE_NAME):
 	"""
 	graph = networkx.Graph()
 
-	with open(raw_data_absolute_path(input_file_name)) as users_file:
+	with open_raw_data_file(input_file_name) as users_file:
 
 		for user_line in users_file:
 			user = json.loads(user_line)
@@ -32,6 +40,296 @@ def read_user_graph(input_file_name=DEFAULT_RAW_USERS_FILE_NAME):
 	return graph
 
 
+def read_user_edge_arrays(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, edge_changes_file_name=None, processes=1):
+	"""
+	Given a Yelp dataset user file, returns the user graph in compact form:
+		user_IDs : a list of user IDs, where user i (in the arrays below) has ID user_IDs[i]
+		sources, targets : numpy arrays of user indices, listing each friendship once, with source < target
+
+	Includes the same users as read_user_graph() (i.e. also friends absent from the users file),
+	but without building a NetworkX graph.
+
+	With processes > 1, the file is split into byte ranges parsed by separate worker processes,
+	whose integer-encoded edges are then merged. A compressed file cannot be split by byte ranges,
+	so it is instead decompressed as a single stream whose lines are handed to the worker processes
+	in batches. The result is identical for any number of processes.
+
+	If a raw friendship changes file is given (see read_user_edge_changes), its added friendships
+	are included and its removed friendships excluded.
+	"""
+	absolute_path = resolved_raw_data_absolute_path(input_file_name)
+	pool = multiprocessing.Pool(processes) if processes > 1 else None
+	try:
+		if compression_extension(absolute_path):
+			with open_raw_data_file(input_file_name) as users_file:
+				user_line_batches = iterate_in_chunks(users_file, USER_LINES_PER_BATCH)
+				shard_IDs_and_edges = list(pool.imap(_parse_user_edges, user_line_batches) if pool else itertools.imap(_parse_user_edges, user_line_batches))
+		else:
+			shards = [ (absolute_path, start_offset, end_offset) for start_offset, end_offset in byte_range_shards(absolute_path, processes) ]
+			shard_IDs_and_edges = pool.map(_read_user_edge_shard, shards) if pool else map(_read_user_edge_shard, shards)
+	finally:
+		# All results are in (or a worker failed), so stop the workers either way
+		if pool:
+			pool.terminate()
+			pool.join()
+
+	# Merge: re-encode each shard's local user indices as global indices, in order of first appearance
+	index_for_user_ID = {}
+	sources = []
+	targets = []
+	for shard_user_IDs, shard_sources, shard_targets in shard_IDs_and_edges:
+		global_index_for_shard_index = numpy.array([ index_for_user_ID.setdefault(user_ID, len(index_for_user_ID)) for user_ID in shard_user_IDs ], dtype=numpy.int32)
+		sources += [ global_index_for_shard_index[shard_sources] ]
+		targets += [ global_index_for_shard_index[shard_targets] ]
+
+	user_IDs = [None] * len(index_for_user_ID)
+	for user_ID, user_index in index_for_user_ID.iteritems():
+		user_IDs[user_index] = user_ID
+
+	sources, targets = deduplicate_undirected_edges(numpy.concatenate(sources), numpy.concatenate(targets))
+
+	if edge_changes_file_name:
+		user_IDs, sources, targets = apply_user_edge_changes(user_IDs, sources, targets, edge_changes_file_name)
+
+	return user_IDs, sources, targets
+
+
+def _read_user_edge_shard((absolute_path, start_offset, end_offset)):
+	"""
+	Given the absolute path of an uncompressed Yelp dataset user file and a byte range within it,
+	parses every user whose line starts within the range (see _parse_user_edges).
+	"""
+	with open(absolute_path) as users_file:
+		return _parse_user_edges(byte_range_lines(users_file, start_offset, end_offset))
+
+
+def _parse_user_edges(user_lines):
+	"""
+	Given lines of a Yelp dataset user file, returns
+		shard_user_IDs : a list of user IDs, in order of first appearance within the lines
+		sources, targets : numpy arrays of indices into shard_user_IDs, one entry per listed friendship
+	"""
+	index_for_user_ID = {}
+	sources = array.array('i')
+	targets = array.array('i')
+
+	for user_line in user_lines:
+		user = json.loads(user_line)
+		user_index = index_for_user_ID.setdefault(user['user_id'], len(index_for_user_ID))
+		for friend_ID in user['friends']:
+			sources.append(user_index)
+			targets.append(index_for_user_ID.setdefault(friend_ID, len(index_for_user_ID)))
+
+	shard_user_IDs = [None] * len(index_for_user_ID)
+	for user_ID, user_index in index_for_user_ID.iteritems():
+		shard_user_IDs[user_index] = user_ID
+
+	return shard_user_IDs, numpy.frombuffer(sources, dtype=numpy.int32), numpy.frombuffer(targets, dtype=numpy.int32)
+
+
+def apply_user_edge_changes(user_IDs, sources, targets, edge_changes_file_name):
+	"""
+	Given a user graph in the compact form returned by read_user_edge_arrays() and a raw friendship
+	changes file (see read_user_edge_changes), returns the changed graph in the same form.
+	New users are appended to the end of user_IDs.
+	"""
+	added_friendships, removed_friendships = read_user_edge_changes(edge_changes_file_name)
+	user_IDs = list(user_IDs)
+	index_for_user_ID = { user_ID: user_index for user_index, user_ID in enumerate(user_IDs) }
+
+	added_sources = array.array('i')
+	added_targets = array.array('i')
+	for friend_1_ID, friend_2_ID in added_friendships:
+		for friend_ID in (friend_1_ID, friend_2_ID):
+			if friend_ID not in index_for_user_ID:
+				index_for_user_ID[friend_ID] = len(user_IDs)
+				user_IDs += [friend_ID]
+		added_sources.append(index_for_user_ID[friend_1_ID])
+		added_targets.append(index_for_user_ID[friend_2_ID])
+
+	sources, targets = deduplicate_undirected_edges(
+		numpy.concatenate([sources, numpy.frombuffer(added_sources, dtype=numpy.int32)]),
+		numpy.concatenate([targets, numpy.frombuffer(added_targets, dtype=numpy.int32)]),
+	)
+
+	removed_friendships = [ (index_for_user_ID[friend_1_ID], index_for_user_ID[friend_2_ID]) for friend_1_ID, friend_2_ID in removed_friendships if friend_1_ID in index_for_user_ID and friend_2_ID in index_for_user_ID ]
+	if removed_friendships:
+		removed_sources, removed_targets = deduplicate_undirected_edges(*numpy.array(removed_friendships, dtype=numpy.int32).T)
+		is_kept = ~numpy.in1d(undirected_edge_keys(sources, targets), undirected_edge_keys(removed_sources, removed_targets))
+		sources, targets = sources[is_kept], targets[is_kept]
+
+	return user_IDs, sources, targets
+
+
+def load_user_edge_arrays(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, edges_file_name=DEFAULT_USER_EDGES_FILE_NAME, edge_changes_file_name=None):
+	"""
+	Returns the user graph in the compact form of read_user_edge_arrays(), loaded from the processed
+	binary edges file (see write_user_edge_arrays) if it was built from the given Yelp dataset user
+	file and is newer than it, or parsed from the user file otherwise.
+	"""
+	edges_file_path = processed_data_absolute_path(edges_file_name)
+	if os.path.exists(edges_file_path) and os.path.getmtime(edges_file_path) >= os.path.getmtime(resolved_raw_data_absolute_path(input_file_name)):
+		user_IDs, sources, targets, source_file_name = read_user_edge_arrays_file(edges_file_name)
+	else:
+		source_file_name = None
+
+	if source_file_name == input_file_name:
+		if edge_changes_file_name:
+			user_IDs, sources, targets = apply_user_edge_changes(user_IDs, sources, targets, edge_changes_file_name)
+		return user_IDs, sources, targets
+
+	return read_user_edge_arrays(input_file_name, edge_changes_file_name=edge_changes_file_name)
+
+
+def read_user_edge_arrays_file(input_file_name=DEFAULT_USER_EDGES_FILE_NAME):
+	"""
+	Given a processed binary edges file written by write_user_edge_arrays(), returns the user
+	graph in the compact form of read_user_edge_arrays(), followed by the name of the Yelp dataset
+	user file it was built from.
+	"""
+	edges_file = numpy.load(processed_data_absolute_path(input_file_name))
+	return edges_file['user_IDs'].tolist(), edges_file['sources'], edges_file['targets'], edges_file['source_file_name'].item()
+
+
+def write_user_edge_arrays(user_IDs, sources, targets, output_file_name=DEFAULT_USER_EDGES_FILE_NAME, source_file_name=DEFAULT_RAW_USERS_FILE_NAME):
+	"""
+	Given a user graph in the compact form of read_user_edge_arrays() and the name of the Yelp
+	dataset user file it was built from, writes it to a processed binary (NumPy .npz) edges file.
+	The file is replaced atomically (see open_processed_output_file), so that an interrupted write
+	never leaves a truncated file that load_user_edge_arrays would take as up to date.
+	"""
+	with open_processed_output_file(output_file_name) as edges_file:
+		numpy.savez(
+			edges_file,
+			user_IDs=numpy.array(user_IDs, dtype=numpy.unicode_),
+			sources=sources,
+			targets=targets,
+			source_file_name=numpy.array(source_file_name),
+		)
+
+
+def read_user_text_features(input_file_name=DEFAULT_TEXT_FEATURES_FILE_NAME):
+	"""
+	Given a processed text features file written by write_user_text_features(), returns
+		user_IDs : a list of user IDs, where user i has the features in row i of the matrix below
+		text_features : a scipy.sparse CSR matrix of users' TF-IDF weighted hashed token features
+	"""
+	text_features_file = numpy.load(processed_data_absolute_path(input_file_name))
+	text_features = scipy.sparse.csr_matrix(
+		(text_features_file['data'], text_features_file['indices'], text_features_file['indptr']),
+		shape=tuple(text_features_file['shape']),
+	)
+	return text_features_file['user_IDs'].tolist(), text_features
+
+
+def write_user_text_features(user_IDs, text_features, output_file_name=DEFAULT_TEXT_FEATURES_FILE_NAME):
+	"""
+	Given a list of user IDs and a scipy.sparse matrix whose row i holds the text features of user
+	user_IDs[i], writes them to a processed binary (NumPy .npz) text features file, replaced
+	atomically (see open_processed_output_file).
+	"""
+	text_features = scipy.sparse.csr_matrix(text_features)
+	with open_processed_output_file(output_file_name) as text_features_file:
+		numpy.savez(
+			text_features_file,
+			user_IDs=numpy.array(user_IDs, dtype=numpy.unicode_),
+			data=text_features.data,
+			indices=text_features.indices,
+			indptr=text_features.indptr,
+			shape=numpy.array(text_features.shape),
+		)
+
+
+def user_text_feature_rows(text_features_user_IDs, text_features, user_IDs):
+	"""
+	Given text features as returned by read_user_text_features() and a list of user IDs, returns a
+	scipy.sparse CSR matrix whose row i holds the text features of user_IDs[i] (all zero if the
+	user has none).
+	"""
+	index_for_user_ID = { user_ID: user_index for user_index, user_ID in enumerate(text_features_user_IDs) }
+	empty_row_index = text_features.shape[0]
+	row_indices = numpy.array([ index_for_user_ID.get(user_ID, empty_row_index) for user_ID in user_IDs ], dtype=numpy.int64)
+
+	# Append an all-zero row for unknown users
+	padded_text_features = scipy.sparse.vstack([text_features, scipy.sparse.csr_matrix((1, text_features.shape[1]))]).tocsr()
+	return padded_text_features[row_indices]
+
+
+def read_user_edge_changes(input_file_name):
+	"""
+	Given a raw friendship changes file of the form
+		+ user_1_ID user_2_ID
+		- user_3_ID user_4_ID
+			.
+			.
+			.
+	(one added '+' or removed '-' friendship per line), returns two lists of (user ID, user ID) pairs:
+		added friendships, removed friendships
+	"""
+	added_friendships = []
+	removed_friendships = []
+
+	with open_raw_data_file(input_file_name) as changes_file:
+
+		for change_line in changes_file:
+			change, friend_1_ID, friend_2_ID = change_line.decode('utf-8').split()
+			if change == '+':
+				added_friendships += [(friend_1_ID, friend_2_ID)]
+			elif change == '-':
+				removed_friendships += [(friend_1_ID, friend_2_ID)]
+
+	return added_friendships, removed_friendships
+
+
+def read_user_business_reviews(input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME):
+	"""
+	Given a Yelp dataset reviews file, returns the user-business review graph in compact form:
+		user_IDs : a list of user IDs, where user i (in the arrays below) has ID user_IDs[i]
+		business_IDs : a list of business IDs, where business j has ID business_IDs[j]
+		review_users, review_businesses, review_days : numpy arrays with one entry per review, of
+			the reviewing user's index, the reviewed business's index, and the review date (see
+			days_since_year_one)
+	"""
+	index_for_user_ID = {}
+	index_for_business_ID = {}
+	review_users = array.array('i')
+	review_businesses = array.array('i')
+	review_days = array.array('i')
+
+	with open_raw_data_file(input_file_name) as reviews_file:
+
+		for user_ID, business_ID, review_date in prefetched_decoded_records(reviews_file, decode_batch=partial(decode_JSON_fields, field_names=('user_id', 'business_id', 'date'))):
+			review_users.append(index_for_user_ID.setdefault(user_ID, len(index_for_user_ID)))
+			review_businesses.append(index_for_business_ID.setdefault(business_ID, len(index_for_business_ID)))
+			review_days.append(days_since_year_one(review_date))
+
+	user_IDs = [None] * len(index_for_user_ID)
+	for user_ID, user_index in index_for_user_ID.iteritems():
+		user_IDs[user_index] = user_ID
+
+	business_IDs = [None] * len(index_for_business_ID)
+	for business_ID, business_index in index_for_business_ID.iteritems():
+		business_IDs[business_index] = business_ID
+
+	return user_IDs, business_IDs, numpy.frombuffer(review_users, dtype=numpy.int32), numpy.frombuffer(review_businesses, dtype=numpy.int32), numpy.frombuffer(review_days, dtype=numpy.int32)
+
+
+def read_business_categories_and_cities(input_file_name=DEFAULT_RAW_BUSINESSES_FILE_NAME):
+	"""
+	Given a Yelp dataset businesses file, returns a dictionary:
+		{ business ID: (list of the business's categories, the business's city) }
+	"""
+	categories_and_city_for_business = {}
+
+	with open_raw_data_file(input_file_name) as businesses_file:
+
+		for business_JSON in businesses_file:
+			business = json.loads(business_JSON)
+			categories_and_city_for_business[business['business_id']] = (business['categories'] or [], business['city'])
+
+	return categories_and_city_for_business
+
+
 def read_user_average_review_lengths(input_file_name=DEFAULT_REVIEW_LENGTHS_FILE_NAME):
 	"""
 	Given a processed review lengths file, returns a dictionary:
@@ -64,6 +362,14 @@ def read_user_pageranks(input_file_name=DEFAULT_PAGERANKS_FILE_NAME):
 	return read_single_user_attribute(input_file_name=input_file_name, attribute_name='pagerank')
 
 
+def read_user_pageranks_in_chunks(input_file_name=DEFAULT_PAGERANKS_FILE_NAME, chunk_size=100000):
+	"""
+	Given a processed PageRanks file, returns a generator over numpy arrays of at most chunk_size
+	users' PageRanks (see read_single_user_attribute_values_in_chunks).
+	"""
+	return read_single_user_attribute_values_in_chunks(input_file_name=input_file_name, attribute_name='pagerank', chunk_size=chunk_size)
+
+
 def read_user_basic_attributes(input_file_name=DEFAULT_BASIC_ATTRIBUTES_FILE_NAME):
 	"""
 	Given a processed basic attributes file, returns a list of user dictionaries containing all
@@ -80,6 +386,14 @@ def read_combined_users(input_file_name=DEFAULT_COMBINED_USERS_FILE_NAME, attrib
 	return read_multiple_user_attributes(input_file_name=input_file_name, attributes=attributes)
 
 
+def read_combined_users_rows_in_chunks(input_file_name=DEFAULT_COMBINED_USERS_FILE_NAME, attributes=ALL_USER_ATTRIBUTES, chunk_size=100000):
+	"""
+	Given a combined users file and a list of desired attributes, returns a generator over lists of
+	at most chunk_size tuples of those attributes' values, in the order given (no dictionaries are built).
+	"""
+	return read_multiple_user_attribute_rows_in_chunks(input_file_name=input_file_name, attributes=attributes, chunk_size=chunk_size)
+
+
 def read_training_set(input_file_name=DEFAULT_TRAINING_SET_FILE_NAME, attributes=TRAINING_AND_TEST_SET_ATTRIBUTES):
 	"""
 	Given a training set file and a list of desired attributes, returns a list of user dictionaries
@@ -96,13 +410,132 @@ def read_test_set(input_file_name=DEFAULT_TEST_SET_FILE_NAME, attributes=TRAININ
 	return read_multiple_user_attributes(input_file_name=input_file_name, attributes=attributes)
 
 
-def write_D3_graph(graph, output_file_name=DEFAULT_D3_GRAPH_FILE_NAME):
-	"""Writes a given graph to a JSON file suitable for displaying a D3 force-directed graph."""
-	D3_dictionary = {'nodes': [], 'links': []}
+def read_training_set_in_chunks(input_file_name=DEFAULT_TRAINING_SET_FILE_NAME, attributes=TRAINING_AND_TEST_SET_ATTRIBUTES, chunk_size=100000):
+	"""
+	Given a training set file and a list of desired attributes, returns a generator over lists of
+	at most chunk_size user dictionaries containing only those attributes.
+	"""
+	return read_multiple_user_attributes_in_chunks(input_file_name=input_file_name, attributes=attributes, chunk_size=chunk_size)
+
+
+def read_test_set_in_chunks(input_file_name=DEFAULT_TEST_SET_FILE_NAME, attributes=TRAINING_AND_TEST_SET_ATTRIBUTES, chunk_size=100000):
+	"""
+	Given a test set file and a list of desired attributes, returns a generator over lists of
+	at most chunk_size user dictionaries containing only those attributes.
+	"""
+	return read_multiple_user_attributes_in_chunks(input_file_name=input_file_name, attributes=attributes, chunk_size=chunk_size)
+
+
+def read_training_set_rows_in_chunks(input_file_name=DEFAULT_TRAINING_SET_FILE_NAME, attributes=TRAINING_AND_TEST_SET_ATTRIBUTES, chunk_size=100000):
+	"""
+	Given a training set file and a list of desired attributes, returns a generator over lists of
+	at most chunk_size tuples of those attributes' values, in the order given (no dictionaries are built).
+	"""
+	return read_multiple_user_attribute_rows_in_chunks(input_file_name=input_file_name, attributes=attributes, chunk_size=chunk_size)
+
+
+def read_test_set_rows_in_chunks(input_file_name=DEFAULT_TEST_SET_FILE_NAME, attributes=TRAINING_AND_TEST_SET_ATTRIBUTES, chunk_size=100000):
+	"""
+	Given a test set file and a list of desired attributes, returns a generator over lists of
+	at most chunk_size tuples of those attributes' values, in the order given (no dictionaries are built).
+	"""
+	return read_multiple_user_attribute_rows_in_chunks(input_file_name=input_file_name, attributes=attributes, chunk_size=chunk_size)
+
+
+def write_D3_graph(graph, output_file_name=DEFAULT_D3_GRAPH_FILE_NAME, nodes=None, maximum_nodes=float('inf'), maximum_edges=float('inf')):
+	"""
+	Writes a given graph to a JSON file suitable for displaying a D3 force-directed graph:
+		{"nodes": [{"name": user_ID}, ...], "links": [{"source": user_ID, "target": user_ID, "value": 1}, ...]}
 
-	[ D3_dictionary['nodes'].append( {'name': user_ID} ) for user_ID in graph.nodes_iter() ]
-	[ D3_dictionary['links'].append( {'source': friend_1_ID, 'target': friend_2_ID, 'value': 1} ) for friend_1_ID, friend_2_ID in graph.edges_iter() ]
+	If a list of nodes is given (e.g. from one of the sampling functions below), writes only the
+	subgraph induced by those nodes. At most maximum_nodes nodes (in the order given) and
+	maximum_edges edges are written.
+
+	The file is written incrementally, so memory use does not grow with the size of the output.
+	"""
+	if nodes is None:
+		nodes = graph.nodes_iter()
+	nodes = list(itertools.islice(nodes, _islice_limit(maximum_nodes)))
+	position_for_node = { node: position for position, node in enumerate(nodes) }
 
 	with open(processed_data_absolute_path(output_file_name), 'w') as D3_graph_file:
-		json.dump(D3_dictionary, D3_graph_file)
 
+		D3_graph_file.write('{"nodes": [')
+		for position, user_ID in enumerate(nodes):
+			D3_graph_file.write( (', ' if position > 0 else '') + json.dumps({'name': user_ID}) )
+
+		D3_graph_file.write('], "links": [')
+		edge_count = 0
+		for position, friend_1_ID in enumerate(nodes):
+			if edge_count >= maximum_edges:
+				break
+			for friend_2_ID in graph.neighbors_iter(friend_1_ID):
+				# Write each edge once, from its earlier endpoint, and only if both endpoints are written
+				if position_for_node.get(friend_2_ID, -1) <= position:
+					continue
+				D3_graph_file.write( (', ' if edge_count > 0 else '') + json.dumps({'source': friend_1_ID, 'target': friend_2_ID, 'value': 1}) )
+				edge_count += 1
+				if edge_count >= maximum_edges:
+					break
+
+		D3_graph_file.write(']}')
+
+
+def _islice_limit(maximum_count):
+	"""
+	Given a maximum number of items (possibly a float, e.g. 1e5 parsed from the command line, or
+	infinity), returns it as a stop argument for itertools.islice (an int, or None if infinite).
+	"""
+	return None if maximum_count == float('inf') else int(maximum_count)
+
+
+def highest_degree_D3_nodes(graph, k):
+	"""Given a graph, returns a list of its k highest-degree nodes, in decreasing order of degree."""
+	return heapq.nlargest(int(k), graph.nodes_iter(), key=graph.degree)
+
+
+def highest_pagerank_D3_nodes(k, pagerank_for_user=None, pageranks_file_name=DEFAULT_PAGERANKS_FILE_NAME):
+	"""
+	Returns a list of the k users with highest PageRank, in decreasing order of PageRank.
+	PageRanks are read from the processed PageRanks file if not given.
+	"""
+	if pagerank_for_user is None:
+		pagerank_for_user = read_user_pageranks(input_file_name=pageranks_file_name)
+	return heapq.nlargest(int(k), pagerank_for_user, key=pagerank_for_user.get)
+
+
+def ego_network_D3_nodes(graph, user_ID, hops=2, maximum_nodes=float('inf')):
+	"""
+	Given a graph and a user, returns a list of all users within the given number of hops of that
+	user (in breadth-first order, starting with the user), stopping once maximum_nodes are found.
+	"""
+	nodes = [user_ID]
+	visited_nodes = set(nodes)
+	frontier = [user_ID]
+
+	for hop in xrange(hops):
+		next_frontier = []
+		for node in frontier:
+			for neighbor in graph.neighbors_iter(node):
+				if neighbor in visited_nodes:
+					continue
+				if len(nodes) >= maximum_nodes:
+					return nodes
+				visited_nodes.add(neighbor)
+				nodes += [neighbor]
+				next_frontier += [neighbor]
+		frontier = next_frontier
+
+	return nodes
+
+
+def elite_D3_nodes(graph, maximum_nodes=float('inf'), basic_attributes_file_name=DEFAULT_BASIC_ATTRIBUTES_FILE_NAME):
+	"""
+	Given a graph, returns a list of its nodes that are Elite users (as recorded in the processed
+	basic attributes file), up to maximum_nodes of them.
+	"""
+	elite_nodes = (
+		user['ID'] for user in read_multiple_user_attributes(input_file_name=basic_attributes_file_name, attributes=['ID', 'years_elite'])
+		if user['years_elite'] > 0 and graph.has_node(user['ID'])
+	)
+	return list(itertools.islice(elite_nodes, _islice_limit(maximum_nodes)))
@@ -9,11 +9,26 @@ Utilities for the following:
                     |                                           |
                     +-------------------------------------------+
 """
+import re
+import array
+from functools import partial
+
+import scipy.sparse
+
 from utilities import *
-from readability.readability import Readability
+from graph_utilities import *
+from readability import lexicon, syllables_en
 
 from data_utilities import *
 from data_interface import *
+from pipeline_utilities import *
+from scheduling_utilities import *
+from sketch_utilities import *
+
+# Imported on first use: the readability package imports NLTK, which alone takes about a second
+readability = LazyModule('readability.readability', globals())
+readability_utilities = LazyModule('readability.utils', globals())
+sklearn_utilities = LazyModule('sklearn.utils')
 
 
 def extract_user_basic_attributes(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, output_file_name=DEFAULT_BASIC_ATTRIBUTES_FILE_NAME):
@@ -25,18 +40,24 @@ def extract_user_basic_attributes(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, o
 			.
 		user_N_ID user_N_review_count ... user_N_fan_count
 	"""
-	users = []
-
-	with open(raw_data_absolute_path(input_file_name)) as raw_users_file:
+	statistics = PipelineStatistics()
 
-		for user_line in raw_users_file:
-			raw_user = json.loads(user_line)
-			user = { attribute_name: extract_attribute_value(raw_user) for attribute_name, extract_attribute_value in BASIC_USER_ATTRIBUTES_AND_EXTRACTORS }
-			users += [user]
+	with open_raw_data_file(input_file_name) as raw_users_file:
+		users = list(prefetched_decoded_records(raw_users_file, decode_batch=_decode_user_basic_attributes, statistics=statistics))
 
+	print statistics.summary()
 	write_multiple_user_attributes(users, BASIC_USER_ATTRIBUTES, output_file_name)
 
 
+def _decode_user_basic_attributes(user_lines):
+	"""Given lines of a Yelp dataset users file, returns a list of dictionaries of the users' basic attributes."""
+	users = []
+	for user_line in user_lines:
+		raw_user = json.loads(user_line)
+		users += [ { attribute_name: extract_attribute_value(raw_user) for attribute_name, extract_attribute_value in BASIC_USER_ATTRIBUTES_AND_EXTRACTORS } ]
+	return users
+
+
 def extract_user_average_review_lengths(input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME, output_file_name=DEFAULT_REVIEW_LENGTHS_FILE_NAME):
 	"""
 	Given a Yelp dataset reviews file, builds a file:
@@ -46,24 +67,78 @@ def extract_user_average_review_lengths(input_file_name=DEFAULT_RAW_REVIEWS_FILE
 			.
 		user_N_ID user_N_average_review_length
 	"""
-	# Maps each user ID --> [running sum of review lengths, running number of reviews]
-	total_review_length_and_count_for_user = defaultdict(lambda: [0,0])
-
-	# Compute the above mapping
-	with open(raw_data_absolute_path(input_file_name)) as reviews_file:
+	# Per user: running sum of review lengths, running number of reviews
+	store = UserAggregateStore()
+	store.add_column('total_review_length', dtype=numpy.int64)
+	store.add_column('review_count', dtype=numpy.int32)
+
+	# Compute the above aggregates
+	statistics = PipelineStatistics()
+	with open_raw_data_file(input_file_name) as reviews_file:
 		
-		for review_JSON in reviews_file:
-			review = json.loads(review_JSON)
-			total_review_length_and_count_for_user[review['user_id']][0] += len(review['text'].split())
-			total_review_length_and_count_for_user[review['user_id']][1] += 1
+		for user_ID, review_length in prefetched_decoded_records(reviews_file, decode_batch=_decode_review_user_IDs_and_lengths, statistics=statistics):
+			user_row = store.row(user_ID)
+			store.add('total_review_length', user_row, review_length)
+			store.add('review_count', user_row, 1)
+
+	print statistics.summary()
 
 	# Compute each user's average review length (truncated to an integer)
-	average_review_length_for_user = { user_ID: int(safe_divide(total_review_length, review_count)) for user_ID, [total_review_length, review_count] in total_review_length_and_count_for_user.iteritems() }
+	average_review_lengths = store.values('total_review_length') // numpy.maximum(store.values('review_count'), 1)
+
+	store.write_column_values(average_review_lengths, output_file_name)
 
-	write_single_user_attribute(average_review_length_for_user, output_file_name)
 
+def _decode_review_user_IDs_and_lengths(review_lines):
+	"""Given lines of a Yelp dataset reviews file, returns a list of (user ID, review length in words) pairs."""
+	user_IDs_and_lengths = []
+	for review_line in review_lines:
+		review = json.loads(review_line)
+		user_IDs_and_lengths += [ (review['user_id'], len(review['text'].split())) ]
+	return user_IDs_and_lengths
 
-def extract_user_reading_levels(input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME, output_file_name=DEFAULT_READING_LEVELS_FILE_NAME, reviews_to_analyze_per_user=float('inf')):
+
+def extract_syllable_lexicon(input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME, output_file_name=DEFAULT_SYLLABLE_LEXICON_FILE_NAME):
+	"""
+	Given a Yelp dataset reviews file, builds a processed syllable lexicon file (see
+	readability/lexicon.py) holding the syllable count of every word in the reviews, as the
+	readability package counts them.
+
+	extract_user_reading_levels() then looks words up in the lexicon instead of counting their
+	syllables with ~25 regular expression searches each, in every process.
+	"""
+	# Per batch: syllable counts of the batch's distinct words, computed by the decode workers
+	syllables_for_word = {}
+	statistics = PipelineStatistics()
+	with open_raw_data_file(input_file_name) as reviews_file:
+		for batch_syllables_for_word in prefetched_decoded_records(reviews_file, decode_batch=_decode_review_word_syllable_counts, lines_per_batch=2000, statistics=statistics):
+			syllables_for_word.update(batch_syllables_for_word)
+
+	print statistics.summary()
+	word_count = lexicon.write_lexicon(processed_data_absolute_path(output_file_name), syllables_for_word)
+	print 'Wrote syllable counts of {} words ({} distinct words found)'.format(word_count, len(syllables_for_word))
+
+
+def _decode_review_word_syllable_counts(review_lines):
+	"""
+	Given lines of a Yelp dataset reviews file, returns a list holding a single dictionary of
+	{ normalized word: syllable count } for all words in the reviews.
+	"""
+	syllables_for_word = {}
+	for review_line in review_lines:
+		for word in readability_utilities.get_words(json.loads(review_line)['text']):
+			word = syllables_en._normalize_word(word)
+			if word and word not in syllables_for_word:
+				syllables_for_word[word] = syllables_en.count(word)
+	return [syllables_for_word]
+
+
+def extract_user_reading_levels(
+	input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME,
+	output_file_name=DEFAULT_READING_LEVELS_FILE_NAME,
+	reviews_to_analyze_per_user=float('inf'),
+	syllable_lexicon_file_name=DEFAULT_SYLLABLE_LEXICON_FILE_NAME,
+):
 	"""
 	Given a Yelp dataset reviews file, builds a file:
 		user_1_ID user_1_reading_level
@@ -74,33 +149,43 @@ def extract_user_reading_levels(input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME, o
 
 	WARNING: This function is computationally expensive. The amount of computation can be limited
 	by setting reviews_to_analyze_per_user, the maximum number of reviews to analyze per user.
-	On a 2011 MacBook Air, 1000 reviews take 2-3 seconds to analyze.
+	On a 2011 MacBook Air, 1000 reviews take 2-3 seconds to analyze. Syllable counting is faster
+	once extract_syllable_lexicon() has been run.
 	"""
-	# Maps each user ID --> [running sum of review reading levels, running number of reviews]
-	total_reading_level_and_review_count_for_user = defaultdict(lambda: [0,0])
-
-	# Compute the above mapping
-	with open(raw_data_absolute_path(input_file_name)) as reviews_file:
+	# Count syllables of known words with the precomputed lexicon, if any
+	if os.path.exists(processed_data_absolute_path(syllable_lexicon_file_name)):
+		lexicon.load_lexicon(processed_data_absolute_path(syllable_lexicon_file_name))
+
+	# Per user: running sum of review reading levels, running number of reviews
+	store = UserAggregateStore()
+	store.add_column('total_reading_level', dtype=numpy.float64)
+	store.add_column('review_count', dtype=numpy.int32)
+
+	# Compute the above aggregates
+	statistics = PipelineStatistics()
+	with open_raw_data_file(input_file_name) as reviews_file:
 		
-		for review_JSON in reviews_file:
-			review = json.loads(review_JSON)
+		for user_ID, review_text in prefetched_decoded_records(reviews_file, decode_batch=partial(decode_JSON_fields, field_names=('user_id', 'text')), statistics=statistics):
+			user_row = store.row(user_ID)
 
 			# Skip reviews from users who we have analyzed to the maximum desired
-			if total_reading_level_and_review_count_for_user[review['user_id']][1] >= reviews_to_analyze_per_user:
+			if store.get('review_count', user_row) >= reviews_to_analyze_per_user:
 				continue
 
 			# TODO: Try other reading level metrics
 			try:
-				total_reading_level_and_review_count_for_user[review['user_id']][0] += Readability(review['text']).SMOGIndex()
-				total_reading_level_and_review_count_for_user[review['user_id']][1] += 1
+				store.add('total_reading_level', user_row, readability.Readability(review_text).SMOGIndex())
+				store.add('review_count', user_row, 1)
 			except UnicodeEncodeError as error:
 				pass
 
+	print statistics.summary()
+
 	# Compute each user's average reading level
 	# Note: minimum SMOG index is 3.0, but users without reviews are assigned 0
-	average_reading_level_for_user = { user_ID: safe_divide(total_reading_level, review_count) for user_ID, [total_reading_level, review_count] in total_reading_level_and_review_count_for_user.iteritems() }
+	average_reading_levels = store.values('total_reading_level') / numpy.maximum(store.values('review_count'), 1)
 
-	write_single_user_attribute(average_reading_level_for_user, output_file_name)
+	store.write_column_values(average_reading_levels, output_file_name)
 
 
 def extract_user_tip_counts(input_file_name=DEFAULT_RAW_TIPS_FILE_NAME, output_file_name=DEFAULT_TIP_COUNTS_FILE_NAME):
@@ -112,19 +197,34 @@ def extract_user_tip_counts(input_file_name=DEFAULT_RAW_TIPS_FILE_NAME, output_f
 			.
 		user_N_ID user_N_tip_count
 	"""
-	# Maps each user ID --> number of tips written by that user
-	tip_count_for_user = Counter()
+	# Per user: number of tips written by that user
+	store = UserAggregateStore()
+	store.add_column('tip_count', dtype=numpy.int32)
+
+	statistics = PipelineStatistics()
+	with open_raw_data_file(input_file_name) as tips_file:
 
-	with open(raw_data_absolute_path(input_file_name)) as tips_file:
+		for (user_ID,) in prefetched_decoded_records(tips_file, decode_batch=partial(decode_JSON_fields, field_names=('user_id',)), statistics=statistics):
+			store.add('tip_count', store.row(user_ID), 1)
 
-		for tip_JSON in tips_file:
-			tip = json.loads(tip_JSON)
-			tip_count_for_user[tip['user_id']] += 1
+	print statistics.summary()
 
-	write_single_user_attribute(tip_count_for_user, output_file_name)
+	store.write_column_values('tip_count', output_file_name)
 
 
-def extract_user_pageranks(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, output_file_name=DEFAULT_PAGERANKS_FILE_NAME):
+def extract_user_edge_arrays(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, output_file_name=DEFAULT_USER_EDGES_FILE_NAME, processes=multiprocessing.cpu_count()):
+	"""
+	Given a Yelp dataset users file, parses it in parallel (processes workers, each reading its own
+	byte range) and builds a binary edges file of the deduplicated, integer-encoded friend graph.
+
+	Later graph stages (extract_user_pageranks, extract_user_graph_centralities, analyze_user_graph)
+	load this file instead of re-parsing the users file, for as long as it is newer than the users file.
+	"""
+	user_IDs, sources, targets = read_user_edge_arrays(input_file_name, processes=processes)
+	write_user_edge_arrays(user_IDs, sources, targets, output_file_name, source_file_name=input_file_name)
+
+
+def extract_user_pageranks(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, output_file_name=DEFAULT_PAGERANKS_FILE_NAME, previous_pageranks_file_name=None, edge_changes_file_name=None):
 	"""
 	Given a Yelp dataset users file, builds a file:
 		user_1_ID user_1_pagerank
@@ -132,11 +232,527 @@ def extract_user_pageranks(input_file_name=DEFAULT_RAW_USERS_FILE_NAME, output_f
 			.
 			.
 		user_N_ID user_N_pagerank
+
+	To refresh PageRanks after the friend graph changes, give the processed PageRanks file of the
+	earlier graph as previous_pageranks_file_name: iteration then starts from those PageRanks
+	(new users start at 1/N), so the number of iterations grows with the size of the change rather
+	than the size of the graph. If the users file itself is unchanged, the change can instead be
+	given as a raw friendship changes file (see read_user_edge_changes).
+	"""
+	user_IDs, sources, targets = load_user_edge_arrays(input_file_name, edge_changes_file_name=edge_changes_file_name)
+	adjacency = adjacency_matrix(sources, targets, node_count=len(user_IDs))
+
+	initial_ranks = None
+	if previous_pageranks_file_name:
+		previous_pagerank_for_user = read_user_pageranks(input_file_name=previous_pageranks_file_name)
+		initial_ranks = numpy.array([previous_pagerank_for_user.get(user_ID, 1.0 / len(user_IDs)) for user_ID in user_IDs])
+
+	pageranks, iteration_count, residual = pagerank_with_convergence(adjacency, initial_ranks=initial_ranks)
+	print 'PageRank converged in ' + str(iteration_count) + ' iterations (' + ('warm' if previous_pageranks_file_name else 'cold') + ' start), final L1 residual ' + str(residual)
+
+	write_single_user_attribute_values(user_IDs, pageranks, output_file_name)
+
+
+def extract_user_graph_centralities(
+	input_file_name=DEFAULT_RAW_USERS_FILE_NAME,
+	input_training_set_file_name=DEFAULT_TRAINING_SET_FILE_NAME,
+	output_hits_scores_file_name=DEFAULT_HITS_SCORES_FILE_NAME,
+	output_elite_pageranks_file_name=DEFAULT_ELITE_PAGERANKS_FILE_NAME,
+	output_core_numbers_file_name=DEFAULT_CORE_NUMBERS_FILE_NAME,
+	output_betweennesses_file_name=DEFAULT_BETWEENNESSES_FILE_NAME,
+	betweenness_sample_size=100,
+	elite_pagerank_fold_count=5,
+	random_seed=0,
+):
+	"""
+	Given a Yelp dataset users file, computes several centralities over a single sparse adjacency
+	matrix of the friend graph, and builds one file per centrality:
+		user_1_ID user_1_centrality
+			.
+			.
+			.
+		user_N_ID user_N_centrality
+
+	The centralities are:
+		hits_score : HITS score (hub and authority scores coincide on the undirected friend graph)
+		elite_pagerank : PageRank personalized toward the Elite users of the training set, computed
+			out-of-fold (see below)
+		core_number : k-core number
+		betweenness : betweenness centrality, an estimate from betweenness_sample_size source users
+			sampled with random_seed (see approximate_betweenness), so that repeated extractions
+			agree; the fewer the sources, the noisier the estimate (and the more users get 0)
+
+	NOTE: Seeding elite_pagerank with a user's own Elite status would leak the user's label into
+	the feature (an Elite user gains rank by teleporting to itself), and training and test users
+	would get differently distributed values. Instead, all users are split into
+	elite_pagerank_fold_count folds (see user_fold), and each fold's users get PageRanks seeded
+	only by the training set's Elite users in the other folds, so no user's label affects its own
+	feature and training and test users are treated alike.
+	"""
+	print 'READING IN YELP USER GRAPH'
+	user_IDs, sources, targets = load_user_edge_arrays(input_file_name)
+	adjacency = adjacency_matrix(sources, targets, node_count=len(user_IDs))
+
+	print 'COMPUTING HITS SCORES'
+	hub_scores, authority_scores = hits(adjacency)
+	write_single_user_attribute_values(user_IDs, hub_scores, output_hits_scores_file_name)
+
+	print 'COMPUTING ELITE-PERSONALIZED PAGERANKS'
+	elite_user_IDs = { user['ID'] for user in read_training_set(input_file_name=input_training_set_file_name, attributes=['ID', 'label']) if user['label'] == 1 }
+	is_elite = numpy.array([ user_ID in elite_user_IDs for user_ID in user_IDs ])
+	fold_for_user = numpy.array([ user_fold(user_ID, elite_pagerank_fold_count) for user_ID in user_IDs ])
+	elite_pageranks = numpy.zeros(len(user_IDs))
+	fold_pageranks = None
+	for fold in xrange(elite_pagerank_fold_count):
+		# Each fold warm-starts from the previous fold's PageRanks, which differ only in their seeds
+		personalization = (is_elite & (fold_for_user != fold)).astype(numpy.float64)
+		fold_pageranks = pagerank(adjacency, personalization=personalization, initial_ranks=fold_pageranks)
+		elite_pageranks[fold_for_user == fold] = fold_pageranks[fold_for_user == fold]
+	write_single_user_attribute_values(user_IDs, elite_pageranks, output_elite_pageranks_file_name)
+
+	print 'COMPUTING CORE NUMBERS'
+	write_single_user_attribute_values(user_IDs, core_numbers(adjacency), output_core_numbers_file_name)
+
+	print 'ESTIMATING BETWEENNESS CENTRALITIES'
+	betweennesses = approximate_betweenness(adjacency, sample_size=betweenness_sample_size, random_state=random_seed)
+	write_single_user_attribute_values(user_IDs, betweennesses, output_betweennesses_file_name)
+
+
+def extract_user_business_review_features(
+	input_reviews_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME,
+	input_businesses_file_name=DEFAULT_RAW_BUSINESSES_FILE_NAME,
+	output_category_counts_file_name=DEFAULT_REVIEWED_CATEGORY_COUNTS_FILE_NAME,
+	output_city_counts_file_name=DEFAULT_REVIEWED_CITY_COUNTS_FILE_NAME,
+	output_coreview_pageranks_file_name=DEFAULT_COREVIEW_PAGERANKS_FILE_NAME,
+	output_relative_review_ranks_file_name=DEFAULT_RELATIVE_REVIEW_RANKS_FILE_NAME,
+):
+	"""
+	Given Yelp dataset reviews and businesses files, builds a sparse user-by-business review matrix
+	and derives one file per feature:
+		user_1_ID user_1_feature
+			.
+			.
+			.
+		user_N_ID user_N_feature
+
+	The features are:
+		reviewed_category_count : number of distinct business categories the user has reviewed
+		reviewed_city_count : number of distinct cities the user has reviewed businesses in
+			(both only count businesses listed in the businesses file)
+		coreview_pagerank : PageRank in the co-review graph, in which two users are joined by an
+			edge weighted by the number of businesses both have reviewed
+		average_relative_review_rank : average position of the user's reviews among all reviews of
+			the same business, by date (0 = first reviewer, approaching 1 = last)
 	"""
-	graph = read_user_graph(input_file_name)
-	pagerank_for_user = networkx.pagerank(graph)
-	
-	write_single_user_attribute(pagerank_for_user, output_file_name)
+	print 'READING IN REVIEWS'
+	user_IDs, business_IDs, review_users, review_businesses, review_days = read_user_business_reviews(input_reviews_file_name)
+	user_count, business_count, review_count = len(user_IDs), len(business_IDs), len(review_users)
+
+	# (user, business) --> 1 if the user has reviewed the business
+	reviews_matrix = scipy.sparse.csr_matrix((numpy.ones(review_count), (review_users, review_businesses)), shape=(user_count, business_count))
+	reviews_matrix.data[:] = 1
+
+	print 'COUNTING DISTINCT CATEGORIES AND CITIES'
+	categories_and_city_for_business = read_business_categories_and_cities(input_businesses_file_name)
+	index_for_category = {}
+	index_for_city = {}
+	category_rows, category_columns, city_rows, city_columns = [], [], [], []
+	for business_index, business_ID in enumerate(business_IDs):
+		# Businesses missing from the businesses file count toward neither categories nor cities
+		categories, city = categories_and_city_for_business.get(business_ID, ([], None))
+		for category in categories:
+			category_rows += [business_index]
+			category_columns += [index_for_category.setdefault(category, len(index_for_category))]
+		if city:
+			city_rows += [business_index]
+			city_columns += [index_for_city.setdefault(city, len(index_for_city))]
+
+	# (business, category) --> 1 if the business is in the category; likewise for cities
+	categories_matrix = scipy.sparse.csr_matrix((numpy.ones(len(category_rows)), (category_rows, category_columns)), shape=(business_count, len(index_for_category)))
+	cities_matrix = scipy.sparse.csr_matrix((numpy.ones(len(city_rows)), (city_rows, city_columns)), shape=(business_count, len(index_for_city)))
+
+	# (user, category) --> number of reviews in the category; nonzeros per row are distinct categories
+	write_single_user_attribute_values(user_IDs, numpy.diff(reviews_matrix.dot(categories_matrix).indptr), output_category_counts_file_name)
+	write_single_user_attribute_values(user_IDs, numpy.diff(reviews_matrix.dot(cities_matrix).indptr), output_city_counts_file_name)
+
+	print 'COMPUTING CO-REVIEW PAGERANKS'
+	coreview_pageranks = pagerank(bipartite_projection(reviews_matrix))
+	write_single_user_attribute_values(user_IDs, coreview_pageranks, output_coreview_pageranks_file_name)
+
+	print 'COMPUTING RELATIVE REVIEW RANKS'
+	# Sort reviews by business, then date; a review's rank is its position within its business
+	order = numpy.lexsort((review_days, review_businesses))
+	business_review_counts = numpy.bincount(review_businesses, minlength=business_count)
+	business_first_positions = numpy.cumsum(business_review_counts) - business_review_counts
+	sorted_businesses = review_businesses[order]
+	relative_ranks = (numpy.arange(review_count) - business_first_positions[sorted_businesses]) / business_review_counts[sorted_businesses].astype(numpy.float64)
+
+	user_review_counts = numpy.bincount(review_users, minlength=user_count)
+	average_relative_ranks = numpy.bincount(review_users[order], weights=relative_ranks, minlength=user_count) / numpy.maximum(user_review_counts, 1)
+	write_single_user_attribute_values(user_IDs, average_relative_ranks, output_relative_review_ranks_file_name)
+
+
+def extract_user_temporal_review_statistics(
+	input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME,
+	output_reviews_per_year_file_name=DEFAULT_REVIEWS_PER_YEAR_FILE_NAME,
+	output_review_gaps_file_name=DEFAULT_REVIEW_GAPS_FILE_NAME,
+	output_review_date_deviations_file_name=DEFAULT_REVIEW_DATE_DEVIATIONS_FILE_NAME,
+	output_review_burstinesses_file_name=DEFAULT_REVIEW_BURSTINESSES_FILE_NAME,
+	output_recent_review_counts_file_name=DEFAULT_RECENT_REVIEW_COUNTS_FILE_NAME,
+	reference_date_string=None,
+):
+	"""
+	Given a Yelp dataset reviews file, computes temporal statistics of each user's reviews in a
+	single pass and builds one file per statistic:
+		user_1_ID user_1_statistic
+			.
+			.
+			.
+		user_N_ID user_N_statistic
+
+	The statistics, relative to a reference date formatted as YYYY-MM-DD (the latest review date in
+	the file, if None), are:
+		reviews_per_year : reviews per year since the user's first review
+		average_review_gap_days : average number of days between consecutive reviews
+		review_date_deviation_days : standard deviation of review dates, in days
+		review_burstiness : (sigma - mu) / (sigma + mu) of the user's reviews per calendar year,
+			over the years since the first review (-1 = perfectly regular, 1 = maximally bursty)
+		recent_review_count : number of reviews in the 365 days up to the reference date
+
+	Each user's state is a fixed number of numeric array entries (not a list of their reviews), so
+	memory grows with the number of users rather than reviews; only reviews that may fall in the
+	final 365 days are kept, as (user row, day) pairs, until the reference date is known. Since
+	reviews are not ordered by user and date, gaps are averaged exactly from the first and last
+	dates, but their variance is represented by the spread of review dates and the burstiness of
+	yearly counts.
+	"""
+	# Without a reference date, years are counted up to this one and trimmed after the pass
+	reference_day = days_since_year_one(reference_date_string) if reference_date_string else None
+	last_counted_year = date.fromordinal(reference_day).year if reference_day else max(CURRENT_YEAR, YELP_FOUNDING_YEAR)
+	founding_day = date(YELP_FOUNDING_YEAR, 1, 1).toordinal()
+
+	# Per user: a fixed number of running aggregates of review dates
+	store = UserAggregateStore()
+	store.add_column('review_count', dtype=numpy.int32)
+	store.add_column('first_day', dtype=numpy.int32, fill_value=numpy.iinfo(numpy.int32).max)
+	store.add_column('last_day', dtype=numpy.int32, fill_value=numpy.iinfo(numpy.int32).min)
+	store.add_column('day_offset_sum', dtype=numpy.float64)			# Days relative to the founding day
+	store.add_column('squared_day_offset_sum', dtype=numpy.float64)
+	store.add_column('yearly_review_counts', dtype=numpy.int32, shape=(last_counted_year - YELP_FOUNDING_YEAR + 1,))
+
+	# Reviews within 365 days of the latest day so far (or of the reference day), pruned as it advances
+	recent_review_rows, recent_review_days = array.array('i'), array.array('i')
+	latest_day = reference_day or 0
+	prune_length = 1024
+
+	statistics = PipelineStatistics()
+	with open_raw_data_file(input_file_name) as reviews_file:
+
+		for user_ID, review_date in prefetched_decoded_records(reviews_file, decode_batch=partial(decode_JSON_fields, field_names=('user_id', 'date')), statistics=statistics):
+			user_row = store.row(user_ID)
+
+			day = days_since_year_one(review_date)
+			store.add('review_count', user_row, 1)
+			store.minimize('first_day', user_row, day)
+			store.maximize('last_day', user_row, day)
+			store.add('day_offset_sum', user_row, day - founding_day)
+			store.add('squared_day_offset_sum', user_row, (day - founding_day) ** 2)
+			store.values('yearly_review_counts')[user_row, min(max(int(review_date[0:4]), YELP_FOUNDING_YEAR), last_counted_year) - YELP_FOUNDING_YEAR] += 1
+
+			if reference_day is None:
+				latest_day = max(latest_day, day)
+			if 0 <= latest_day - day < 365:
+				recent_review_rows.append(user_row)
+				recent_review_days.append(day)
+
+				if len(recent_review_days) > prune_length:
+					is_recent = latest_day - numpy.frombuffer(recent_review_days, dtype=numpy.int32) < 365
+					recent_review_rows = array.array('i', numpy.frombuffer(recent_review_rows, dtype=numpy.int32)[is_recent].tostring())
+					recent_review_days = array.array('i', numpy.frombuffer(recent_review_days, dtype=numpy.int32)[is_recent].tostring())
+					prune_length = max(2 * len(recent_review_days), 1024)
+
+	print statistics.summary()
+
+	reference_day = latest_day if reference_day is None else reference_day
+	reference_year = date.fromordinal(max(reference_day, founding_day)).year
+	year_count = reference_year - YELP_FOUNDING_YEAR + 1
+
+	# Compute statistics for all users at once
+	review_counts = store.values('review_count').astype(numpy.float64)
+	first_days, last_days = store.values('first_day'), store.values('last_day')
+	years_since_first_review = numpy.maximum((reference_day - first_days) / 365.25, 1.0)
+	reviews_per_year = review_counts / years_since_first_review
+	average_review_gaps = (last_days - first_days) / numpy.maximum(review_counts - 1, 1)
+	mean_day_offsets = store.values('day_offset_sum') / review_counts
+	review_date_deviations = numpy.sqrt(numpy.maximum(store.values('squared_day_offset_sum') / review_counts - mean_day_offsets ** 2, 0))
+
+	is_recent = reference_day - numpy.frombuffer(recent_review_days, dtype=numpy.int32) < 365
+	recent_review_counts = numpy.bincount(numpy.frombuffer(recent_review_rows, dtype=numpy.int32)[is_recent], minlength=store.user_count())
+
+	# Burstiness of yearly counts, over the years from each user's first review to the reference year
+	yearly_review_counts = store.values('yearly_review_counts')[:, :year_count].copy()
+	yearly_review_counts[:, -1] += store.values('yearly_review_counts')[:, year_count:].sum(axis=1)
+	first_years = numpy.array([date.fromordinal(day).year for day in first_days]) - YELP_FOUNDING_YEAR
+	is_active_year = numpy.arange(year_count) >= numpy.clip(first_years, 0, year_count - 1)[:, numpy.newaxis]
+	active_year_counts = is_active_year.sum(axis=1)
+	yearly_means = (yearly_review_counts * is_active_year).sum(axis=1) / active_year_counts.astype(numpy.float64)
+	yearly_deviations = numpy.sqrt( (((yearly_review_counts - yearly_means[:, numpy.newaxis]) ** 2) * is_active_year).sum(axis=1) / active_year_counts )
+	review_burstinesses = (yearly_deviations - yearly_means) / numpy.maximum(yearly_deviations + yearly_means, 1.0e-12)
+
+	store.write_column_values(reviews_per_year, output_reviews_per_year_file_name)
+	store.write_column_values(average_review_gaps, output_review_gaps_file_name)
+	store.write_column_values(review_date_deviations, output_review_date_deviations_file_name)
+	store.write_column_values(review_burstinesses, output_review_burstinesses_file_name)
+	store.write_column_values(recent_review_counts, output_recent_review_counts_file_name)
+
+
+# Layouts of the per-user sketches of extract_user_review_distribution_features (about 750 bytes
+# per user, or 480 without reading levels)
+REVIEW_LENGTH_SKETCH = LogBucketQuantileSketch(relative_accuracy=0.05, minimum_value=1, maximum_value=5000)
+READING_LEVEL_SKETCH = LogBucketQuantileSketch(relative_accuracy=0.03, minimum_value=1, maximum_value=50)
+REVIEWED_BUSINESS_SKETCH = HyperLogLogSketch(precision=7)
+REVIEW_LINES_PER_SKETCH_BATCH = 10000
+REVIEW_BYTES_PER_SKETCH_SHARD = 32 * 2**20
+
+def extract_user_review_distribution_features(
+	input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME,
+	output_median_review_lengths_file_name=DEFAULT_MEDIAN_REVIEW_LENGTHS_FILE_NAME,
+	output_review_length_90th_percentiles_file_name=DEFAULT_REVIEW_LENGTH_90TH_PERCENTILES_FILE_NAME,
+	output_reading_level_spreads_file_name=DEFAULT_READING_LEVEL_SPREADS_FILE_NAME,
+	output_distinct_business_counts_file_name=DEFAULT_DISTINCT_BUSINESS_COUNTS_FILE_NAME,
+	include_reading_levels=True,
+	syllable_lexicon_file_name=DEFAULT_SYLLABLE_LEXICON_FILE_NAME,
+	processes=multiprocessing.cpu_count(),
+):
+	"""
+	Given a Yelp dataset reviews file, computes distributional features of each user's reviews in
+	a single pass and builds one file per feature:
+		user_1_ID user_1_feature
+			.
+			.
+			.
+		user_N_ID user_N_feature
+
+	The features are:
+		median_review_length : median length of the user's reviews, in words
+		review_length_90th_percentile : 90th percentile of the lengths of the user's reviews
+		reading_level_interquartile_range : spread (75th minus 25th percentile) of the SMOG reading
+			levels of the user's reviews (only if include_reading_levels, which is expensive; see
+			extract_user_reading_levels)
+		distinct_reviewed_business_count : number of distinct businesses the user has reviewed
+
+	Exact quantiles and distinct counts would need all of a user's reviews in memory. Instead, each
+	user has fixed-size sketches (see sketch_utilities): review lengths and reading levels in
+	quantile sketches (estimates within 5% and 3% of the true values), and businesses in a
+	HyperLogLog sketch (nearly exact for a few businesses, with a standard error of about 9% for
+	many). The file is split into byte ranges of at most REVIEW_BYTES_PER_SKETCH_SHARD bytes (see
+	read_user_edge_arrays), or a compressed file into batches of lines, sketched by worker
+	processes. Each worker's sketches cover only the users of its shard, and are merged into the
+	result as they arrive, so that memory does not grow with processes times users.
+	"""
+	if include_reading_levels and os.path.exists(processed_data_absolute_path(syllable_lexicon_file_name)):
+		lexicon.load_lexicon(processed_data_absolute_path(syllable_lexicon_file_name))
+
+	absolute_path = resolved_raw_data_absolute_path(input_file_name)
+	pool = multiprocessing.Pool(processes) if processes > 1 else None
+	try:
+		if compression_extension(absolute_path):
+			with open_raw_data_file(input_file_name) as reviews_file:
+				review_line_batches = iterate_in_chunks(reviews_file, REVIEW_LINES_PER_SKETCH_BATCH)
+				sketch_batch = partial(_sketch_user_review_distributions, include_reading_levels=include_reading_levels)
+				shard_stores = pool.imap(sketch_batch, review_line_batches) if pool else itertools.imap(sketch_batch, review_line_batches)
+				store = _merged_review_distribution_stores(shard_stores, include_reading_levels=include_reading_levels)
+		else:
+			shard_count = max(processes, -(-os.path.getsize(absolute_path) // REVIEW_BYTES_PER_SKETCH_SHARD))
+			shards = [ (absolute_path, start_offset, end_offset) for start_offset, end_offset in byte_range_shards(absolute_path, shard_count) ]
+			sketch_shard = partial(_sketch_user_review_distribution_shard, include_reading_levels=include_reading_levels)
+			shard_stores = pool.imap(sketch_shard, shards) if pool else itertools.imap(sketch_shard, shards)
+			store = _merged_review_distribution_stores(shard_stores, include_reading_levels=include_reading_levels)
+	finally:
+		# All sketches are merged (or a worker failed), so stop the workers either way
+		if pool:
+			pool.terminate()
+			pool.join()
+
+	# Compute features for all users at once
+	review_length_sketches = store.values('review_length_sketch')
+	store.write_column_values(REVIEW_LENGTH_SKETCH.quantiles(review_length_sketches, 0.5), output_median_review_lengths_file_name)
+	store.write_column_values(REVIEW_LENGTH_SKETCH.quantiles(review_length_sketches, 0.9), output_review_length_90th_percentiles_file_name)
+	if include_reading_levels:
+		reading_level_sketches = store.values('reading_level_sketch')
+		store.write_column_values(READING_LEVEL_SKETCH.quantiles(reading_level_sketches, 0.75) - READING_LEVEL_SKETCH.quantiles(reading_level_sketches, 0.25), output_reading_level_spreads_file_name)
+	store.write_column_values(numpy.round(REVIEWED_BUSINESS_SKETCH.distinct_counts(store.values('business_sketch'))).astype(numpy.int64), output_distinct_business_counts_file_name)
+
+
+def _merged_review_distribution_stores(stores, include_reading_levels=True):
+	"""Given an iterable of stores of review distribution sketches (see _sketch_user_review_distributions), returns a single store merging them."""
+	merged_store = _new_review_distribution_store(include_reading_levels=include_reading_levels)
+	for store in stores:
+		merged_store.merge(store, combine_for_column={
+			'review_length_sketch': REVIEW_LENGTH_SKETCH.merge,
+			'reading_level_sketch': READING_LEVEL_SKETCH.merge,
+			'business_sketch': REVIEWED_BUSINESS_SKETCH.merge,
+		})
+	return merged_store
+
+
+def _new_review_distribution_store(include_reading_levels=True):
+	"""
+	Returns an empty UserAggregateStore with a column per sketch of
+	extract_user_review_distribution_features (reading levels only if include_reading_levels).
+	"""
+	store = UserAggregateStore()
+	store.add_column('review_length_sketch', dtype=REVIEW_LENGTH_SKETCH.dtype, shape=(REVIEW_LENGTH_SKETCH.bucket_count,))
+	if include_reading_levels:
+		store.add_column('reading_level_sketch', dtype=READING_LEVEL_SKETCH.dtype, shape=(READING_LEVEL_SKETCH.bucket_count,))
+	store.add_column('business_sketch', dtype=REVIEWED_BUSINESS_SKETCH.dtype, shape=(REVIEWED_BUSINESS_SKETCH.register_count,))
+	return store
+
+
+def _sketch_user_review_distribution_shard((absolute_path, start_offset, end_offset), include_reading_levels=True):
+	"""
+	Given the absolute path of an uncompressed Yelp dataset reviews file and a byte range within
+	it, sketches every review whose line starts within the range (see _sketch_user_review_distributions).
+	"""
+	with open(absolute_path) as reviews_file:
+		return _sketch_user_review_distributions(byte_range_lines(reviews_file, start_offset, end_offset), include_reading_levels=include_reading_levels)
+
+
+def _sketch_user_review_distributions(review_lines, include_reading_levels=True):
+	"""
+	Given lines of a Yelp dataset reviews file, returns a UserAggregateStore holding each user's
+	sketches of review lengths, reading levels (if include_reading_levels) and reviewed businesses.
+	Reviews are decoded in batches, and each batch's values are added to the sketches at once.
+	The store's columns are trimmed to its users, to be sent back from a worker process.
+	"""
+	murmurhash3_32 = sklearn_utilities.murmurhash3_32
+	store = _new_review_distribution_store(include_reading_levels=include_reading_levels)
+
+	for review_lines_batch in iterate_in_chunks(review_lines, REVIEW_LINES_PER_SKETCH_BATCH):
+		rows, review_lengths, business_hashes, reading_level_rows, reading_levels = [], [], [], [], []
+		for review_line in review_lines_batch:
+			review = json.loads(review_line)
+			row = store.row(review['user_id'])
+			rows += [row]
+			review_lengths += [ len(review['text'].split()) ]
+			business_hashes += [ murmurhash3_32(review['business_id'], positive=True) ]
+
+			if include_reading_levels:
+				try:
+					reading_levels += [ readability.Readability(review['text']).SMOGIndex() ]
+					reading_level_rows += [row]
+				except UnicodeEncodeError as error:
+					pass
+
+		REVIEW_LENGTH_SKETCH.add(store.values('review_length_sketch'), rows, review_lengths)
+		REVIEWED_BUSINESS_SKETCH.add(store.values('business_sketch'), rows, business_hashes)
+		if include_reading_levels:
+			READING_LEVEL_SKETCH.add(store.values('reading_level_sketch'), reading_level_rows, reading_levels)
+
+	store.trim()
+	return store
+
+
+def extract_user_text_features(
+	input_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME,
+	input_users_file_name=DEFAULT_BASIC_ATTRIBUTES_FILE_NAME,
+	output_file_name=DEFAULT_TEXT_FEATURES_FILE_NAME,
+	feature_count=2**18,
+	sublinear_term_frequencies=True,
+):
+	"""
+	Given a Yelp dataset reviews file, builds a processed text features file (see
+	write_user_text_features) holding, for each user in the processed users file (in its order),
+	a sparse vector of feature_count TF-IDF weighted 'bag of words' features of their reviews.
+
+	Each token (a run of 2+ letters or digits, lowercased) is hashed to one of feature_count
+	features (the 'hashing trick'), so no vocabulary is kept in memory. Reviews are tokenized,
+	hashed and counted per user by the decode worker processes while the file is streamed; inverse
+	document frequencies (treating each user's reviews as one document) are then computed from the
+	resulting count matrix, and each user's vector is normalized to unit length.
+	"""
+	# Per user: row of the count matrix; per batch: (user row, feature, count) triples
+	store = UserAggregateStore()
+	user_rows = []
+	features = []
+	counts = []
+
+	statistics = PipelineStatistics()
+	with open_raw_data_file(input_file_name) as reviews_file:
+
+		decode_batch = partial(_decode_review_hashed_token_counts, feature_count=feature_count)
+		for batch_number, (batch_user_IDs, batch_user_indices, batch_features, batch_counts) in enumerate(prefetched_decoded_records(reviews_file, decode_batch=decode_batch, lines_per_batch=2000, statistics=statistics)):
+			row_for_batch_user_index = numpy.array([ store.row(user_ID) for user_ID in batch_user_IDs ], dtype=numpy.int32)
+			user_rows += [ row_for_batch_user_index[batch_user_indices] ]
+			features += [batch_features]
+			counts += [batch_counts]
+
+			# Periodically sum the counts of (user, feature) pairs repeated across batches
+			if len(counts) >= 100:
+				user_rows, features, counts = _summed_sparse_triples(user_rows, features, counts, store.user_count(), feature_count)
+
+	print statistics.summary()
+	token_counts = scipy.sparse.coo_matrix(
+		(numpy.concatenate(counts).astype(numpy.float64), (numpy.concatenate(user_rows), numpy.concatenate(features))),
+		shape=(store.user_count(), feature_count),
+	).tocsr()
+	token_counts.sum_duplicates()
+
+	# Reorder rows to match the processed users file (users without reviews get empty rows)
+	user_IDs = [ user_row[0] for user_rows_chunk in read_multiple_user_attribute_rows_in_chunks(input_users_file_name, ['ID']) for user_row in user_rows_chunk ]
+	text_features = user_text_feature_rows(store.user_IDs, token_counts, user_IDs)
+
+	# TF-IDF weighting: (1 + log(count) if sublinear) * (1 + log((1 + users) / (1 + users using the feature)))
+	document_frequencies = numpy.bincount(text_features.indices, minlength=feature_count)
+	inverse_document_frequencies = 1.0 + numpy.log( (1.0 + len(user_IDs)) / (1.0 + document_frequencies) )
+	if sublinear_term_frequencies:
+		text_features.data = 1.0 + numpy.log(text_features.data)
+	text_features.data *= inverse_document_frequencies[text_features.indices]
+
+	# Normalize each user's vector to unit (Euclidean) length
+	row_norms = numpy.sqrt(numpy.asarray(text_features.multiply(text_features).sum(axis=1)).ravel())
+	text_features.data /= numpy.repeat(numpy.maximum(row_norms, 1.0e-12), numpy.diff(text_features.indptr))
+
+	write_user_text_features(user_IDs, text_features.astype(numpy.float32), output_file_name)
+
+
+TEXT_TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+def _decode_review_hashed_token_counts(review_lines, feature_count):
+	"""
+	Given lines of a Yelp dataset reviews file and a number of hashed features, returns a list
+	holding a single tuple (user_IDs, user_indices, features, counts), where
+		user_IDs : a list of the reviews' users, in order of first appearance
+		user_indices, features, counts : numpy arrays listing, for each distinct (user, hashed token
+			feature) pair among the reviews, the user's index in user_IDs and the pair's count
+	"""
+	murmurhash3_32 = sklearn_utilities.murmurhash3_32
+	index_for_user_ID = {}
+	count_for_user_index_and_feature = Counter()
+	for review_line in review_lines:
+		review = json.loads(review_line)
+		user_index = index_for_user_ID.setdefault(review['user_id'], len(index_for_user_ID))
+		for token in TEXT_TOKEN_PATTERN.findall(review['text'].lower()):
+			count_for_user_index_and_feature[(user_index, murmurhash3_32(token, positive=True) % feature_count)] += 1
+
+	user_IDs = [None] * len(index_for_user_ID)
+	for user_ID, user_index in index_for_user_ID.iteritems():
+		user_IDs[user_index] = user_ID
+
+	user_indices_and_features = numpy.array(count_for_user_index_and_feature.keys(), dtype=numpy.int32).reshape(-1, 2)
+	counts = numpy.array(count_for_user_index_and_feature.values(), dtype=numpy.int32)
+	return [ (user_IDs, user_indices_and_features[:,0], user_indices_and_features[:,1], counts) ]
+
+
+def _summed_sparse_triples(rows, columns, values, row_count, column_count):
+	"""
+	Given lists of numpy arrays of (row, column, value) triples of a sparse matrix, returns the
+	same in the form of single-element lists, with the values of repeated (row, column) pairs summed.
+	"""
+	matrix = scipy.sparse.coo_matrix((numpy.concatenate(values), (numpy.concatenate(rows), numpy.concatenate(columns))), shape=(row_count, column_count)).tocsr()
+	matrix.sum_duplicates()
+	matrix = matrix.tocoo()
+	return [matrix.row.astype(numpy.int32)], [matrix.col.astype(numpy.int32)], [matrix.data]
 
 
 def combine_all_user_data(
@@ -146,6 +762,8 @@ def combine_all_user_data(
 	input_tip_counts_file_name=DEFAULT_TIP_COUNTS_FILE_NAME,
 	input_pageranks_file_name=DEFAULT_PAGERANKS_FILE_NAME,
 	output_users_file_name=DEFAULT_COMBINED_USERS_FILE_NAME,
+	additional_attributes=[],
+	input_file_name_for_additional_attribute=DEFAULT_FILE_NAME_FOR_ADDITIONAL_ATTRIBUTE,
 ):
 	"""
 	Given all processed data on users, combines them into a single file formatted as follows:
@@ -155,6 +773,9 @@ def combine_all_user_data(
 			.
 			.
 		user_N_ID user_N_review_count ... user_N_pagerank
+
+	Optional attributes (e.g. GRAPH_CENTRALITY_USER_ATTRIBUTES) named in additional_attributes are
+	read from their processed files and appended as extra columns.
 	"""
 	# Read in basic user attributes
 	user_for_ID = { user['ID']: user for user in read_user_basic_attributes(input_file_name=input_basic_attributes_file_name) }
@@ -172,37 +793,111 @@ def combine_all_user_data(
 		user['tip_count'] = tip_count_for_user.get(user_ID, 0)
 		user['pagerank'] = pagerank_for_user.get(user_ID, 0)
 
-	write_multiple_user_attributes(user_for_ID.itervalues(), ALL_USER_ATTRIBUTES, output_users_file_name)
+	# Read in and fill in optional attributes one at a time
+	for attribute in additional_attributes:
+		value_for_user = read_single_user_attribute(input_file_name=input_file_name_for_additional_attribute[attribute], attribute_name=attribute)
+		for user_ID, user in user_for_ID.iteritems():
+			user[attribute] = value_for_user.get(user_ID, 0)
+
+	write_multiple_user_attributes(user_for_ID.itervalues(), ALL_USER_ATTRIBUTES + additional_attributes, output_users_file_name)
 
 
 def create_training_and_test_sets(
 	input_users_file_name=DEFAULT_COMBINED_USERS_FILE_NAME,
 	output_training_set_file_name=DEFAULT_TRAINING_SET_FILE_NAME,
 	output_test_set_file_name=DEFAULT_TEST_SET_FILE_NAME,
-	fraction_for_training=0.8
+	fraction_for_training=0.8,
+	additional_attributes=[],
+	split_seed=DEFAULT_TRAINING_SPLIT_SEED,
 ):
 	"""
-	Given a single user data file output by combine_all_user_data(), randomly partitions the users
-	into two new files:
+	Given a single user data file output by combine_all_user_data(), partitions the users into two
+	new files:
 		- Training set
 		- Test set
 
 	These files are formatted the same as the input, except:
 		- Attribute/column 'years_elite' (nonnegative integer) --> column 'label' (0 or 1)
-	"""
-	users = read_combined_users()
 
-	# Replace integer 'years_elite' attribute with 0/1 'label'
-	binarize_attribute(users, 'years_elite')
-	designate_attribute_as_label(users, 'years_elite')
-	
-	# Randomly partition users into training and test sets
-	random.shuffle(users)
-	training_users, test_users = random_partition(users, fraction_for_training)
-
-	# Write to files
-	write_multiple_user_attributes(training_users, TRAINING_AND_TEST_SET_ATTRIBUTES, output_training_set_file_name)
-	write_multiple_user_attributes(test_users, TRAINING_AND_TEST_SET_ATTRIBUTES, output_test_set_file_name)
+	Users are assigned by a seeded hash of their IDs (see is_training_user), so the same users stay
+	in the same set across dataset refreshes, and Elite and non-Elite users are each split in
+	approximately the proportion fraction_for_training (per class, since each user's set depends
+	only on its hash, not on how many users of its class came before). The input is streamed in chunks and both files are written
+	in the same pass, so memory use does not grow with the number of users.
 
+	Optional attributes named in additional_attributes (which must have been combined into the
+	input file) are carried over as extra columns.
+	"""
+	attributes_to_write = TRAINING_AND_TEST_SET_ATTRIBUTES + additional_attributes
+	label_counts_for_set = { 'training': [0, 0], 'test': [0, 0] }
+
+	with open_processed_output_file(output_training_set_file_name) as training_set_file, open_processed_output_file(output_test_set_file_name) as test_set_file:
+		training_set_file.write( ' '.join(attributes_to_write) + '\n' )
+		test_set_file.write( ' '.join(attributes_to_write) + '\n' )
+
+		for users_chunk in read_multiple_user_attributes_in_chunks(input_file_name=input_users_file_name, attributes=ALL_USER_ATTRIBUTES + additional_attributes):
+
+			# Replace integer 'years_elite' attribute with 0/1 'label'
+			binarize_attribute(users_chunk, 'years_elite')
+			designate_attribute_as_label(users_chunk, 'years_elite')
+
+			# Partition users into training and test sets
+			training_users = []
+			test_users = []
+			for user in users_chunk:
+				if is_training_user(user['ID'], fraction_for_training=fraction_for_training, split_seed=split_seed):
+					training_users += [user]
+					label_counts_for_set['training'][user['label']] += 1
+				else:
+					test_users += [user]
+					label_counts_for_set['test'][user['label']] += 1
+
+			write_user_attribute_rows(training_set_file, training_users, attributes_to_write)
+			write_user_attribute_rows(test_set_file, test_users, attributes_to_write)
+
+	for set_name in ['training', 'test']:
+		non_elite_count, elite_count = label_counts_for_set[set_name]
+		print set_name.capitalize() + ' set: ' + str(elite_count) + ' Elite and ' + str(non_elite_count) + ' non-Elite users'
+
+
+def build_dataset_concurrently(
+	cpu_budget=None,
+	memory_budget_GB=None,
+	reviews_to_analyze_per_user=float('inf'),
+	fraction_for_training=0.8,
+):
+	"""
+	Runs every step of 'Extract Features' and 'Build the Dataset' (see the README) as a dependency
+	graph of stages (see run_pipeline_stages), so that stages reading different raw files (users,
+	reviews, tips) run concurrently within cpu_budget CPUs and memory_budget_GB GB of memory:
 
+		users file:    extract_user_basic_attributes -------------------------------+
+		               extract_user_edge_arrays --> extract_user_pageranks ---------+
+		reviews file:  extract_user_average_review_lengths -------------------------+--> combine_all_user_data --> create_training_and_test_sets
+		               extract_syllable_lexicon --> extract_user_reading_levels ----+
+		tips file:     extract_user_tip_counts -------------------------------------+
 
+	Prints a timeline of the stages at the end.
+	"""
+	cpu_budget = cpu_budget or multiprocessing.cpu_count()
+
+	# Stages decoding a raw file get a third of the CPUs, so that the three raw files are read at once
+	cpu_share = max(cpu_budget // 3, 1)
+
+	# (name, function, dependencies, CPUs it can keep busy, rough peak memory in GB on the full Yelp dataset)
+	stages = [
+		('extract_user_basic_attributes', extract_user_basic_attributes, [], cpu_share, 1.5),
+		('extract_user_edge_arrays', partial(extract_user_edge_arrays, processes=cpu_share), [], cpu_share, 2.0),
+		('extract_user_pageranks', extract_user_pageranks, ['extract_user_edge_arrays'], 1, 1.5),
+		('extract_user_average_review_lengths', extract_user_average_review_lengths, [], cpu_share, 0.5),
+		('extract_syllable_lexicon', extract_syllable_lexicon, [], cpu_share, 0.5),
+		('extract_user_reading_levels', partial(extract_user_reading_levels, reviews_to_analyze_per_user=reviews_to_analyze_per_user), ['extract_syllable_lexicon'], 2, 0.5),
+		('extract_user_tip_counts', extract_user_tip_counts, [], cpu_share, 0.3),
+		('combine_all_user_data', combine_all_user_data, ['extract_user_basic_attributes', 'extract_user_pageranks', 'extract_user_average_review_lengths', 'extract_user_reading_levels', 'extract_user_tip_counts'], 1, 2.0),
+		('create_training_and_test_sets', partial(create_training_and_test_sets, fraction_for_training=fraction_for_training), ['combine_all_user_data'], 1, 1.0),
+	]
+	return run_pipeline_stages(
+		[ PipelineStage(name, run, dependencies=dependencies, cpus=cpus, memory_GB=memory_GB) for name, run, dependencies, cpus, memory_GB in stages ],
+		cpu_budget=cpu_budget,
+		memory_budget_GB=memory_budget_GB,
+	)
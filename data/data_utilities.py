@@ -3,24 +3,58 @@ Utilities specifically for the data processing scripts and data interfaces.
 """
 import os
 import json
+import hashlib
+import multiprocessing
+from contextlib import contextmanager
 from datetime import date
 
 from utilities import *
+from compression_utilities import *
 
 THIS_FILE_PATH = os.path.dirname(__file__)
 CURRENT_YEAR = date.today().year
 CURRENT_MONTH = date.today().month
+YELP_FOUNDING_YEAR = 2004
+
+# Seed of the hash that assigns users to the training or test set (see is_training_user)
+DEFAULT_TRAINING_SPLIT_SEED = 0
+
+# Writing processed files: bytes buffered per file, and rows formatted and written at a time
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+ROWS_PER_WRITE_BLOCK = 50000
 
 DEFAULT_RAW_USERS_FILE_NAME = 'yelp_academic_dataset_user.json'
 DEFAULT_RAW_REVIEWS_FILE_NAME = 'yelp_academic_dataset_review.json'
 DEFAULT_RAW_TIPS_FILE_NAME = 'yelp_academic_dataset_tip.json'
+DEFAULT_RAW_BUSINESSES_FILE_NAME = 'yelp_academic_dataset_business.json'
 
 DEFAULT_BASIC_ATTRIBUTES_FILE_NAME = 'user_basic_attributes.txt'
 DEFAULT_REVIEW_LENGTHS_FILE_NAME = 'user_average_review_lengths.txt'
 DEFAULT_READING_LEVELS_FILE_NAME = 'user_average_reading_levels.txt'
 DEFAULT_TIP_COUNTS_FILE_NAME = 'user_tip_counts.txt'
 DEFAULT_PAGERANKS_FILE_NAME = 'user_pageranks.txt'
+DEFAULT_HITS_SCORES_FILE_NAME = 'user_hits_scores.txt'
+DEFAULT_ELITE_PAGERANKS_FILE_NAME = 'user_elite_pageranks.txt'
+DEFAULT_CORE_NUMBERS_FILE_NAME = 'user_core_numbers.txt'
+DEFAULT_BETWEENNESSES_FILE_NAME = 'user_betweennesses.txt'
+DEFAULT_REVIEWED_CATEGORY_COUNTS_FILE_NAME = 'user_reviewed_category_counts.txt'
+DEFAULT_REVIEWED_CITY_COUNTS_FILE_NAME = 'user_reviewed_city_counts.txt'
+DEFAULT_COREVIEW_PAGERANKS_FILE_NAME = 'user_coreview_pageranks.txt'
+DEFAULT_RELATIVE_REVIEW_RANKS_FILE_NAME = 'user_average_relative_review_ranks.txt'
+DEFAULT_REVIEWS_PER_YEAR_FILE_NAME = 'user_reviews_per_year.txt'
+DEFAULT_REVIEW_GAPS_FILE_NAME = 'user_average_review_gaps.txt'
+DEFAULT_REVIEW_DATE_DEVIATIONS_FILE_NAME = 'user_review_date_deviations.txt'
+DEFAULT_REVIEW_BURSTINESSES_FILE_NAME = 'user_review_burstinesses.txt'
+DEFAULT_RECENT_REVIEW_COUNTS_FILE_NAME = 'user_recent_review_counts.txt'
+DEFAULT_MEDIAN_REVIEW_LENGTHS_FILE_NAME = 'user_median_review_lengths.txt'
+DEFAULT_REVIEW_LENGTH_90TH_PERCENTILES_FILE_NAME = 'user_review_length_90th_percentiles.txt'
+DEFAULT_READING_LEVEL_SPREADS_FILE_NAME = 'user_reading_level_interquartile_ranges.txt'
+DEFAULT_DISTINCT_BUSINESS_COUNTS_FILE_NAME = 'user_distinct_reviewed_business_counts.txt'
 DEFAULT_COMBINED_USERS_FILE_NAME = 'combined_users.txt'
+DEFAULT_USER_EDGES_FILE_NAME = 'user_edges.npz'
+DEFAULT_TEXT_FEATURES_FILE_NAME = 'user_text_features.npz'
+DEFAULT_SIMILARITY_INDEX_FILE_NAME = 'user_similarity_index.pkl'
+DEFAULT_SYLLABLE_LEXICON_FILE_NAME = 'syllable_lexicon.bin'
 
 DEFAULT_TRAINING_SET_FILE_NAME = 'training_set.txt'
 DEFAULT_TEST_SET_FILE_NAME = 'test_set.txt'
@@ -53,6 +87,57 @@ ALL_USER_ATTRIBUTES = list(BASIC_USER_ATTRIBUTES) + [
 	'pagerank',
 ]
 
+# Optional attributes, which can be added to the combined users file and training/test sets on request
+GRAPH_CENTRALITY_USER_ATTRIBUTES = [
+	'hits_score',
+	'elite_pagerank',
+	'core_number',
+	'betweenness',
+]
+
+BUSINESS_REVIEW_USER_ATTRIBUTES = [
+	'reviewed_category_count',
+	'reviewed_city_count',
+	'coreview_pagerank',
+	'average_relative_review_rank',
+]
+
+TEMPORAL_USER_ATTRIBUTES = [
+	'reviews_per_year',
+	'average_review_gap_days',
+	'review_date_deviation_days',
+	'review_burstiness',
+	'recent_review_count',
+]
+
+REVIEW_DISTRIBUTION_USER_ATTRIBUTES = [
+	'median_review_length',
+	'review_length_90th_percentile',
+	'reading_level_interquartile_range',
+	'distinct_reviewed_business_count',
+]
+
+# Processed file from which each optional attribute is read when combining user data
+DEFAULT_FILE_NAME_FOR_ADDITIONAL_ATTRIBUTE = {
+	'hits_score': DEFAULT_HITS_SCORES_FILE_NAME,
+	'elite_pagerank': DEFAULT_ELITE_PAGERANKS_FILE_NAME,
+	'core_number': DEFAULT_CORE_NUMBERS_FILE_NAME,
+	'betweenness': DEFAULT_BETWEENNESSES_FILE_NAME,
+	'reviewed_category_count': DEFAULT_REVIEWED_CATEGORY_COUNTS_FILE_NAME,
+	'reviewed_city_count': DEFAULT_REVIEWED_CITY_COUNTS_FILE_NAME,
+	'coreview_pagerank': DEFAULT_COREVIEW_PAGERANKS_FILE_NAME,
+	'average_relative_review_rank': DEFAULT_RELATIVE_REVIEW_RANKS_FILE_NAME,
+	'reviews_per_year': DEFAULT_REVIEWS_PER_YEAR_FILE_NAME,
+	'average_review_gap_days': DEFAULT_REVIEW_GAPS_FILE_NAME,
+	'review_date_deviation_days': DEFAULT_REVIEW_DATE_DEVIATIONS_FILE_NAME,
+	'review_burstiness': DEFAULT_REVIEW_BURSTINESSES_FILE_NAME,
+	'recent_review_count': DEFAULT_RECENT_REVIEW_COUNTS_FILE_NAME,
+	'median_review_length': DEFAULT_MEDIAN_REVIEW_LENGTHS_FILE_NAME,
+	'review_length_90th_percentile': DEFAULT_REVIEW_LENGTH_90TH_PERCENTILES_FILE_NAME,
+	'reading_level_interquartile_range': DEFAULT_READING_LEVEL_SPREADS_FILE_NAME,
+	'distinct_reviewed_business_count': DEFAULT_DISTINCT_BUSINESS_COUNTS_FILE_NAME,
+}
+
 # All attributes used in the training and test sets
 TRAINING_AND_TEST_SET_ATTRIBUTES = ['label' if attribute=='years_elite' else attribute for attribute in ALL_USER_ATTRIBUTES]
 
@@ -73,6 +158,23 @@ CASTER_FOR_ATTRIBUTE_NAME = {
 	'average_reading_level': float,
 	'tip_count': int,
 	'pagerank': float,
+	'hits_score': float,
+	'elite_pagerank': float,
+	'core_number': int,
+	'betweenness': float,
+	'reviewed_category_count': int,
+	'reviewed_city_count': int,
+	'coreview_pagerank': float,
+	'average_relative_review_rank': float,
+	'reviews_per_year': float,
+	'average_review_gap_days': float,
+	'review_date_deviation_days': float,
+	'review_burstiness': float,
+	'recent_review_count': int,
+	'median_review_length': float,
+	'review_length_90th_percentile': float,
+	'reading_level_interquartile_range': float,
+	'distinct_reviewed_business_count': int,
 	'label': int,
 }
 
@@ -83,16 +185,69 @@ def _months_since_year_and_month(year_month_string):
 	return 12 * (CURRENT_YEAR - year) - month + CURRENT_MONTH
 
 
+def days_since_year_one(year_month_day_string):
+	"""Returns the ordinal day (1 = January 1 of year 1) of a date formatted as YYYY-MM-DD."""
+	return date(int(year_month_day_string[0:4]), int(year_month_day_string[5:7]), int(year_month_day_string[8:10])).toordinal()
+
+
 def raw_data_absolute_path(relative_path):
 	"""Given the name of a raw data file, returns its absolute path."""
 	return os.path.join(THIS_FILE_PATH, 'raw_data/' + relative_path)
 
 
+def resolved_raw_data_absolute_path(relative_path):
+	"""
+	Given the name of a raw data file, returns its absolute path if it exists, or else the absolute
+	path of a compressed copy of it (e.g. 'yelp_academic_dataset_user.json.gz') if one exists.
+	"""
+	absolute_path = raw_data_absolute_path(relative_path)
+	if not os.path.exists(absolute_path):
+		for extension in COMPRESSED_FILE_EXTENSIONS:
+			if os.path.exists(absolute_path + extension):
+				return absolute_path + extension
+	return absolute_path
+
+
+def open_raw_data_file(relative_path):
+	"""
+	Given the name of a raw data file, returns it opened for reading line by line. Files compressed
+	with gzip, bzip2 or Zstandard (by extension, or found by resolved_raw_data_absolute_path) are
+	decompressed transparently, in parallel with the caller's parsing.
+	"""
+	return open_possibly_compressed_file(resolved_raw_data_absolute_path(relative_path))
+
+
 def processed_data_absolute_path(relative_path):
 	"""Given the name of a processed data file, returns its absolute path."""
 	return os.path.join(THIS_FILE_PATH, 'processed_data/' + relative_path)
 
 
+def byte_range_shards(absolute_path, shard_count):
+	"""
+	Given the absolute path of a file, returns a list of shard_count (start offset, end offset)
+	pairs splitting it into contiguous byte ranges of nearly equal size.
+
+	NOTE: Ranges do not respect line boundaries. By convention, each line is assigned to the range
+	containing its first byte.
+	"""
+	file_size = os.path.getsize(absolute_path)
+	boundaries = [ file_size * shard_number // shard_count for shard_number in xrange(shard_count + 1) ]
+	return zip(boundaries[:-1], boundaries[1:])
+
+
+def byte_range_lines(opened_file, start_offset, end_offset):
+	"""
+	Given a file opened for reading and a byte range (see byte_range_shards), returns an iterator
+	over the lines whose first byte is within the range.
+	"""
+	# Skip the line in progress at start_offset (it belongs to the previous range)
+	opened_file.seek(max(start_offset - 1, 0))
+	if start_offset > 0:
+		opened_file.readline()
+
+	return iter(lambda: opened_file.readline() if opened_file.tell() < end_offset else '', '')
+
+
 def read_single_user_attribute(input_file_name, attribute_name):
 	"""
 	Given a processed user attribute file of the form
@@ -118,7 +273,32 @@ def read_single_user_attribute(input_file_name, attribute_name):
 	return attribute_for_user
 
 
-def write_single_user_attribute(attribute_for_user, output_file_name):
+def read_single_user_attribute_values_in_chunks(input_file_name, attribute_name, chunk_size=100000):
+	"""
+	Given a processed user attribute file (see read_single_user_attribute) and the name of the
+	attribute, returns a generator over numpy arrays of at most chunk_size attribute values (in file
+	order), without the user IDs.
+
+	Only one chunk is held in memory at a time, so e.g. histograms of all users' values can be
+	accumulated chunk by chunk (see histogram_counts).
+	"""
+	attribute_caster = CASTER_FOR_ATTRIBUTE_NAME[attribute_name] # Type-casting function for this attribute
+
+	with open(processed_data_absolute_path(input_file_name)) as attribute_file:
+
+		attribute_values_chunk = []
+		for user_line in attribute_file:
+			attribute_values_chunk += [ attribute_caster(user_line.split()[1]) ]
+
+			if len(attribute_values_chunk) >= chunk_size:
+				yield numpy.array(attribute_values_chunk)
+				attribute_values_chunk = []
+
+		if attribute_values_chunk:
+			yield numpy.array(attribute_values_chunk)
+
+
+def write_single_user_attribute(attribute_for_user, output_file_name, atomic=True):
 	"""
 	Given a dictionary
 		{ user_1_ID: user_1_attribute_value, ..., user_N_ID: user_N_attribute_value }
@@ -129,11 +309,188 @@ def write_single_user_attribute(attribute_for_user, output_file_name):
 			.
 			.
 		user_N_ID user_N_attribute_value
+
+	If atomic, the file is replaced only once completely written (see open_processed_output_file).
 	"""
-	with open(processed_data_absolute_path(output_file_name), 'w') as attribute_file: # Write mode; overwrite old file if it exists
-		
-		for user_ID, attribute in attribute_for_user.iteritems():
-			attribute_file.write(user_ID + ' ' + str(attribute) + '\n')
+	write_user_attribute_columns([attribute_for_user.keys(), attribute_for_user.values()], output_file_name, atomic=atomic)
+
+
+def write_single_user_attribute_values(user_IDs, attribute_values, output_file_name, atomic=True):
+	"""
+	Same as write_single_user_attribute(), but given a list of user IDs and a corresponding list
+	(or numpy array) of attribute values instead of a dictionary.
+	"""
+	write_user_attribute_columns([user_IDs, attribute_values], output_file_name, atomic=atomic)
+
+
+@contextmanager
+def open_processed_output_file(output_file_name, atomic=True, buffer_size=WRITE_BUFFER_SIZE):
+	"""
+	Opens a processed data file for writing (overwriting any old file), with a large write buffer.
+
+	If atomic, writes go to a temporary file in the same folder, which replaces the output file
+	(by an atomic rename) only once completely written and synced to disk. A stage that crashes
+	midway then leaves the previous file intact, rather than a truncated one for later stages.
+	"""
+	absolute_path = processed_data_absolute_path(output_file_name)
+	if not atomic:
+		with open(absolute_path, 'w', buffer_size) as output_file:
+			yield output_file
+		return
+
+	temporary_path = '{}.{}.tmp'.format(absolute_path, os.getpid())
+	try:
+		with open(temporary_path, 'w', buffer_size) as output_file:
+			yield output_file
+			output_file.flush()
+			os.fsync(output_file.fileno())
+		os.rename(temporary_path, absolute_path)
+	finally:
+		if os.path.exists(temporary_path):
+			os.remove(temporary_path)
+
+
+def write_user_attribute_columns(columns, output_file_name, attribute_names=None, atomic=True, rows_per_block=ROWS_PER_WRITE_BLOCK):
+	"""
+	Given a list of equally long columns (lists or numpy arrays, e.g. of user IDs and attribute
+	values), writes a file with one row per user of the columns' values separated by spaces,
+	preceded by a row of attribute names if given.
+
+	Values are formatted a column at a time, and rows are written in blocks of rows_per_block, so
+	that there is one write per block rather than per user.
+	"""
+	row_count = len(columns[0])
+	with open_processed_output_file(output_file_name, atomic=atomic) as output_file:
+
+		if attribute_names is not None:
+			output_file.write( ' '.join(attribute_names) + '\n' )
+
+		for block_start in xrange(0, row_count, rows_per_block):
+			formatted_columns = [ _format_values(column[block_start:block_start + rows_per_block]) for column in columns ]
+			output_file.write( '\n'.join(itertools.imap(' '.join, itertools.izip(*formatted_columns))) + '\n' )
+
+
+def _format_values(values):
+	"""Given a list or numpy array of values, returns a list of their string forms (as str() of each value)."""
+	if isinstance(values, numpy.ndarray):
+		values = values.tolist()
+	return map(str, values)
+
+
+class UserAggregateStore(object):
+	"""
+	Compact storage for per-user running aggregates (sums, counts, minima, maxima, etc.) computed
+	by extraction jobs, in place of dictionaries of lists keyed by user ID.
+
+	Each user ID is interned once into a row number shared by all columns, and each column is a
+	typed numpy array (optionally with a fixed per-user shape, e.g. one count per year), grown by
+	doubling. Per-user memory is therefore a few bytes per column, plus one ID table entry.
+
+		store = UserAggregateStore()
+		store.add_statistics_columns('review_length')
+		for review in reviews:
+			store.update_statistics('review_length', store.row(review['user_id']), len(review['text'].split()))
+		store.write_column_values(store.mean('review_length'), 'user_average_review_lengths.txt')
+	"""
+
+	def __init__(self, initial_capacity=1024):
+		self.index_for_user_ID = {}
+		self.user_IDs = []
+		self.capacity = initial_capacity
+		self.columns = OrderedDict()
+		self.fill_value_for_column = {}
+
+	def add_column(self, name, dtype=numpy.float64, shape=(), fill_value=0):
+		"""Adds a column of the given type and per-user shape, with every user's entry initially fill_value."""
+		self.columns[name] = numpy.full((self.capacity,) + tuple(shape), fill_value, dtype=dtype)
+		self.fill_value_for_column[name] = fill_value
+
+	def add_statistics_columns(self, name, dtype=numpy.float64):
+		"""Adds columns name_sum, name_count, name_minimum and name_maximum (see update_statistics)."""
+		self.add_column(name + '_sum', dtype=dtype)
+		self.add_column(name + '_count', dtype=numpy.int32)
+		self.add_column(name + '_minimum', dtype=dtype, fill_value=numpy.iinfo(dtype).max if numpy.issubdtype(dtype, numpy.integer) else numpy.inf)
+		self.add_column(name + '_maximum', dtype=dtype, fill_value=numpy.iinfo(dtype).min if numpy.issubdtype(dtype, numpy.integer) else -numpy.inf)
+
+	def row(self, user_ID):
+		"""Returns the row of a user, adding a new row (and growing all columns if full) for a new user."""
+		row = self.index_for_user_ID.get(user_ID)
+		if row is None:
+			row = self.index_for_user_ID[user_ID] = len(self.user_IDs)
+			self.user_IDs.append(user_ID)
+			if row == self.capacity:
+				self._grow()
+		return row
+
+	def _grow(self):
+		for name, values in self.columns.iteritems():
+			self.columns[name] = numpy.append(values, numpy.full_like(values, self.fill_value_for_column[name]), axis=0)
+		self.capacity *= 2
+
+	def add(self, name, row, value):
+		"""Adds value to a user's entry in a column."""
+		self.columns[name][row] += value
+
+	def minimize(self, name, row, value):
+		"""Replaces a user's entry in a column with value, if value is smaller."""
+		column = self.columns[name]
+		if value < column[row]:
+			column[row] = value
+
+	def maximize(self, name, row, value):
+		"""Replaces a user's entry in a column with value, if value is larger."""
+		column = self.columns[name]
+		if value > column[row]:
+			column[row] = value
+
+	def get(self, name, row):
+		"""Returns a user's entry in a column."""
+		return self.columns[name][row]
+
+	def update_statistics(self, name, row, value):
+		"""Updates a user's sum, count, minimum and maximum (see add_statistics_columns) with a new value."""
+		self.add(name + '_sum', row, value)
+		self.add(name + '_count', row, 1)
+		self.minimize(name + '_minimum', row, value)
+		self.maximize(name + '_maximum', row, value)
+
+	def merge(self, other_store, combine_for_column={}):
+		"""
+		Merges another store with the same columns (e.g. aggregates computed by a worker process over
+		a shard of the data) into this one, adding rows for its new users. Each user's entries in a
+		column are combined by combine_for_column[name](entries, other entries), or added by default.
+		"""
+		rows = numpy.array([ self.row(user_ID) for user_ID in other_store.user_IDs ], dtype=numpy.int64)
+		for name in self.columns:
+			values = self.values(name)
+			values[rows] = combine_for_column.get(name, numpy.add)(values[rows], other_store.values(name))
+
+	def trim(self):
+		"""Shrinks every column to the rows in use (e.g. before returning the store from a worker process)."""
+		self.capacity = max(len(self.user_IDs), 1)
+		for name, values in self.columns.iteritems():
+			self.columns[name] = values[:self.capacity].copy()
+
+	def user_count(self):
+		return len(self.user_IDs)
+
+	def values(self, name):
+		"""Returns a numpy array (view) of a column's entries for all users, in row order."""
+		return self.columns[name][:len(self.user_IDs)]
+
+	def mean(self, name):
+		"""Returns a numpy array of all users' means (sum / count; 0 for a count of 0), given columns added by add_statistics_columns."""
+		counts = self.values(name + '_count')
+		return self.values(name + '_sum') / numpy.maximum(counts, 1).astype(numpy.float64)
+
+	def write_column_values(self, values, output_file_name):
+		"""
+		Given a column name, or a numpy array of values in row order (e.g. computed from columns),
+		writes a processed single-attribute file (see write_single_user_attribute).
+		"""
+		if isinstance(values, basestring):
+			values = self.values(values)
+		write_single_user_attribute_values(self.user_IDs, values, output_file_name)
 
 
 def read_multiple_user_attributes(input_file_name, attributes, order_attributes=False):
@@ -157,25 +514,60 @@ def read_multiple_user_attributes(input_file_name, attributes, order_attributes=
 	where the user dictionaries include only the k <= K desired attributes, in the order given.
 	"""
 	users = []
+	for users_chunk in read_multiple_user_attributes_in_chunks(input_file_name, attributes, order_attributes=order_attributes):
+		users += users_chunk
+
+	return users
+
+
+def read_multiple_user_attributes_in_chunks(input_file_name, attributes, order_attributes=False, chunk_size=100000):
+	"""
+	Same as read_multiple_user_attributes(), but instead of a single list of all user dictionaries,
+	returns a generator over lists of at most chunk_size user dictionaries (in file order).
+
+	Only one chunk is held in memory at a time, so files larger than memory can be streamed.
+	"""
 	DictionaryClass = OrderedDict if order_attributes else dict
 
+	for user_rows_chunk in read_multiple_user_attribute_rows_in_chunks(input_file_name, attributes, chunk_size=chunk_size):
+		yield [ DictionaryClass(itertools.izip(attributes, user_row)) for user_row in user_rows_chunk ]
+
+
+def read_multiple_user_attribute_rows_in_chunks(input_file_name, attributes, chunk_size=100000):
+	"""
+	Given a processed user attributes file (see read_multiple_user_attributes) and a list of desired
+	attributes, returns a generator over lists of at most chunk_size tuples (in file order):
+		(user_i_attribute_1_value, ..., user_i_attribute_k_value)
+	holding the k desired attributes, in the order given.
+
+	Each line is split only up to the last desired column, and only desired columns are type-cast,
+	so reading a few leading columns of a wide file costs little more than reading a narrow one.
+	"""
 	with open(processed_data_absolute_path(input_file_name)) as attributes_file:
 
 		# Row 1: attribute names
 		attributes_in_file = attributes_file.readline().split()
 
-		# List of (desired attribute name, index in attributes_in_file where desired attribute occurs, caster for desired attribute)
-		attribute_names_indices_and_casters = [ (attribute, attributes_in_file.index(attribute), CASTER_FOR_ATTRIBUTE_NAME[attribute]) for attribute in attributes ]
+		# Indices in attributes_in_file where desired attributes occur, and casters for desired attributes
+		indices = [ attributes_in_file.index(attribute) for attribute in attributes ]
+		casters = [ CASTER_FOR_ATTRIBUTE_NAME[attribute] for attribute in attributes ]
+		last_index = max(indices) if indices else 0
 
 		# Rows 2,...,N: users' attribute values written in the same order
+		user_rows_chunk = []
 		for user_line in attributes_file:
-			user_attribute_values = user_line.split()
-			users += [ DictionaryClass([ ( attribute, caster(user_attribute_values[index]) ) for attribute, index, caster in attribute_names_indices_and_casters ]) ]
+			user_attribute_values = user_line.split(None, last_index + 1)
+			user_rows_chunk += [ tuple( caster(user_attribute_values[index]) for index, caster in itertools.izip(indices, casters) ) ]
 
-	return users
+			if len(user_rows_chunk) >= chunk_size:
+				yield user_rows_chunk
+				user_rows_chunk = []
 
+		if user_rows_chunk:
+			yield user_rows_chunk
 
-def write_multiple_user_attributes(users, attributes, output_file_name):
+
+def write_multiple_user_attributes(users, attributes, output_file_name, atomic=True, rows_per_block=ROWS_PER_WRITE_BLOCK):
 	"""
 	Given a list of (or iterator over) user dictionaries and a list of user attributes, writes a
 	file of the form
@@ -185,16 +577,50 @@ def write_multiple_user_attributes(users, attributes, output_file_name):
 			.
 			.
 		user_N_attribute_1_value ... user_N_attribute_K_value
+
+	Users are written in blocks of rows_per_block, each formatted a column at a time (see
+	write_user_attribute_columns). If atomic, the file is replaced only once completely written.
 	"""
-	with open(processed_data_absolute_path(output_file_name), 'w') as user_attributes_file: # Write mode; overwrite old file if it exists
+	with open_processed_output_file(output_file_name, atomic=atomic) as user_attributes_file:
 
 		# Row 1: attribute names
 		user_attributes_file.write( ' '.join(attributes) + '\n' )
 
 		# Rows 2,...,N: users' attribute values written in the same order
-		for user in users:
-			user_attributes_file.write( ' '.join([str(user[attribute]) for attribute in attributes]) + '\n' )
+		write_user_attribute_rows(user_attributes_file, users, attributes, rows_per_block=rows_per_block)
+
 
+def write_user_attribute_rows(output_file, users, attributes, rows_per_block=ROWS_PER_WRITE_BLOCK):
+	"""
+	Given an open file, a list of (or iterator over) user dictionaries and a list of user attributes,
+	writes one row per user of the attributes' values, in blocks of rows_per_block users each
+	formatted a column at a time (see write_user_attribute_columns).
+	"""
+	for users_block in iterate_in_chunks(users, rows_per_block):
+		formatted_columns = [ _format_values([ user[attribute] for user in users_block ]) for attribute in attributes ]
+		output_file.write( '\n'.join(itertools.imap(' '.join, itertools.izip(*formatted_columns))) + '\n' )
+
+
+def is_training_user(user_ID, fraction_for_training=0.8, split_seed=DEFAULT_TRAINING_SPLIT_SEED):
+	"""
+	Returns whether a user belongs to the training set (rather than the test set), decided by an MD5
+	hash of the seed and the user's ID mapped to [0, 1): training if below fraction_for_training.
+
+	The assignment depends only on the user ID, so it is the same across runs and dataset refreshes
+	(a test user never moves into training), and it is independent of the user's label, so each
+	class is split in the proportion fraction_for_training (up to sampling noise).
+	"""
+	digest = hashlib.md5('{}:{}'.format(split_seed, user_ID)).digest()
+	return int(digest[:8].encode('hex'), 16) < fraction_for_training * 2**64
+
+
+def user_fold(user_ID, fold_count, split_seed=DEFAULT_TRAINING_SPLIT_SEED):
+	"""
+	Returns the fold (0, ..., fold_count - 1) of a user, decided by an MD5 hash of the seed and the
+	user's ID like is_training_user, but independently of the training/test split.
+	"""
+	digest = hashlib.md5('fold:{}:{}'.format(split_seed, user_ID)).digest()
+	return int(digest[:8].encode('hex'), 16) % fold_count
 
 
 def binarize_attribute(users, attribute):
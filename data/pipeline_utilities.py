@@ -0,0 +1,209 @@
+"""
+Utilities for streaming records out of large raw data files in pipelined stages:
+
+    +-------------+        +---------------+        +----------------+        +----------+
+    | reader      | -----> | bounded queue | -----> | decode workers | -----> | consumer |
+    | (thread)    |  line  | (backpressure)|        | (processes)    | record | (caller) |
+    +-------------+ batches+---------------+        +----------------+ batches+----------+
+
+so that reading (including decompression), JSON decoding and the caller's own feature
+computation overlap, and extraction takes roughly as long as the slowest stage rather than all
+stages combined.
+"""
+import json
+import multiprocessing
+import threading
+import time
+from Queue import Queue, Empty, Full
+
+from utilities import *
+
+
+DEFAULT_LINES_PER_BATCH = 1000
+DEFAULT_QUEUE_DEPTH = 16
+DEFAULT_DECODE_PROCESSES = max(multiprocessing.cpu_count() - 1, 1)
+
+
+def decode_JSON_lines(lines):
+	"""Given a list of JSON lines, returns a list of the decoded objects."""
+	return [ json.loads(line) for line in lines ]
+
+
+def decode_JSON_fields(lines, field_names):
+	"""
+	Given a list of JSON lines and a list of top-level field names, returns a list of tuples of the
+	fields' values, one tuple per line. Returning only the needed fields keeps the results that
+	decode workers send back to the consumer small.
+
+	To use as the decode_batch function of prefetched_decoded_records(), bind field_names with
+	functools.partial (which, unlike a lambda, can be sent to worker processes).
+	"""
+	decoded_fields = []
+	for line in lines:
+		record = json.loads(line)
+		decoded_fields += [ tuple(record[field_name] for field_name in field_names) ]
+	return decoded_fields
+
+
+class PipelineStatistics(object):
+	"""
+	Timings and queue depths of a prefetched_decoded_records() pipeline, for finding its bottleneck:
+		read_seconds : time the reader spent reading line batches
+		reader_blocked_seconds : time the reader spent waiting for room in the full queue
+		consumer_wait_seconds : time the consumer spent waiting for decoded batches
+		queue_depth_sum : sum, over enqueued batches, of the queue depth just before enqueueing
+	"""
+
+	def __init__(self):
+		self.batch_count = 0
+		self.record_count = 0
+		self.read_seconds = 0.0
+		self.reader_blocked_seconds = 0.0
+		self.consumer_wait_seconds = 0.0
+		self.queue_depth_sum = 0
+		self.maximum_queue_depth = 0
+		self.start_time = time.time()
+		self.end_time = None
+
+	def elapsed_seconds(self):
+		return (self.end_time or time.time()) - self.start_time
+
+	def average_queue_depth(self):
+		return safe_divide(self.queue_depth_sum, self.batch_count)
+
+	def bottleneck(self):
+		"""
+		Returns the name of the stage ('read', 'decode' or 'compute') limiting the pipeline:
+			- a consumer that rarely waits is itself the bottleneck (its computation)
+			- otherwise, a reader that is often blocked is waiting on the decode workers
+			- otherwise, the reader cannot keep up (reading or decompression)
+		"""
+		elapsed_seconds = self.elapsed_seconds()
+		if self.consumer_wait_seconds < 0.1 * elapsed_seconds:
+			return 'compute'
+		elif self.reader_blocked_seconds > self.read_seconds:
+			return 'decode'
+		return 'read'
+
+	def summary(self):
+		return '{} records in {:.1f}s (read {:.1f}s, reader blocked {:.1f}s, consumer waited {:.1f}s, average queue depth {:.1f} of at most {}); bottleneck: {}'.format(
+			self.record_count, self.elapsed_seconds(), self.read_seconds, self.reader_blocked_seconds,
+			self.consumer_wait_seconds, self.average_queue_depth(), self.maximum_queue_depth, self.bottleneck(),
+		)
+
+
+def prefetched_decoded_records(
+	lines,
+	decode_batch=decode_JSON_lines,
+	lines_per_batch=DEFAULT_LINES_PER_BATCH,
+	queue_depth=DEFAULT_QUEUE_DEPTH,
+	processes=None,
+	statistics=None,
+):
+	"""
+	Given an iterable of lines (e.g. a file from open_raw_data_file()), yields the records returned
+	by decode_batch (a top-level function from a list of lines to a list of records), in order.
+
+	A reader thread reads batches of lines_per_batch lines into a queue holding at most queue_depth
+	batches, which processes worker processes decode (or the calling thread, if processes <= 1).
+	At most queue_depth batches are in flight between the queue and the caller, so a slow caller
+	slows down decoding and reading (backpressure) instead of accumulating decoded records.
+	processes defaults to DEFAULT_DECODE_PROCESSES, read at call time so that the stage scheduler
+	(see scheduling_utilities) can lower it in each stage's process.
+
+	If a PipelineStatistics object is given, it is filled in with the pipeline's timings.
+	"""
+	processes = DEFAULT_DECODE_PROCESSES if processes is None else processes
+	statistics = statistics or PipelineStatistics()
+	statistics.maximum_queue_depth = queue_depth
+	line_batches = Queue(maxsize=queue_depth)
+	in_flight_slots = threading.Semaphore(queue_depth)
+	reader_errors = []
+	is_stopped = threading.Event()
+
+	def read_line_batches():
+		try:
+			line_batch_iterator = iterate_in_chunks(lines, lines_per_batch)
+			while True:
+				read_start_time = time.time()
+				line_batch = next(line_batch_iterator, None)
+				statistics.read_seconds += time.time() - read_start_time
+				if line_batch is None:
+					break
+
+				statistics.queue_depth_sum += line_batches.qsize()
+				blocked_start_time = time.time()
+				if not _put_unless_stopped(line_batches, line_batch, is_stopped):
+					return
+				statistics.reader_blocked_seconds += time.time() - blocked_start_time
+		except Exception as error:
+			reader_errors.append(error)
+		finally:
+			_put_unless_stopped(line_batches, None, is_stopped)
+
+	def queued_line_batches():
+		while True:
+			in_flight_slots.acquire()
+			line_batch = _get_unless_stopped(line_batches, is_stopped)
+			if line_batch is None:
+				return
+			yield line_batch
+
+	# Fork the workers before starting the reader, so that none inherits a lock held by its thread
+	pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+	reader = threading.Thread(target=read_line_batches)
+	reader.daemon = True
+	reader.start()
+
+	decoded_batches = pool.imap(decode_batch, queued_line_batches()) if pool else itertools.imap(decode_batch, queued_line_batches())
+
+	try:
+		while True:
+			wait_start_time = time.time()
+			decoded_batch = next(decoded_batches, None)
+			statistics.consumer_wait_seconds += time.time() - wait_start_time
+			if decoded_batch is None:
+				break
+			in_flight_slots.release()
+
+			statistics.batch_count += 1
+			statistics.record_count += len(decoded_batch)
+			for record in decoded_batch:
+				yield record
+
+		if reader_errors:
+			raise reader_errors[0]
+	finally:
+		statistics.end_time = time.time()
+
+		# Unblock the reader and the batch feeder, in case the caller stopped early
+		is_stopped.set()
+		for slot in xrange(queue_depth + 1):
+			in_flight_slots.release()
+		reader.join()
+
+		if pool:
+			pool.terminate()
+			pool.join()
+
+
+def _put_unless_stopped(queue, value, is_stopped):
+	"""Puts a value into a queue, waiting for room until is_stopped is set. Returns whether it was put."""
+	while not is_stopped.is_set():
+		try:
+			queue.put(value, timeout=0.1)
+			return True
+		except Full:
+			pass
+	return False
+
+
+def _get_unless_stopped(queue, is_stopped):
+	"""Returns the next value from a queue, waiting for one until is_stopped is set (then returns None)."""
+	while not is_stopped.is_set():
+		try:
+			return queue.get(timeout=0.1)
+		except Empty:
+			pass
+	return None
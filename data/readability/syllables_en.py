@@ -7,6 +7,8 @@ Lingua::EN::Syllable.
 
 import string, re, os
 
+import lexicon
+
 specialSyllables_en = """tottered 2
 chummed 1
 peeped 1
@@ -113,6 +115,19 @@ def count(word):
     if count > 0:
         return count
 
+    # Check the precomputed lexicon, if one is loaded (not cached: it is
+    # memory-mapped, so copying its words into the cache would defeat that)
+    count = lexicon.lookup(word)
+    if count is not None:
+        return count
+
+    # Cache the syllable count (of the word as given, not as modified below)
+    count = _count_with_rules(word)
+    fallback_cache[word] = count
+
+    return count
+
+def _count_with_rules(word):
     # Remove final silent 'e'
     if word[-1] == "e":
         word = word[:-1]
@@ -134,8 +149,5 @@ def count(word):
         if r.search(word):
             count -= 1
 
-    # Cache the syllable count
-    fallback_cache[word] = count
-
     return count
 
@@ -41,6 +41,9 @@ def count_syllables(words):
         syllableCount += syllables_en.count(word)
     return syllableCount
 
+def is_complex_word(word):
+    return syllables_en.count(word) >= 3
+
 #This method must be enhanced. At the moment it only
 #considers the number of syllables in a word.
 #This often results in that too many complex words are detected.
@@ -49,11 +52,9 @@ def count_complex_words(text=''):
     sentences = get_sentences(text)
     complex_words = 0
     found = False
-    cur_word = []
     
     for word in words:          
-        cur_word.append(word)
-        if count_syllables(cur_word)>= 3:
+        if is_complex_word(word):
             
             #Checking proper nouns. If a word starts with a capital letter
             #and is NOT at the beginning of a sentence we don't add it
@@ -68,7 +69,5 @@ def count_complex_words(text=''):
                 if found: 
                     complex_words += 1
                     found = False
-                
-        cur_word.remove(word)
     return complex_words
 
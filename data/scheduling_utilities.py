@@ -0,0 +1,159 @@
+"""
+Utilities for running the stages of the data processing pipeline as a dependency graph (DAG):
+each stage runs in its own process as soon as the stages it depends on have finished, and
+independent stages (e.g. extracting features from the users, reviews and tips files) run
+concurrently, as long as their combined CPU and memory needs fit within a budget.
+"""
+import multiprocessing
+import os
+import time
+import traceback
+from Queue import Empty
+
+import pipeline_utilities
+from utilities import *
+
+
+class PipelineStage(object):
+	"""
+	A stage of a pipeline:
+		name : a unique name
+		run : a function of no arguments (e.g. functools.partial(extract_user_tip_counts, ...))
+		dependencies : names of the stages that must finish before this one starts
+		cpus : number of CPUs the stage can keep busy (e.g. with decode worker processes)
+		memory_GB : (rough) peak memory used by the stage, in GB
+	"""
+
+	def __init__(self, name, run, dependencies=[], cpus=1, memory_GB=1.0):
+		self.name = name
+		self.run = run
+		self.dependencies = list(dependencies)
+		self.cpus = cpus
+		self.memory_GB = memory_GB
+
+
+def available_memory_GB():
+	"""Returns the physical memory of this machine in GB (or infinity, if unknown)."""
+	try:
+		return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / float(2**30)
+	except (ValueError, OSError, AttributeError):
+		return float('inf')
+
+
+def run_pipeline_stages(stages, cpu_budget=None, memory_budget_GB=None, poll_seconds=0.5):
+	"""
+	Given a list of PipelineStage objects, runs each stage in a separate process once all of its
+	dependencies have finished. Ready stages are started in the order given while the CPUs and
+	memory of the running stages stay within cpu_budget (default: all CPUs) and memory_budget_GB
+	(default: all physical memory); a stage that alone exceeds the budget runs by itself.
+
+	Each stage is granted min(stage.cpus, cpu_budget) CPUs: its decode pipelines (see
+	prefetched_decoded_records) use one fewer worker processes than that.
+
+	Prints a timeline of the stages once all have finished (or been skipped because a dependency
+	failed), and returns a dictionary { stage name: (start seconds, end seconds, status) }, where
+	times are relative to the start of the run and status is 'ok', 'skipped' or the stage's
+	error (whose traceback is printed when the stage fails). Raises a RuntimeError if any stage
+	failed.
+	"""
+	cpu_budget = cpu_budget or multiprocessing.cpu_count()
+	memory_budget_GB = memory_budget_GB or available_memory_GB()
+	stage_for_name = OrderedDict( (stage.name, stage) for stage in stages )
+	for stage in stages:
+		unknown_dependencies = [ dependency for dependency in stage.dependencies if dependency not in stage_for_name ]
+		if unknown_dependencies:
+			raise ValueError('Stage ' + stage.name + ' depends on unknown stages: ' + ', '.join(unknown_dependencies))
+
+	results = multiprocessing.Queue()
+	process_for_running_stage = {}
+	timing_for_stage = OrderedDict()
+	start_time = time.time()
+
+	while len(timing_for_stage) < len(stage_for_name):
+		# Skip stages that depend (directly or indirectly) on a failed stage
+		is_skipping = True
+		while is_skipping:
+			is_skipping = False
+			for stage in stage_for_name.itervalues():
+				if stage.name not in timing_for_stage and any(timing_for_stage.get(dependency, (0, 0, 'ok'))[2] != 'ok' for dependency in stage.dependencies):
+					now = time.time() - start_time
+					timing_for_stage[stage.name] = (now, now, 'skipped')
+					is_skipping = True
+
+		# Start ready stages that fit in the budget
+		for stage in stage_for_name.itervalues():
+			is_ready = stage.name not in timing_for_stage and stage.name not in process_for_running_stage and all(timing_for_stage.get(dependency, (0, 0, None))[2] == 'ok' for dependency in stage.dependencies)
+			if not is_ready:
+				continue
+			running_stages = [ stage_for_name[name] for name in process_for_running_stage ]
+			used_cpus = sum(min(running_stage.cpus, cpu_budget) for running_stage in running_stages)
+			used_memory_GB = sum(running_stage.memory_GB for running_stage in running_stages)
+			if running_stages and (used_cpus + min(stage.cpus, cpu_budget) > cpu_budget or used_memory_GB + stage.memory_GB > memory_budget_GB):
+				continue
+
+			print '{:>8.1f}s  started {} ({} CPUs, {:.1f} GB)'.format(time.time() - start_time, stage.name, min(stage.cpus, cpu_budget), stage.memory_GB)
+			process = multiprocessing.Process(target=_run_stage_in_process, args=(stage, min(stage.cpus, cpu_budget), start_time, results))
+			process.start()
+			process_for_running_stage[stage.name] = process
+
+		if not process_for_running_stage:
+			if len(timing_for_stage) < len(stage_for_name):
+				raise ValueError('Stages have cyclic dependencies: ' + ', '.join( stage_name for stage_name in stage_for_name if stage_name not in timing_for_stage ))
+			continue
+
+		# Wait for a running stage to finish
+		try:
+			stage_name, stage_start_seconds, stage_end_seconds, status, error_traceback = results.get(timeout=poll_seconds)
+		except Empty:
+			# A stage whose process died without reporting (e.g. killed for lack of memory) failed
+			for stage_name, process in process_for_running_stage.items():
+				if not process.is_alive() and process.exitcode != 0:
+					now = time.time() - start_time
+					timing_for_stage[stage_name] = (now, now, 'process exited with code ' + str(process.exitcode))
+					del process_for_running_stage[stage_name]
+			continue
+
+		process_for_running_stage.pop(stage_name).join()
+		timing_for_stage[stage_name] = (stage_start_seconds, stage_end_seconds, status)
+		print '{:>8.1f}s  finished {}: {}'.format(stage_end_seconds, stage_name, status)
+		if error_traceback:
+			print error_traceback
+
+	print_stage_timeline(timing_for_stage)
+
+	failed_stage_names = [ stage_name for stage_name, (stage_start_seconds, stage_end_seconds, status) in timing_for_stage.iteritems() if status not in ('ok', 'skipped') ]
+	if failed_stage_names:
+		raise RuntimeError('Pipeline stages failed: ' + ', '.join(failed_stage_names))
+	return dict(timing_for_stage)
+
+
+def _run_stage_in_process(stage, cpus, pipeline_start_time, results):
+	"""Runs a stage (in a new process) with decode pipelines limited to its CPUs, and reports (name, start, end, status, error traceback)."""
+	pipeline_utilities.DEFAULT_DECODE_PROCESSES = max(cpus - 1, 1)
+	stage_start_seconds = time.time() - pipeline_start_time
+	try:
+		stage.run()
+		status, error_traceback = 'ok', None
+	except BaseException as error:
+		error_lines = str(error).strip().splitlines()
+		status = type(error).__name__ + (': ' + error_lines[0] if error_lines else '')
+		error_traceback = traceback.format_exc().strip()
+	results.put((stage.name, stage_start_seconds, time.time() - pipeline_start_time, status, error_traceback))
+
+
+def print_stage_timeline(timing_for_stage, width=50):
+	"""
+	Given a dictionary { stage name: (start seconds, end seconds, status) } as returned by
+	run_pipeline_stages(), prints each stage's times and a bar showing when it ran:
+		extract_user_tip_counts      0.0   12.5   12.5  |#####                    |  ok
+	"""
+	total_seconds = max([ end_seconds for start_seconds, end_seconds, status in timing_for_stage.itervalues() ] + [1.0e-9])
+	name_width = max([ len(stage_name) for stage_name in timing_for_stage ] + [5])
+
+	print '\nSTAGE TIMELINE ({:.1f}s in total)'.format(total_seconds)
+	print '{:<{}}{:>9}{:>9}{:>9}'.format('stage', name_width, 'start', 'end', 'seconds')
+	for stage_name, (start_seconds, end_seconds, status) in sorted(timing_for_stage.iteritems(), key=lambda (stage_name, timing): timing[0]):
+		bar_start = min(int(round(width * start_seconds / total_seconds)), width - 1)
+		bar_end = max(int(round(width * end_seconds / total_seconds)), bar_start + 1)
+		bar = ' ' * bar_start + '#' * (bar_end - bar_start) + ' ' * (width - bar_end)
+		print '{:<{}}{:>9.1f}{:>9.1f}{:>9.1f}  |{}|  {}'.format(stage_name, name_width, start_seconds, end_seconds, end_seconds - start_seconds, bar, status)
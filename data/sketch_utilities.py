@@ -0,0 +1,115 @@
+"""
+Fixed-size, mergeable sketches of per-user distributions, each stored as a row of a numpy array
+(e.g. a UserAggregateStore column with a per-user shape), so that a user's memory stays bounded
+however many reviews they write, and sketches computed by separate workers over shards of the
+data can be merged:
+	LogBucketQuantileSketch : counts of values in logarithmically spaced buckets (as in DDSketch),
+		from which quantiles are estimated within a relative error; merged by adding counts
+	HyperLogLogSketch : registers of hashed items, from which the number of distinct items is
+		estimated; merged by taking the maximum of each register
+
+Each class describes the layout of its sketches and updates or reads many users' sketches at
+once, given a numpy array holding one sketch per row.
+"""
+import math
+
+import numpy
+
+
+class LogBucketQuantileSketch(object):
+	"""
+	The layout of quantile sketches of positive values, each a row of bucket_count counts:
+		bucket 0 : values <= minimum_value
+		bucket i : values in (minimum_value * gamma^(i-1), minimum_value * gamma^i], where
+			gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+	and values above maximum_value are counted in the last bucket. A quantile estimated between
+	minimum_value and maximum_value is within relative_accuracy of the value of that rank.
+
+	Counts are of type dtype (by default 4 bytes, i.e. at most 2^32 - 1 values per sketch).
+	"""
+
+	def __init__(self, relative_accuracy=0.05, minimum_value=1.0, maximum_value=5000.0, dtype=numpy.uint32):
+		self.relative_accuracy = relative_accuracy
+		self.minimum_value = float(minimum_value)
+		self.maximum_value = float(maximum_value)
+		self.dtype = dtype
+		self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+		self.bucket_count = int(math.ceil(math.log(self.maximum_value / self.minimum_value, self.gamma))) + 1
+
+		# Value estimate of each bucket, within relative_accuracy of every value in the bucket
+		self.bucket_values = self.minimum_value * 2 * self.gamma ** numpy.arange(self.bucket_count) / (self.gamma + 1)
+		self.bucket_values[0] = self.minimum_value
+
+	def buckets(self, values):
+		"""Given a list or numpy array of values, returns a numpy array of their buckets."""
+		values = numpy.maximum(numpy.asarray(values, dtype=numpy.float64), self.minimum_value)
+		buckets = numpy.ceil(numpy.log(values / self.minimum_value) / math.log(self.gamma))
+		return numpy.clip(buckets, 0, self.bucket_count - 1).astype(numpy.int64)
+
+	def add(self, sketches, rows, values):
+		"""Given a numpy array of sketches (one per row), adds each value to the sketch in the corresponding row."""
+		numpy.add.at(sketches, (numpy.asarray(rows, dtype=numpy.int64), self.buckets(values)), 1)
+
+	def merge(self, sketches, other_sketches):
+		"""Given two numpy arrays of sketches, returns the merged sketches (of the values added to either)."""
+		return sketches + other_sketches
+
+	def quantiles(self, sketches, quantile):
+		"""
+		Given a numpy array of sketches (one per row), returns a numpy array of each sketch's
+		estimated quantile (e.g. 0.5 for the median), or 0 for a sketch of no values.
+		"""
+		cumulative_counts = numpy.cumsum(sketches, axis=1, dtype=numpy.int64)
+		counts = cumulative_counts[:,-1]
+		ranks = quantile * (counts - 1)
+		buckets = (cumulative_counts > ranks[:,numpy.newaxis]).argmax(axis=1)
+		return numpy.where(counts > 0, self.bucket_values[buckets], 0.0)
+
+
+class HyperLogLogSketch(object):
+	"""
+	The layout of HyperLogLog sketches of distinct items, each a row of 2^precision one-byte
+	registers. The first precision bits of an item's 32-bit hash select a register, which keeps the
+	maximum position of the first 1-bit in the remaining bits. Distinct counts are estimated with a
+	standard error of about 1.04 / sqrt(2^precision), and almost exactly while they are small
+	compared to 2^precision (by counting the empty registers instead).
+	"""
+
+	def __init__(self, precision=7):
+		self.precision = precision
+		self.register_count = 2 ** precision
+		self.dtype = numpy.uint8
+
+	def add(self, sketches, rows, hash_values):
+		"""
+		Given a numpy array of sketches (one per row), adds the item of each 32-bit hash value
+		(e.g. from murmurhash3_32(item, positive=True)) to the sketch in the corresponding row.
+		"""
+		hash_values = numpy.asarray(hash_values, dtype=numpy.int64) & 0xffffffff
+		remaining_bit_count = 32 - self.precision
+		registers = hash_values >> remaining_bit_count
+		remaining_bits = hash_values & ((1 << remaining_bit_count) - 1)
+
+		# Position of the first 1-bit among the remaining bits (one past them, if all are 0)
+		first_one_positions = numpy.where(remaining_bits > 0, remaining_bit_count - numpy.floor(numpy.log2(numpy.maximum(remaining_bits, 1))), remaining_bit_count + 1)
+		numpy.maximum.at(sketches, (numpy.asarray(rows, dtype=numpy.int64), registers), first_one_positions.astype(self.dtype))
+
+	def merge(self, sketches, other_sketches):
+		"""Given two numpy arrays of sketches, returns the merged sketches (of the items added to either)."""
+		return numpy.maximum(sketches, other_sketches)
+
+	def distinct_counts(self, sketches):
+		"""Given a numpy array of sketches (one per row), returns a numpy array of each sketch's estimated number of distinct items."""
+		m = float(self.register_count)
+		alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(self.register_count, 0.7213 / (1 + 1.079 / m))
+		estimates = alpha * m * m / numpy.exp2(-sketches.astype(numpy.float64)).sum(axis=1)
+
+		# Small counts: linear counting of the empty registers is more accurate
+		empty_register_counts = (sketches == 0).sum(axis=1)
+		linear_counts = m * numpy.log(m / numpy.maximum(empty_register_counts, 1))
+		estimates = numpy.where((estimates <= 2.5 * m) & (empty_register_counts > 0), linear_counts, estimates)
+
+		# Large counts: correct for collisions between 32-bit hashes
+		is_large = estimates > 2**32 / 30.0
+		estimates[is_large] = -2**32 * numpy.log(1 - estimates[is_large] / 2**32)
+		return estimates
@@ -0,0 +1,215 @@
+"""
+Generator of synthetic raw data files shaped like the Yelp dataset (users, reviews, tips and
+businesses), at any scale, for measuring the performance of the data processing and analysis
+pipeline without the real multi-GB dataset.
+
+The generated data mimic the skew of the real data:
+	- friend counts follow a power law (a few users have thousands of friends)
+	- review counts are log-normally distributed, and Elite users review much more
+	- business popularity follows a power law
+	- review texts have several sentences of Zipf-distributed words
+"""
+import numpy
+
+from data_utilities import *
+
+
+SYNTHETIC_FIRST_YEAR = 2005
+SYNTHETIC_LAST_YEAR = 2015
+
+SYNTHETIC_CITIES = ['Phoenix', 'Las Vegas', 'Charlotte', 'Pittsburgh', 'Madison', 'Montreal', 'Edinburgh', 'Karlsruhe', 'Waterloo', 'Urbana']
+SYNTHETIC_CATEGORIES = [
+	'Restaurants', 'Food', 'Nightlife', 'Bars', 'Shopping', 'Coffee & Tea', 'Mexican', 'Pizza',
+	'Italian', 'Chinese', 'Sushi Bars', 'Beauty & Spas', 'Hotels & Travel', 'Active Life',
+	'Automotive', 'Home Services', 'Arts & Entertainment', 'Breakfast & Brunch', 'Burgers', 'Bakeries',
+]
+SYNTHETIC_COMPLIMENT_TYPES = ['hot', 'more', 'profile', 'cute', 'list', 'note', 'plain', 'cool', 'funny', 'writer', 'photos']
+
+# Vocabulary for review and tip texts: short common words first, so that Zipf-distributed word
+# ranks give realistic word lengths (and syllable counts, for reading levels)
+SYNTHETIC_VOCABULARY = (
+	'the and a to was i of it for is in that we but with my this they had on were so you not are '
+	'food place good great service just very like here at be really our all have one there time '
+	'back go out would if their me what an get when up also nice about friendly definitely '
+	'delicious restaurant ordered always little staff menu amazing pretty chicken best better '
+	'experience atmosphere recommend excellent location favorite selection wonderful fantastic '
+	'reasonable comfortable disappointed incredibly professional recommendation unfortunately '
+	'accommodating extraordinarily understandably establishment presentation knowledgeable '
+	'complimentary authenticity inconsistency sophisticated underwhelming'
+).split()
+
+
+def generate_synthetic_dataset(
+	user_count=10000,
+	average_reviews_per_user=8.0,
+	average_tips_per_user=1.0,
+	users_per_business=10,
+	elite_fraction=0.05,
+	random_seed=0,
+	output_users_file_name=DEFAULT_RAW_USERS_FILE_NAME,
+	output_reviews_file_name=DEFAULT_RAW_REVIEWS_FILE_NAME,
+	output_tips_file_name=DEFAULT_RAW_TIPS_FILE_NAME,
+	output_businesses_file_name=DEFAULT_RAW_BUSINESSES_FILE_NAME,
+):
+	"""
+	Writes synthetic Yelp dataset users, reviews, tips and businesses files (under raw_data/) with
+	user_count users, in the same JSON format as the real dataset. The same random_seed always
+	produces the same files.
+
+	Returns a dictionary of the numbers of users, friendships, reviews, tips and businesses written.
+	"""
+	random_state = numpy.random.RandomState(random_seed)
+	business_count = max(user_count // users_per_business, 1)
+	user_IDs = [ _synthetic_ID('user', user_index) for user_index in xrange(user_count) ]
+	business_IDs = [ _synthetic_ID('business', business_index) for business_index in xrange(business_count) ]
+
+	# Elite users are drawn mostly from the most active reviewers
+	activity = random_state.lognormal(mean=0.0, sigma=1.2, size=user_count)
+	elite_probabilities = activity / activity.sum()
+	elite_count = int(elite_fraction * user_count)
+	is_elite = numpy.zeros(user_count, dtype=bool)
+	is_elite[random_state.choice(user_count, size=elite_count, replace=False, p=elite_probabilities)] = True
+
+	# Reviews per user: log-normal, scaled to the desired average, with Elite users reviewing ~5x more
+	review_weights = activity * numpy.where(is_elite, 5.0, 1.0)
+	review_counts = random_state.poisson(average_reviews_per_user * user_count * review_weights / review_weights.sum())
+	tip_counts = random_state.poisson(average_tips_per_user * numpy.where(is_elite, 3.0, 0.9), size=user_count)
+
+	# Join dates, and Elite years (between the join year and the last year)
+	join_years = random_state.randint(SYNTHETIC_FIRST_YEAR, SYNTHETIC_LAST_YEAR + 1, size=user_count)
+	join_months = random_state.randint(1, 13, size=user_count)
+
+	friends_for_user = _power_law_friendships(user_count, random_state)
+	business_probabilities = _zipf_probabilities(business_count, exponent=1.1)
+	cumulative_word_probabilities = numpy.cumsum(_zipf_probabilities(len(SYNTHETIC_VOCABULARY), exponent=1.0))
+
+	# Businesses
+	with open(raw_data_absolute_path(output_businesses_file_name), 'w') as businesses_file:
+		for business_index, business_ID in enumerate(business_IDs):
+			category_count = random_state.randint(1, 4)
+			businesses_file.write(json.dumps({
+				'type': 'business',
+				'business_id': business_ID,
+				'name': 'Business ' + str(business_index),
+				'city': SYNTHETIC_CITIES[random_state.randint(len(SYNTHETIC_CITIES))],
+				'categories': [ SYNTHETIC_CATEGORIES[category_index] for category_index in random_state.choice(len(SYNTHETIC_CATEGORIES), size=category_count, replace=False) ],
+				'stars': round(random_state.uniform(1, 5) * 2) / 2,
+				'review_count': 0,
+			}) + '\n')
+
+	# Reviews (in random user order, like the real file) and their per-user statistics
+	total_stars = numpy.zeros(user_count)
+	review_votes = numpy.zeros((user_count, 3), dtype=numpy.int64)
+	review_user_indices = random_state.permutation(numpy.repeat(numpy.arange(user_count), review_counts))
+	review_business_indices = random_state.choice(business_count, size=len(review_user_indices), p=business_probabilities)
+	with open(raw_data_absolute_path(output_reviews_file_name), 'w') as reviews_file:
+		for review_index, user_index in enumerate(review_user_indices):
+			stars = int(numpy.clip(random_state.normal(3.8, 1.1), 1, 5).round())
+			votes = random_state.poisson(1.5 if is_elite[user_index] else 0.3, size=3)
+			total_stars[user_index] += stars
+			review_votes[user_index] += votes
+			sentence_count = random_state.randint(2, 10 if is_elite[user_index] else 6)
+			reviews_file.write(json.dumps({
+				'type': 'review',
+				'review_id': _synthetic_ID('review', review_index),
+				'user_id': user_IDs[user_index],
+				'business_id': business_IDs[review_business_indices[review_index]],
+				'stars': stars,
+				'date': _synthetic_date(random_state, join_years[user_index]),
+				'text': _synthetic_text(random_state, sentence_count, cumulative_word_probabilities),
+				'votes': {'funny': int(votes[0]), 'useful': int(votes[1]), 'cool': int(votes[2])},
+			}) + '\n')
+
+	# Tips
+	tip_user_indices = random_state.permutation(numpy.repeat(numpy.arange(user_count), tip_counts))
+	tip_business_indices = random_state.choice(business_count, size=len(tip_user_indices), p=business_probabilities)
+	with open(raw_data_absolute_path(output_tips_file_name), 'w') as tips_file:
+		for user_index, business_index in itertools.izip(tip_user_indices, tip_business_indices):
+			tips_file.write(json.dumps({
+				'type': 'tip',
+				'user_id': user_IDs[user_index],
+				'business_id': business_IDs[business_index],
+				'date': _synthetic_date(random_state, join_years[user_index]),
+				'text': _synthetic_text(random_state, 1, cumulative_word_probabilities),
+				'likes': int(random_state.poisson(0.2)),
+			}) + '\n')
+
+	# Users
+	with open(raw_data_absolute_path(output_users_file_name), 'w') as users_file:
+		for user_index, user_ID in enumerate(user_IDs):
+			elite_years = range(max(join_years[user_index], SYNTHETIC_FIRST_YEAR + 1), SYNTHETIC_LAST_YEAR + 1) if is_elite[user_index] else []
+			elite_years = sorted(random_state.choice(elite_years, size=random_state.randint(1, len(elite_years) + 1), replace=False).tolist()) if elite_years else []
+			compliment_rate = 8.0 if is_elite[user_index] else 0.5
+			users_file.write(json.dumps({
+				'type': 'user',
+				'user_id': user_ID,
+				'name': 'User ' + str(user_index),
+				'review_count': int(review_counts[user_index]),
+				'average_stars': round(safe_divide(total_stars[user_index], review_counts[user_index]), 2),
+				'votes': {'funny': int(review_votes[user_index, 0]), 'useful': int(review_votes[user_index, 1]), 'cool': int(review_votes[user_index, 2])},
+				'friends': [ user_IDs[friend_index] for friend_index in friends_for_user[user_index] ],
+				'elite': elite_years,
+				'yelping_since': '{}-{:02d}'.format(join_years[user_index], join_months[user_index]),
+				'compliments': { compliment_type: int(count) for compliment_type, count in zip(SYNTHETIC_COMPLIMENT_TYPES, random_state.poisson(compliment_rate, size=len(SYNTHETIC_COMPLIMENT_TYPES))) if count > 0 },
+				'fans': int(random_state.poisson(compliment_rate * 2)),
+			}) + '\n')
+
+	return {
+		'users': user_count,
+		'friendships': sum(len(friend_indices) for friend_indices in friends_for_user) // 2,
+		'reviews': len(review_user_indices),
+		'tips': len(tip_user_indices),
+		'businesses': business_count,
+	}
+
+
+def _synthetic_ID(kind, index):
+	"""Returns a 22-character ID (like Yelp's) unique to the kind of object and its index."""
+	return '{}{:0>{}}'.format(kind[0], index, 21)
+
+
+def _synthetic_date(random_state, first_year):
+	"""Returns a random date (formatted as YYYY-MM-DD) between the start of first_year and the end of SYNTHETIC_LAST_YEAR."""
+	year = random_state.randint(first_year, SYNTHETIC_LAST_YEAR + 1)
+	return '{}-{:02d}-{:02d}'.format(year, random_state.randint(1, 13), random_state.randint(1, 29))
+
+
+def _synthetic_text(random_state, sentence_count, cumulative_word_probabilities):
+	"""Returns a text of sentence_count sentences of vocabulary words drawn with the given cumulative probabilities."""
+	sentence_lengths = random_state.randint(4, 20, size=sentence_count)
+	word_indices = numpy.searchsorted(cumulative_word_probabilities, random_state.random_sample(sentence_lengths.sum()) * cumulative_word_probabilities[-1])
+	words = [ SYNTHETIC_VOCABULARY[word_index] for word_index in word_indices.tolist() ]
+
+	sentences = []
+	sentence_start = 0
+	for sentence_length in sentence_lengths:
+		sentences += [ ' '.join(words[sentence_start:sentence_start + sentence_length]).capitalize() + '.' ]
+		sentence_start += sentence_length
+	return ' '.join(sentences)
+
+
+def _zipf_probabilities(count, exponent=1.0):
+	"""Returns a numpy array of count probabilities, proportional to 1 / rank^exponent."""
+	weights = 1.0 / numpy.arange(1, count + 1) ** exponent
+	return weights / weights.sum()
+
+
+def _power_law_friendships(user_count, random_state, exponent=1.5, average_friend_count=10.0):
+	"""
+	Returns a list of lists of friend indices (symmetric, without self-loops or duplicates) for
+	user_count users, whose friend counts roughly follow a power law: each user gets a Pareto-
+	distributed number of friendship 'stubs', attached to other users in proportion to their own
+	stub counts (as in the configuration model).
+	"""
+	stub_counts = numpy.minimum(random_state.pareto(exponent, size=user_count) + 1, user_count - 1)
+	stub_counts = numpy.floor(stub_counts * average_friend_count / (2 * stub_counts.mean())).astype(numpy.int64)
+
+	sources = numpy.repeat(numpy.arange(user_count), stub_counts)
+	targets = random_state.choice(user_count, size=len(sources), p=stub_counts / float(max(stub_counts.sum(), 1)))
+	sources, targets = deduplicate_undirected_edges(sources, targets)
+
+	friends_for_user = [ [] for user_index in xrange(user_count) ]
+	for source, target in itertools.izip(sources.tolist(), targets.tolist()):
+		friends_for_user[source] += [target]
+		friends_for_user[target] += [source]
+	return friends_for_user
@@ -0,0 +1,366 @@
+"""
+Utilities for working with large graphs stored as compact integer edge arrays and sparse (CSR)
+adjacency matrices, without building NetworkX graphs.
+
+Nodes are integers 0, ..., node_count - 1. An undirected graph is given by two equal-length
+arrays (sources, targets), listing each edge once.
+"""
+import numpy
+import scipy.sparse
+import scipy.sparse.linalg
+
+
+def adjacency_matrix(sources, targets, node_count, dtype=numpy.float64):
+	"""
+	Given the edge arrays of an undirected graph, returns its symmetric adjacency matrix as a
+	scipy.sparse CSR matrix (with sorted column indices in each row).
+	"""
+	edge_count = len(sources)
+	adjacency = scipy.sparse.csr_matrix(
+		( numpy.ones(2 * edge_count, dtype=dtype), ( numpy.concatenate([sources, targets]), numpy.concatenate([targets, sources]) ) ),
+		shape=(node_count, node_count),
+	)
+	adjacency.sum_duplicates()
+	adjacency.sort_indices()
+	return adjacency
+
+
+def node_degrees(adjacency):
+	"""Given a CSR adjacency matrix, returns a numpy array of the degree of each node."""
+	return numpy.diff(adjacency.indptr)
+
+
+def degree_distribution(degrees):
+	"""
+	Given a numpy array of node degrees, returns a numpy array whose d-th entry is the number of
+	nodes with degree d (suitable for plotting as a histogram with unit-width bins).
+	"""
+	return numpy.bincount(degrees)
+
+
+def edge_density(node_count, edge_count):
+	"""Returns the fraction of all possible edges that are present in an undirected graph."""
+	return 2.0 * edge_count / (node_count * (node_count - 1)) if node_count > 1 else 0
+
+
+def connected_component_labels(sources, targets, node_count):
+	"""
+	Given the edge arrays of an undirected graph, returns a numpy array mapping each node to the
+	smallest node in its connected component.
+
+	Uses a vectorized union-find: every edge whose endpoints have different roots hooks the larger
+	root under the smaller one, then pointer jumping compresses all paths, until no edge joins two
+	different roots.
+	"""
+	parent = numpy.arange(node_count)
+
+	while True:
+		source_roots = parent[sources]
+		target_roots = parent[targets]
+		is_crossing_edge = source_roots != target_roots
+		if not is_crossing_edge.any():
+			return parent
+
+		# Hook (roots only ever point to smaller nodes, so no cycles can form)
+		smaller_roots = numpy.minimum(source_roots[is_crossing_edge], target_roots[is_crossing_edge])
+		larger_roots = numpy.maximum(source_roots[is_crossing_edge], target_roots[is_crossing_edge])
+		numpy.minimum.at(parent, larger_roots, smaller_roots)
+
+		# Compress
+		while True:
+			grandparent = parent[parent]
+			if numpy.array_equal(grandparent, parent):
+				break
+			parent = grandparent
+
+
+def connected_component_sizes(component_labels):
+	"""
+	Given the output of connected_component_labels(), returns a numpy array of the sizes of all
+	connected components, in decreasing order.
+	"""
+	sizes = numpy.bincount(component_labels)
+	return numpy.sort(sizes[sizes > 0])[::-1]
+
+
+def _have_edges(adjacency, nodes_1, nodes_2):
+	"""
+	Given a CSR adjacency matrix with sorted indices and two equal-length node arrays, returns a
+	Boolean array whose i-th entry is whether nodes_1[i] and nodes_2[i] are adjacent.
+	"""
+	# With sorted indices, (row * node_count + column) over all stored entries is sorted
+	node_count = adjacency.shape[0]
+	rows = numpy.repeat(numpy.arange(node_count, dtype=numpy.int64), numpy.diff(adjacency.indptr))
+	edge_keys = rows * node_count + adjacency.indices
+	query_keys = numpy.asarray(nodes_1, dtype=numpy.int64) * node_count + nodes_2
+
+	positions = numpy.minimum(numpy.searchsorted(edge_keys, query_keys), len(edge_keys) - 1)
+	return edge_keys[positions] == query_keys
+
+
+def _random_wedges(adjacency, centers, random_state):
+	"""
+	Given a CSR adjacency matrix and an array of center nodes (each with degree >= 2), returns two
+	arrays of endpoints of a uniformly random wedge (pair of distinct neighbors) at each center.
+	"""
+	degrees = node_degrees(adjacency)[centers]
+	first_offsets = (random_state.random_sample(len(centers)) * degrees).astype(numpy.int64)
+	second_offsets = (random_state.random_sample(len(centers)) * (degrees - 1)).astype(numpy.int64)
+	second_offsets += second_offsets >= first_offsets # Skip over the first neighbor
+
+	row_starts = adjacency.indptr[centers]
+	return adjacency.indices[row_starts + first_offsets], adjacency.indices[row_starts + second_offsets]
+
+
+def average_clustering_estimate(adjacency, sample_size=100000, random_state=None):
+	"""
+	Given a CSR adjacency matrix with sorted indices, returns an unbiased estimate of the average
+	local clustering coefficient over all nodes (nodes with degree < 2 count as 0).
+
+	Samples nodes uniformly at random and checks whether one random wedge at each is closed.
+	"""
+	random_state = numpy.random.RandomState(random_state)
+	node_count = adjacency.shape[0]
+	degrees = node_degrees(adjacency)
+	if node_count == 0:
+		return 0.0
+
+	sampled_nodes = random_state.randint(0, node_count, size=sample_size)
+	centers = sampled_nodes[degrees[sampled_nodes] >= 2]
+	if len(centers) == 0:
+		return 0.0
+
+	endpoints_1, endpoints_2 = _random_wedges(adjacency, centers, random_state)
+	return _have_edges(adjacency, endpoints_1, endpoints_2).sum() / float(sample_size)
+
+
+def transitivity_estimate(adjacency, sample_size=100000, random_state=None):
+	"""
+	Given a CSR adjacency matrix with sorted indices, returns an unbiased estimate of the
+	transitivity (global clustering coefficient): the fraction of all wedges that are closed.
+
+	Samples wedges uniformly at random, by choosing each center with probability proportional to
+	its number of wedges.
+	"""
+	random_state = numpy.random.RandomState(random_state)
+	degrees = node_degrees(adjacency).astype(numpy.float64)
+	wedge_counts = degrees * (degrees - 1) / 2
+	if wedge_counts.sum() == 0:
+		return 0.0
+
+	cumulative_wedge_counts = numpy.cumsum(wedge_counts)
+	centers = numpy.searchsorted(cumulative_wedge_counts, random_state.random_sample(sample_size) * cumulative_wedge_counts[-1], side='right')
+
+	endpoints_1, endpoints_2 = _random_wedges(adjacency, centers, random_state)
+	return _have_edges(adjacency, endpoints_1, endpoints_2).mean()
+
+
+def core_numbers(adjacency):
+	"""
+	Given a CSR adjacency matrix, returns a numpy array of each node's core number: the largest k
+	such that the node belongs to a subgraph in which every node has degree >= k.
+
+	Peels all remaining nodes of degree <= k at once, then checks only their neighbors for having
+	dropped to degree <= k, so each round takes time proportional to the nodes peeled and their
+	edges rather than to the whole graph; k rises to the minimum remaining degree once none are left.
+	"""
+	node_count = adjacency.shape[0]
+	degrees = node_degrees(adjacency).astype(numpy.int64)
+	cores = numpy.zeros(node_count, dtype=numpy.int64)
+	is_remaining = numpy.ones(node_count, dtype=bool)
+	remaining_nodes = numpy.arange(node_count)
+
+	k = 0
+	while len(remaining_nodes) > 0:
+		k = max(k, degrees[remaining_nodes].min())
+		peeled_nodes = remaining_nodes[degrees[remaining_nodes] <= k]
+		while len(peeled_nodes) > 0:
+			cores[peeled_nodes] = k
+			is_remaining[peeled_nodes] = False
+			neighbors = _neighbors(adjacency, peeled_nodes)
+			neighbors, edge_counts = numpy.unique(neighbors[is_remaining[neighbors]], return_counts=True)
+			degrees[neighbors] -= edge_counts
+			peeled_nodes = neighbors[degrees[neighbors] <= k]
+		remaining_nodes = remaining_nodes[is_remaining[remaining_nodes]]
+
+	return cores
+
+
+def _neighbors(adjacency, nodes):
+	"""Given a CSR adjacency matrix and a numpy array of nodes, returns a numpy array of all their neighbors (with repeats)."""
+	row_starts = adjacency.indptr[nodes]
+	row_lengths = adjacency.indptr[nodes + 1] - row_starts
+	offsets = numpy.repeat(row_starts - (numpy.cumsum(row_lengths) - row_lengths), row_lengths) + numpy.arange(row_lengths.sum())
+	return adjacency.indices[offsets]
+
+
+def graph_statistics(sources, targets, node_count, clustering_sample_size=100000, random_seed=0):
+	"""
+	Given the edge arrays of an undirected graph, returns a dictionary of its statistics:
+		node_count, edge_count, edge_density,
+		degrees (per node), degree_distribution (number of nodes per degree),
+		component_sizes (decreasing), average_clustering, transitivity (both estimated from
+			clustering_sample_size nodes or wedges sampled with random_seed),
+		core_numbers (per node)
+	where all per-node and distribution values are numpy arrays.
+	"""
+	adjacency = adjacency_matrix(sources, targets, node_count, dtype=numpy.int8)
+	degrees = node_degrees(adjacency)
+
+	return {
+		'node_count': node_count,
+		'edge_count': adjacency.nnz / 2,
+		'edge_density': edge_density(node_count, adjacency.nnz / 2),
+		'degrees': degrees,
+		'degree_distribution': degree_distribution(degrees),
+		'component_sizes': connected_component_sizes(connected_component_labels(sources, targets, node_count)),
+		'average_clustering': average_clustering_estimate(adjacency, sample_size=clustering_sample_size, random_state=random_seed),
+		'transitivity': transitivity_estimate(adjacency, sample_size=clustering_sample_size, random_state=random_seed),
+		'core_numbers': core_numbers(adjacency),
+	}
+
+
+def pagerank(adjacency, alpha=0.85, personalization=None, tolerance=1.0e-6, maximum_iterations=100, initial_ranks=None):
+	"""
+	Given a symmetric CSR adjacency matrix, returns a numpy array of PageRanks computed by power
+	iteration. See pagerank_with_convergence() for details.
+	"""
+	ranks, iteration_count, residual = pagerank_with_convergence(adjacency, alpha, personalization, tolerance, maximum_iterations, initial_ranks)
+	return ranks
+
+
+def pagerank_with_convergence(adjacency, alpha=0.85, personalization=None, tolerance=1.0e-6, maximum_iterations=100, initial_ranks=None):
+	"""
+	Given a symmetric CSR adjacency matrix (or any symmetric matrix-like object with nonnegative
+	edge weights supporting shape and dot(), such as a scipy LinearOperator), computes PageRanks by
+	power iteration, with the same conventions as networkx.pagerank():
+		- Each undirected edge is followed in both directions, with probability proportional to its weight
+		- Teleportation (and the rank of dangling nodes) follows personalization, a numpy array
+		  of nonnegative weights, not all zero (uniform if None)
+		- Iteration stops once the L1 change is below node_count * tolerance
+	and returns
+		ranks : a numpy array of PageRanks
+		iteration_count : the number of iterations performed
+		residual : the L1 change in the final iteration
+
+	If initial_ranks (e.g. PageRanks of a slightly different, earlier graph) are given, iteration
+	starts from them instead of from the uniform vector, and converges in fewer iterations the
+	closer they are to the solution.
+	"""
+	node_count = adjacency.shape[0]
+	if personalization is None:
+		personalization = numpy.ones(node_count)
+	if not personalization.sum() > 0:
+		raise ValueError('PageRank personalization must have a positive weight for some node')
+	personalization = personalization / float(personalization.sum())
+
+	degrees = adjacency.dot(numpy.ones(node_count)) # Weighted degrees
+	is_dangling = degrees == 0
+	inverse_degrees = numpy.where(is_dangling, 0, 1.0 / numpy.maximum(degrees, 1))
+
+	if initial_ranks is None:
+		ranks = numpy.ones(node_count) / node_count
+	else:
+		ranks = initial_ranks / float(initial_ranks.sum())
+
+	iteration_count, residual = 0, float('inf')
+	while iteration_count < maximum_iterations and residual >= node_count * tolerance:
+		previous_ranks = ranks
+		ranks = alpha * adjacency.dot(previous_ranks * inverse_degrees) + (alpha * previous_ranks[is_dangling].sum() + (1 - alpha)) * personalization
+		residual = numpy.abs(ranks - previous_ranks).sum()
+		iteration_count += 1
+
+	return ranks, iteration_count, residual
+
+
+def hits(adjacency, tolerance=1.0e-8, maximum_iterations=100):
+	"""
+	Given a CSR adjacency matrix (row i lists the nodes that node i points to), returns numpy
+	arrays (hubs, authorities) of HITS scores computed by power iteration, each summing to 1.
+
+	NOTE: For a symmetric (undirected) adjacency matrix, hubs and authorities are identical.
+	"""
+	node_count = adjacency.shape[0]
+	adjacency_transpose = adjacency.T.tocsr()
+
+	hubs = numpy.ones(node_count) / node_count
+	for iteration in xrange(maximum_iterations):
+		previous_hubs = hubs
+		authorities = adjacency_transpose.dot(previous_hubs)
+		hubs = adjacency.dot(authorities)
+		hubs /= max(hubs.max(), 1.0e-300)
+		if numpy.abs(hubs - previous_hubs).sum() < node_count * tolerance:
+			break
+
+	authorities = adjacency_transpose.dot(hubs)
+	return hubs / max(hubs.sum(), 1.0e-300), authorities / max(authorities.sum(), 1.0e-300)
+
+
+def approximate_betweenness(adjacency, sample_size=100, random_state=None):
+	"""
+	Given a symmetric CSR adjacency matrix, returns a numpy array estimating each node's
+	betweenness centrality, normalized as in networkx.betweenness_centrality(normalized=True).
+
+	Runs Brandes' algorithm from sample_size random source nodes only, with breadth-first search
+	and dependency accumulation done one level at a time using sparse matrix products.
+	"""
+	random_state = numpy.random.RandomState(random_state)
+	node_count = adjacency.shape[0]
+	sample_size = min(sample_size, node_count)
+	betweenness = numpy.zeros(node_count)
+
+	for source in random_state.choice(node_count, size=sample_size, replace=False):
+		# Forward: count shortest paths (sigma) from the source to each node, level by level
+		path_counts = numpy.zeros(node_count)
+		path_counts[source] = 1
+		is_visited = numpy.zeros(node_count, dtype=bool)
+		is_visited[source] = True
+		levels = [numpy.array([source])]
+
+		while True:
+			frontier = levels[-1]
+			paths_to_neighbors = adjacency[frontier].T.dot(path_counts[frontier])
+			next_frontier = numpy.flatnonzero((paths_to_neighbors > 0) & ~is_visited)
+			if len(next_frontier) == 0:
+				break
+			path_counts[next_frontier] = paths_to_neighbors[next_frontier]
+			is_visited[next_frontier] = True
+			levels += [next_frontier]
+
+		# Backward: accumulate dependencies from the deepest level up to the source
+		dependencies = numpy.zeros(node_count)
+		for level_number in xrange(len(levels) - 1, 0, -1):
+			successors = levels[level_number]
+			predecessors = levels[level_number - 1]
+			successor_coefficients = numpy.zeros(node_count)
+			successor_coefficients[successors] = (1 + dependencies[successors]) / path_counts[successors]
+			dependencies[predecessors] += path_counts[predecessors] * adjacency[predecessors].dot(successor_coefficients)
+
+		dependencies[source] = 0
+		betweenness += dependencies
+
+	# Scale up from sampled sources to all sources, then normalize by the number of node pairs
+	if node_count > 2:
+		betweenness *= float(node_count) / sample_size / ((node_count - 1) * (node_count - 2))
+	return betweenness
+
+
+def bipartite_projection(incidence):
+	"""
+	Given a sparse 0/1 incidence matrix of a bipartite graph (rows: e.g. users, columns: e.g.
+	businesses), returns a scipy LinearOperator for the weighted adjacency matrix of its projection
+	onto the rows, in which two rows are joined by an edge weighted by their number of shared columns.
+
+	The projection (incidence * incidence^T, minus its diagonal) is never materialized, since it
+	can be much denser than the incidence matrix itself.
+	"""
+	incidence = incidence.tocsr()
+	incidence_transpose = incidence.T.tocsr()
+	row_nonzero_counts = numpy.diff(incidence.indptr).astype(numpy.float64)
+
+	def multiply(vector):
+		vector = numpy.ravel(vector)
+		return incidence.dot(incidence_transpose.dot(vector)) - row_nonzero_counts * vector
+
+	row_count = incidence.shape[0]
+	return scipy.sparse.linalg.LinearOperator((row_count, row_count), matvec=multiply, dtype=numpy.float64)
@@ -1,12 +1,108 @@
 """
 General utilities for working with Python data structures, NetworkX graphs, etc.
 """
+import array
+import heapq
+import importlib
+import itertools
+import os
 import random
+import sys
 from collections import Counter, defaultdict, OrderedDict
 
-import networkx
 import numpy
-from matplotlib import pyplot
+
+
+class LazyModule(object):
+	"""
+	A stand-in for a module that imports it only when one of its attributes is first used, so that
+	importing the project doesn't pay for heavy libraries (graphs, plotting, models) that a task
+	never uses:
+		pyplot = LazyModule('matplotlib.pyplot')
+		pyplot.show()	# matplotlib is imported here
+
+	Given the importing module's globals(), the name is resolved as an import statement in that
+	module would resolve it (i.e. relative to its package first). If given, before_import is
+	called just before the module is imported.
+	"""
+
+	def __init__(self, module_name, importer_globals=None, before_import=None):
+		self.__dict__['_module_name'] = module_name
+		self.__dict__['_importer_globals'] = importer_globals
+		self.__dict__['_before_import'] = before_import
+		self.__dict__['_imported_module'] = None
+
+	def imported_module(self):
+		"""Imports the module (if not yet imported) and returns it."""
+		if self._imported_module is None:
+			if self._before_import:
+				self._before_import()
+			self.__dict__['_imported_module'] = __import__(self._module_name, self._importer_globals or {}, {}, ['__name__'])
+		return self._imported_module
+
+	def __getattr__(self, name):
+		return getattr(self.imported_module(), name)
+
+	def __setattr__(self, name, value):
+		setattr(self.imported_module(), name, value)
+
+	def __repr__(self):
+		return '<lazily imported module ' + repr(self._module_name) + '>'
+
+
+class LazyAttribute(object):
+	"""
+	A stand-in for a class or function defined in a module, which imports the module only when
+	first called (or when one of its attributes is used):
+		GaussianNB = LazyAttribute('sklearn.naive_bayes', 'GaussianNB')
+		model = GaussianNB()	# sklearn.naive_bayes is imported here
+
+	Pickles as the class or function itself, so it can be sent to worker processes.
+	NOTE: Not a class, so it can't be used with isinstance(); use resolve() for that.
+	"""
+
+	def __init__(self, module_name, attribute_name, importer_globals=None):
+		self._module = LazyModule(module_name, importer_globals)
+		self._attribute_name = attribute_name
+
+	def resolve(self):
+		"""Imports the module (if not yet imported) and returns the class or function."""
+		return getattr(self._module.imported_module(), self._attribute_name)
+
+	def __call__(self, *arguments, **keyword_arguments):
+		return self.resolve()(*arguments, **keyword_arguments)
+
+	def __getattr__(self, name):
+		if name.startswith('_') and not name.startswith('__') or name in ('__getstate__', '__setstate__'):
+			raise AttributeError(name)
+		return getattr(self.resolve(), name)
+
+	def __reduce__(self):
+		return (imported_attribute, (self._module.imported_module().__name__, self._attribute_name))
+
+	def __repr__(self):
+		return '<lazily imported ' + repr(self._attribute_name) + ' from ' + repr(self._module._module_name) + '>'
+
+
+def imported_attribute(module_name, attribute_name):
+	"""Imports a module (by absolute name) and returns one of its attributes."""
+	return getattr(importlib.import_module(module_name), attribute_name)
+
+
+def use_headless_plotting_backend_without_display():
+	"""
+	Selects matplotlib's non-interactive Agg backend when there is no display to show figures on
+	(e.g. over SSH or in a batch job) and no backend was chosen explicitly, instead of failing when
+	the first figure is created.
+	"""
+	if sys.platform.startswith('linux') and not os.environ.get('DISPLAY') and not os.environ.get('MPLBACKEND') and 'matplotlib.pyplot' not in sys.modules:
+		import matplotlib
+		matplotlib.use('Agg')
+
+
+# Heavy libraries, imported on first use
+networkx = LazyModule('networkx')
+pyplot = LazyModule('matplotlib.pyplot', before_import=use_headless_plotting_backend_without_display)
 
 
 def filter_dictionary_by_keys(dictionary, desired_keys):
@@ -93,6 +189,38 @@ def random_partition(elements, fraction_in_first_list):
 	return elements[:first_list_size], elements[first_list_size:]
 
 
+def iterate_in_chunks(values, chunk_size):
+	"""Given an iterable, yields its values as consecutive lists of (at most) chunk_size values."""
+	iterator = iter(values)
+	while True:
+		chunk = list(itertools.islice(iterator, chunk_size))
+		if not chunk:
+			return
+		yield chunk
+
+
+def deduplicate_undirected_edges(sources, targets):
+	"""
+	Given two numpy arrays of integer node IDs representing the edges of an undirected graph, returns
+	new (sources, targets) arrays with source < target, listing each edge once (self-loops removed).
+	"""
+	smaller_nodes = numpy.minimum(sources, targets).astype(numpy.int64)
+	larger_nodes = numpy.maximum(sources, targets).astype(numpy.int64)
+	is_loop = smaller_nodes == larger_nodes
+
+	# Encode each edge as a single integer, so that duplicates can be removed by a single sort
+	edge_keys = numpy.unique(undirected_edge_keys(smaller_nodes[~is_loop], larger_nodes[~is_loop]))
+	return (edge_keys >> 32).astype(numpy.int32), (edge_keys & 0xFFFFFFFF).astype(numpy.int32)
+
+
+def undirected_edge_keys(sources, targets):
+	"""
+	Given two numpy arrays of (32-bit) integer node IDs with source < target, returns a numpy array
+	encoding each edge as a single 64-bit integer.
+	"""
+	return (sources.astype(numpy.int64) << 32) | targets.astype(numpy.int64)
+
+
 def remove_low_degree_nodes(graph, minimum_degree=1):
 	"""Removes all nodes in a graph with degree less than minimum_degree."""
 	for node in graph.nodes():